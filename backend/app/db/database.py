@@ -1,7 +1,7 @@
 """Database configuration and engine setup"""
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, QueuePool
 import os
 from dotenv import load_dotenv
 
@@ -13,13 +13,55 @@ DATABASE_URL = os.getenv(
     "sqlite:///./ai_learning_platform.db"
 )
 
-# For SQLite, use StaticPool to allow multiple threads
-if DATABASE_URL.startswith("sqlite"):
+# SQLite tuning for file databases: a pool of per-thread connections in WAL mode,
+# so readers never block the writer and writers wait instead of failing with "database is locked"
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "10"))
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "10"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Optional read replica for PostgreSQL; defaults to the primary
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", DATABASE_URL)
+
+def _is_memory_sqlite(url: str) -> bool:
+    """In-memory databases exist per connection, so they cannot be pooled"""
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+def _create_sqlite_engine(url: str, pool_size: int, read_only: bool = False):
+    """SQLite engine with WAL, relaxed fsync, busy timeout and memory-mapped reads"""
+    sqlite_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+        echo=False  # Set to True for SQL query logging
+    )
+    
+    @event.listens_for(sqlite_engine, "connect")
+    def set_sqlite_pragma(dbapi_conn, connection_record):
+        """Enable foreign keys and apply the connection tuning pragmas"""
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a power loss can lose the last commits but never corrupts the database
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    
+    return sqlite_engine
+
+if DATABASE_URL.startswith("sqlite") and _is_memory_sqlite(DATABASE_URL):
+    # In-memory SQLite: one shared connection for all threads
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
-        echo=False  # Set to True for SQL query logging
+        echo=False
     )
     
     # Enable foreign keys for SQLite
@@ -29,6 +71,12 @@ if DATABASE_URL.startswith("sqlite"):
         cursor = dbapi_conn.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
+    
+    read_engine = engine
+elif DATABASE_URL.startswith("sqlite"):
+    # Separate engines so API reads never queue behind pipeline writes for a connection
+    engine = _create_sqlite_engine(DATABASE_URL, SQLITE_POOL_SIZE)
+    read_engine = _create_sqlite_engine(DATABASE_URL, SQLITE_READ_POOL_SIZE, read_only=True)
 else:
     # PostgreSQL connection
     engine = create_engine(
@@ -38,9 +86,19 @@ else:
         max_overflow=20,
         echo=False
     )
+    read_engine = engine if DATABASE_READ_URL == DATABASE_URL else create_engine(
+        DATABASE_READ_URL,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20,
+        echo=False
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessions for read-only request handlers
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 # Base class for models
 Base = declarative_base()
 
@@ -52,6 +110,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Dependency for getting a read-only database session"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def init_db():
     """Initialize database - create all tables"""
     from app.db import models  # Import models to register them
@@ -1,5 +1,5 @@
 """Database models for AI Learning Platform"""
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, ForeignKey, JSON, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
@@ -44,12 +44,28 @@ class QuestionAnalysis(Base):
     # Relationships
     question = relationship("Question", back_populates="analysis")
 
+# Process statuses of pipelines still running or waiting to run
+ACTIVE_PROCESS_STATUSES = ("pending", "processing")
+ACTIVE_STATUS_CLAUSE = text("status IN ('pending', 'processing')")
+
 class Process(Base):
     """Process tracking for pipeline execution"""
     __tablename__ = "processes"
+    __table_args__ = (
+        Index("ix_processes_question_id_started_at", "question_id", "started_at"),  # Pipeline history
+        # Active processes: partial, since nearly every row is finished and a full status index goes unused.
+        # The query must render the same literal IN list to match it (see ProcessRepository.get_active_processes)
+        Index(
+            "ix_processes_active_status", "status",
+            sqlite_where=ACTIVE_STATUS_CLAUSE,
+            postgresql_where=ACTIVE_STATUS_CLAUSE
+        ),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     question_id = Column(String, ForeignKey("questions.id"), nullable=False)
+    batch_id = Column(String, nullable=True, index=True)  # Shared by processes started from one batch upload
+    batch_index = Column(Integer, nullable=True)  # Position of the question in its batch document
     status = Column(String(50), nullable=False, default="pending")  # pending, processing, completed, error, cancelled
     progress = Column(Integer, default=0)  # 0-100
     current_step = Column(String(200), nullable=True)
@@ -65,6 +81,9 @@ class Process(Base):
 class Story(Base):
     """Story data generated from questions"""
     __tablename__ = "stories"
+    __table_args__ = (
+        Index("ix_stories_question_id_created_at", "question_id", "created_at"),  # Latest story for a question
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     question_id = Column(String, ForeignKey("questions.id"), nullable=False)
@@ -87,6 +106,9 @@ class Story(Base):
 class Visualization(Base):
     """Generated HTML visualizations"""
     __tablename__ = "visualizations"
+    __table_args__ = (
+        Index("ix_visualizations_question_id_created_at", "question_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     process_id = Column(String, ForeignKey("processes.id"), nullable=False, unique=True)
@@ -104,6 +126,9 @@ class Visualization(Base):
 class GameBlueprint(Base):
     """Game blueprint JSON for template-based visualizations"""
     __tablename__ = "game_blueprints"
+    __table_args__ = (
+        Index("ix_game_blueprints_question_id_created_at", "question_id", "created_at"),  # Latest blueprint for a question
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     question_id = Column(String, ForeignKey("questions.id"), nullable=False)
@@ -135,6 +160,10 @@ class UserSession(Base):
 class PipelineStep(Base):
     """Individual pipeline step tracking"""
     __tablename__ = "pipeline_steps"
+    __table_args__ = (
+        Index("ix_pipeline_steps_process_id_step_number", "process_id", "step_number"),  # Steps of a process in order
+        Index("ix_pipeline_steps_process_id_status_step_number", "process_id", "status", "step_number"),  # Last completed / failed steps
+    )
     
     id = Column(String, primary_key=True, default=generate_uuid)
     process_id = Column(String, ForeignKey("processes.id"), nullable=False)
@@ -152,3 +181,31 @@ class PipelineStep(Base):
     # Relationships
     process = relationship("Process", back_populates="steps")
 
+class ContentBlob(Base):
+    """Content-addressed JSON payloads referenced from pipeline step rows"""
+    __tablename__ = "content_blobs"
+    
+    hash = Column(String(64), primary_key=True)  # SHA-256 of the canonical JSON
+    data = Column(JSON, nullable=False)
+    size = Column(Integer, nullable=False)  # Bytes of canonical JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PipelineJob(Base):
+    """Queued pipeline execution claimed by worker processes"""
+    __tablename__ = "pipeline_jobs"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    process_id = Column(String, ForeignKey("processes.id"), nullable=False, unique=True)
+    question_id = Column(String, ForeignKey("questions.id"), nullable=False)
+    status = Column(String(50), nullable=False, default="queued")  # queued, running, completed, error
+    worker_id = Column(String(200), nullable=True)  # Worker currently holding the job
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed while the worker is alive
+    completed_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    process = relationship("Process")
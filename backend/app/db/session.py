@@ -1,7 +1,7 @@
 """Database session management for FastAPI"""
 from sqlalchemy.orm import Session
 from fastapi import Depends
-from app.db.database import SessionLocal
+from app.db.database import SessionLocal, ReadSessionLocal
 
 def get_db_session() -> Session:
     """Dependency injection for database sessions in FastAPI routes"""
@@ -11,6 +11,15 @@ def get_db_session() -> Session:
     finally:
         db.close()
 
-# Alias for convenience
+def get_read_db_session() -> Session:
+    """Dependency injection for read-only database sessions in FastAPI routes"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Aliases for convenience
 get_db = get_db_session
+get_read_db = get_read_db_session
 
@@ -5,6 +5,10 @@ import os
 from app.utils.logger import setup_logger, initialize_run_logging, get_run_id, get_run_dir
 from app.db.database import init_db, engine
 from app.db import models
+from app.services.llm_service import get_llm_service
+from app.services.cache_service import get_cache_service
+from app.services.prompt_store import get_prompt_store
+from app.services.parse_pool import get_parse_pool
 from datetime import datetime
 import json
 
@@ -17,7 +21,7 @@ run_id, run_dir = initialize_run_logging()
 # Set up logging
 logger = setup_logger("main")
 
-from app.routes import upload, analyze, generate, progress, questions, visualizations
+from app.routes import upload, analyze, generate, progress, questions, visualizations, assets
 
 app = FastAPI(title="AI Learning Platform API", version="1.0.0")
 
@@ -37,11 +41,21 @@ async def startup_event():
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}", exc_info=True)
+    
+    # Load prompt files into memory before the first request needs them
+    get_prompt_store()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Application shutting down...")
+    # Release pooled LLM connections
+    try:
+        await get_llm_service().aclose()
+    except Exception as e:
+        logger.warning(f"Failed to close LLM clients: {e}")
+    # Stop document parsing workers
+    get_parse_pool().shutdown()
     # Update run metadata with end time
     if run_dir and (run_dir / "metadata.json").exists():
         try:
@@ -71,6 +85,7 @@ app.include_router(generate.router, prefix="/api", tags=["generate"])
 app.include_router(progress.router, prefix="/api", tags=["progress"])
 app.include_router(questions.router, prefix="/api", tags=["questions"])
 app.include_router(visualizations.router, prefix="/api", tags=["visualizations"])
+app.include_router(assets.router, prefix="/api", tags=["assets"])
 
 @app.get("/")
 async def root():
@@ -82,6 +97,16 @@ async def health():
     logger.debug("Health check endpoint accessed")
     return {"status": "healthy"}
 
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Get cache hit/miss/eviction counters"""
+    return get_cache_service().get_stats()
+
+@app.get("/api/parse/stats")
+async def get_parse_stats():
+    """Document parse pool queue depth and counters"""
+    return get_parse_pool().get_stats()
+
 @app.get("/api/run-info")
 async def get_run_info():
     """Get information about the current run"""
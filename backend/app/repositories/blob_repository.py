@@ -0,0 +1,133 @@
+"""Repository for content-addressed blobs of large step payloads"""
+import hashlib
+import json
+import os
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, List, Set, Iterable
+from app.db.models import ContentBlob
+from app.utils.logger import setup_logger
+
+logger = setup_logger("blob_repository")
+
+# Payload values at least this large (canonical JSON bytes) are stored once as blobs and referenced by hash
+BLOB_MIN_BYTES = int(os.getenv("BLOB_MIN_BYTES", "1024"))
+
+# A reference is a dict holding only this key: {"$blob": "<sha256>"}
+BLOB_REF_KEY = "$blob"
+
+def _canonical(value: Any) -> str:
+    """Key-sorted compact JSON, so equal values hash equally"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+def is_blob_ref(value: Any) -> bool:
+    """Check whether a value is a blob reference"""
+    return isinstance(value, dict) and len(value) == 1 and isinstance(value.get(BLOB_REF_KEY), str)
+
+class BlobRepository:
+    """Repository for deduplicated payload storage"""
+    
+    @staticmethod
+    def _put(db: Session, value: Any, canonical: str) -> str:
+        """Insert a blob unless it already exists (no commit); returns its hash"""
+        blob_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        db.execute(
+            insert(ContentBlob).values(
+                hash=blob_hash, data=json.loads(canonical), size=len(canonical)
+            ).on_conflict_do_nothing(index_elements=["hash"])
+        )
+        return blob_hash
+    
+    @staticmethod
+    def store_values(db: Session, data: Optional[Dict[str, Any]], min_bytes: int = BLOB_MIN_BYTES) -> Optional[Dict[str, Any]]:
+        """Replace each large top-level value with a blob reference (for accumulated state, where values repeat across steps)"""
+        if not isinstance(data, dict):
+            return data
+        stored = {}
+        for key, value in data.items():
+            canonical = _canonical(value)
+            if len(canonical) >= min_bytes and not is_blob_ref(value):
+                stored[key] = {BLOB_REF_KEY: BlobRepository._put(db, value, canonical)}
+            else:
+                stored[key] = value
+        return stored
+    
+    @staticmethod
+    def store(
+        db: Session,
+        data: Optional[Dict[str, Any]],
+        inline_keys: Iterable[str] = (),
+        min_bytes: int = BLOB_MIN_BYTES
+    ) -> Optional[Dict[str, Any]]:
+        """Replace a large payload with one blob reference, keeping inline_keys readable on the row"""
+        if not isinstance(data, dict):
+            return data
+        inline = {key: data[key] for key in inline_keys if key in data}
+        payload = {key: value for key, value in data.items() if key not in inline}
+        canonical = _canonical(payload)
+        if len(canonical) < min_bytes:
+            return data
+        return {BLOB_REF_KEY: BlobRepository._put(db, payload, canonical), **inline}
+    
+    @staticmethod
+    def get_many(db: Session, hashes: Iterable[str]) -> Dict[str, Any]:
+        """Load blobs by hash in one query"""
+        hashes = list(set(hashes))
+        if not hashes:
+            return {}
+        return {
+            row.hash: row.data
+            for row in db.query(ContentBlob.hash, ContentBlob.data).filter(ContentBlob.hash.in_(hashes))
+        }
+    
+    @staticmethod
+    def get(db: Session, blob_hash: str) -> Optional[ContentBlob]:
+        """Get a blob by hash"""
+        return db.query(ContentBlob).filter(ContentBlob.hash == blob_hash).first()
+    
+    @staticmethod
+    def _collect_refs(data: Any, hashes: Set[str]):
+        """Gather referenced hashes from nested dicts and lists"""
+        if isinstance(data, list):
+            for item in data:
+                BlobRepository._collect_refs(item, hashes)
+        elif isinstance(data, dict):
+            if isinstance(data.get(BLOB_REF_KEY), str):
+                hashes.add(data[BLOB_REF_KEY])
+            for value in data.values():
+                BlobRepository._collect_refs(value, hashes)
+    
+    @staticmethod
+    def _expand(data: Any, blobs: Dict[str, Any]) -> Any:
+        """Replace references anywhere in nested dicts and lists with their blob contents"""
+        if isinstance(data, list):
+            return [BlobRepository._expand(item, blobs) for item in data]
+        if not isinstance(data, dict):
+            return data
+        expanded = {key: BlobRepository._expand(value, blobs) for key, value in data.items() if key != BLOB_REF_KEY}
+        blob_hash = data.get(BLOB_REF_KEY)
+        if not isinstance(blob_hash, str):
+            return expanded
+        if blob_hash not in blobs:
+            logger.warning(f"Blob {blob_hash} referenced but missing")
+            return data
+        if not expanded:
+            return blobs[blob_hash]
+        # Whole-payload reference with inline keys alongside it
+        return {**blobs[blob_hash], **expanded} if isinstance(blobs[blob_hash], dict) else blobs[blob_hash]
+    
+    @staticmethod
+    def resolve_many(db: Session, payloads: List[Any]) -> List[Any]:
+        """Expand blob references in several payloads with one query; payloads without references pass through"""
+        hashes: Set[str] = set()
+        for payload in payloads:
+            BlobRepository._collect_refs(payload, hashes)
+        blobs = BlobRepository.get_many(db, hashes)
+        return [BlobRepository._expand(payload, blobs) for payload in payloads]
+    
+    @staticmethod
+    def resolve(db: Session, payload: Any) -> Any:
+        """Expand blob references in a payload"""
+        return BlobRepository.resolve_many(db, [payload])[0]
@@ -15,9 +15,10 @@ class GameBlueprintRepository:
         question_id: str,
         template_type: str,
         blueprint_json: Dict[str, Any],
-        assets_json: Optional[Dict[str, Any]] = None
+        assets_json: Optional[Dict[str, Any]] = None,
+        commit: bool = True
     ) -> GameBlueprint:
-        """Create a new game blueprint"""
+        """Create a new game blueprint (commit=False only flushes)"""
         blueprint = GameBlueprint(
             question_id=question_id,
             template_type=template_type,
@@ -25,8 +26,11 @@ class GameBlueprintRepository:
             assets_json=assets_json or {}
         )
         db.add(blueprint)
-        db.commit()
-        db.refresh(blueprint)
+        if commit:
+            db.commit()
+            db.refresh(blueprint)
+        else:
+            db.flush()
         logger.info(f"Created game blueprint: {blueprint.id} for question: {question_id}, template: {template_type}")
         return blueprint
     
@@ -0,0 +1,190 @@
+"""Repository for PipelineJob operations"""
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timedelta
+from app.db.models import PipelineJob
+from app.utils.logger import setup_logger
+
+logger = setup_logger("pipeline_job_repository")
+
+class PipelineJobRepository:
+    """Repository for the durable pipeline job queue"""
+    
+    @staticmethod
+    def enqueue(
+        db: Session,
+        process_id: str,
+        question_id: str,
+        max_attempts: int = 3
+    ) -> PipelineJob:
+        """Add a pipeline job to the queue"""
+        job = PipelineJob(
+            process_id=process_id,
+            question_id=question_id,
+            status="queued",
+            attempts=0,
+            max_attempts=max_attempts,
+            created_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        logger.info(f"Enqueued pipeline job: {job.id} for process: {process_id}")
+        return job
+    
+    @staticmethod
+    def enqueue_many(
+        db: Session,
+        jobs: List[Tuple[str, str]],
+        max_attempts: int = 3
+    ) -> int:
+        """Add (process_id, question_id) pipeline jobs to the queue in one transaction"""
+        now = datetime.utcnow()
+        db.add_all([
+            PipelineJob(
+                process_id=process_id,
+                question_id=question_id,
+                status="queued",
+                attempts=0,
+                max_attempts=max_attempts,
+                # Offset by position so workers claim them in submission order
+                created_at=now + timedelta(microseconds=index)
+            )
+            for index, (process_id, question_id) in enumerate(jobs)
+        ])
+        db.commit()
+        logger.info(f"Enqueued {len(jobs)} pipeline jobs")
+        return len(jobs)
+    
+    @staticmethod
+    def _claimable(stale_before: datetime):
+        """Filter for jobs a worker may claim: queued, or running with an expired lease"""
+        return and_(
+            or_(
+                PipelineJob.status == "queued",
+                and_(PipelineJob.status == "running", PipelineJob.heartbeat_at < stale_before)
+            ),
+            PipelineJob.attempts < PipelineJob.max_attempts
+        )
+    
+    @staticmethod
+    def claim_next(db: Session, worker_id: str, lease_seconds: int) -> Optional[PipelineJob]:
+        """Atomically claim the oldest claimable job.
+        
+        Uses a compare-and-set UPDATE so two workers racing for the same row
+        cannot both win; the loser simply tries the next candidate.
+        """
+        for _ in range(5):
+            now = datetime.utcnow()
+            stale_before = now - timedelta(seconds=lease_seconds)
+            candidate = db.query(PipelineJob.id).filter(
+                PipelineJobRepository._claimable(stale_before)
+            ).order_by(PipelineJob.created_at).first()
+            
+            if not candidate:
+                db.commit()  # End the read transaction
+                return None
+            
+            claimed = db.query(PipelineJob).filter(
+                PipelineJob.id == candidate.id,
+                PipelineJobRepository._claimable(stale_before)
+            ).update({
+                PipelineJob.status: "running",
+                PipelineJob.worker_id: worker_id,
+                PipelineJob.attempts: PipelineJob.attempts + 1,
+                PipelineJob.claimed_at: now,
+                PipelineJob.heartbeat_at: now
+            }, synchronize_session=False)
+            db.commit()
+            
+            if claimed == 1:
+                job = PipelineJobRepository.get_by_id(db, candidate.id)
+                logger.info(f"Worker {worker_id} claimed job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+                return job
+        
+        return None
+    
+    @staticmethod
+    def heartbeat(db: Session, job_ids: List[str], worker_id: str) -> List[str]:
+        """Refresh the lease on jobs held by a worker; returns the IDs still owned"""
+        if not job_ids:
+            return []
+        owned = PipelineJobRepository._owned_by(worker_id)
+        db.query(PipelineJob).filter(
+            PipelineJob.id.in_(job_ids), *owned
+        ).update({PipelineJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        still_owned = [row.id for row in db.query(PipelineJob.id).filter(PipelineJob.id.in_(job_ids), *owned)]
+        db.commit()
+        return still_owned
+    
+    @staticmethod
+    def _owned_by(worker_id: str) -> list:
+        """Filter for jobs a worker still holds the lease on"""
+        return [PipelineJob.worker_id == worker_id, PipelineJob.status == "running"]
+    
+    @staticmethod
+    def _finish(db: Session, job_id: str, worker_id: Optional[str], values: Dict) -> Optional[PipelineJob]:
+        """Set a job's final state; with worker_id, only while that worker still holds the lease"""
+        filters = [PipelineJob.id == job_id]
+        if worker_id is not None:
+            filters += PipelineJobRepository._owned_by(worker_id)
+        updated = db.query(PipelineJob).filter(*filters).update(values, synchronize_session=False)
+        db.commit()
+        if not updated:
+            return None
+        return PipelineJobRepository.get_by_id(db, job_id)
+    
+    @staticmethod
+    def complete(db: Session, job_id: str, worker_id: Optional[str] = None) -> Optional[PipelineJob]:
+        """Mark a job as completed (if worker_id is given, only if it still owns the job)"""
+        job = PipelineJobRepository._finish(db, job_id, worker_id, {
+            PipelineJob.status: "completed",
+            PipelineJob.completed_at: datetime.utcnow()
+        })
+        if job:
+            logger.info(f"Completed pipeline job: {job_id}")
+        else:
+            logger.warning(f"Pipeline job {job_id} not completed: not found or no longer held by {worker_id}")
+        return job
+    
+    @staticmethod
+    def fail(db: Session, job_id: str, error_message: str, worker_id: Optional[str] = None) -> Optional[PipelineJob]:
+        """Mark a job as failed (if worker_id is given, only if it still owns the job)"""
+        job = PipelineJobRepository._finish(db, job_id, worker_id, {
+            PipelineJob.status: "error",
+            PipelineJob.error_message: error_message,
+            PipelineJob.completed_at: datetime.utcnow()
+        })
+        if job:
+            logger.info(f"Failed pipeline job: {job_id} - {error_message}")
+        else:
+            logger.warning(f"Pipeline job {job_id} not failed: not found or no longer held by {worker_id}")
+        return job
+    
+    @staticmethod
+    def get_exhausted(db: Session, lease_seconds: int) -> List[PipelineJob]:
+        """Get abandoned jobs that have no attempts left"""
+        stale_before = datetime.utcnow() - timedelta(seconds=lease_seconds)
+        return db.query(PipelineJob).filter(
+            PipelineJob.status == "running",
+            PipelineJob.heartbeat_at < stale_before,
+            PipelineJob.attempts >= PipelineJob.max_attempts
+        ).all()
+    
+    @staticmethod
+    def get_by_id(db: Session, job_id: str) -> Optional[PipelineJob]:
+        """Get job by ID"""
+        return db.query(PipelineJob).filter(PipelineJob.id == job_id).first()
+    
+    @staticmethod
+    def get_by_process_id(db: Session, process_id: str) -> Optional[PipelineJob]:
+        """Get job for a process"""
+        return db.query(PipelineJob).filter(PipelineJob.process_id == process_id).first()
+    
+    @staticmethod
+    def count_by_status(db: Session) -> Dict[str, int]:
+        """Count jobs per status (queue depth metrics)"""
+        from sqlalchemy import func
+        rows = db.query(PipelineJob.status, func.count(PipelineJob.id)).group_by(PipelineJob.status).all()
+        return {status: count for status, count in rows}
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from app.db.models import PipelineStep
+from app.services.progress_broker import get_progress_broker, step_event, publish_on_commit
 from app.utils.logger import setup_logger
 
 logger = setup_logger("pipeline_step_repository")
@@ -16,9 +17,10 @@ class PipelineStepRepository:
         process_id: str,
         step_name: str,
         step_number: int,
-        input_data: Optional[Dict[str, Any]] = None
+        input_data: Optional[Dict[str, Any]] = None,
+        commit: bool = True
     ) -> PipelineStep:
-        """Create a new pipeline step"""
+        """Create a new pipeline step (commit=False only flushes)"""
         step = PipelineStep(
             process_id=process_id,
             step_name=step_name,
@@ -28,11 +30,21 @@ class PipelineStepRepository:
             started_at=datetime.utcnow()
         )
         db.add(step)
-        db.commit()
-        db.refresh(step)
+        PipelineStepRepository._save(db, step, commit)
         logger.info(f"Created pipeline step: {step.id} - {step_name} (step {step_number})")
         return step
     
+    @staticmethod
+    def _save(db: Session, step: PipelineStep, commit: bool):
+        """Commit and publish a step change, or flush it and publish on the caller's commit"""
+        if commit:
+            db.commit()
+            db.refresh(step)
+            get_progress_broker().publish(step.process_id, step_event(step))
+        else:
+            db.flush()
+            publish_on_commit(db, step.process_id, step_event(step))
+    
     @staticmethod
     def get_by_id(db: Session, step_id: str) -> Optional[PipelineStep]:
         """Get step by ID"""
@@ -52,9 +64,10 @@ class PipelineStepRepository:
         status: str,
         output_data: Optional[Dict[str, Any]] = None,
         error_message: Optional[str] = None,
-        validation_result: Optional[Dict[str, Any]] = None
+        validation_result: Optional[Dict[str, Any]] = None,
+        commit: bool = True
     ) -> Optional[PipelineStep]:
-        """Update step status"""
+        """Update step status (commit=False only flushes; the caller's next commit publishes it)"""
         step = PipelineStepRepository.get_by_id(db, step_id)
         if not step:
             return None
@@ -72,8 +85,7 @@ class PipelineStepRepository:
         elif status in ["completed", "error", "skipped"]:
             step.completed_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(step)
+        PipelineStepRepository._save(db, step, commit)
         logger.info(f"Updated step {step_id}: status={status}")
         return step
     
@@ -90,6 +102,7 @@ class PipelineStepRepository:
         step.completed_at = None
         db.commit()
         db.refresh(step)
+        get_progress_broker().publish(step.process_id, step_event(step))
         logger.info(f"Incremented retry count for step {step_id}: {step.retry_count}")
         return step
     
@@ -103,9 +116,9 @@ class PipelineStepRepository:
     
     @staticmethod
     def get_last_completed_step(db: Session, process_id: str) -> Optional[PipelineStep]:
-        """Get the last completed step for a process"""
+        """Get the last finished (completed or skipped) step for a process"""
         return db.query(PipelineStep).filter(
             PipelineStep.process_id == process_id,
-            PipelineStep.status == "completed"
+            PipelineStep.status.in_(["completed", "skipped"])
         ).order_by(PipelineStep.step_number.desc()).first()
 
@@ -1,8 +1,10 @@
 """Repository for Process operations"""
+from sqlalchemy import bindparam
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from app.db.models import Process
+from app.db.models import Process, PipelineStep, Visualization, generate_uuid, ACTIVE_PROCESS_STATUSES
+from app.services.progress_broker import get_progress_broker, process_event, publish_on_commit
 from app.utils.logger import setup_logger
 
 logger = setup_logger("process_repository")
@@ -25,6 +27,36 @@ class ProcessRepository:
         logger.info(f"Created process: {process.id} for question: {question_id}")
         return process
     
+    @staticmethod
+    def bulk_create(
+        db: Session,
+        question_ids: List[str],
+        batch_id: Optional[str] = None,
+        initial_status: str = "pending",
+        commit: bool = True
+    ) -> List[str]:
+        """Create one process per question in one transaction; returns their IDs in order (commit=False only flushes)"""
+        now = datetime.utcnow()
+        process_ids = [generate_uuid() for _ in question_ids]
+        db.add_all([
+            Process(
+                id=process_id,
+                question_id=question_id,
+                batch_id=batch_id,
+                batch_index=index if batch_id else None,
+                status=initial_status,
+                progress=0,
+                started_at=now
+            )
+            for index, (process_id, question_id) in enumerate(zip(process_ids, question_ids))
+        ])
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        logger.info(f"Created {len(process_ids)} processes for batch: {batch_id}")
+        return process_ids
+    
     @staticmethod
     def get_by_id(db: Session, process_id: str) -> Optional[Process]:
         """Get process by ID - don't eagerly load visualization to avoid relationship issues"""
@@ -39,9 +71,10 @@ class ProcessRepository:
         status: str,
         progress: Optional[int] = None,
         current_step: Optional[str] = None,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        commit: bool = True
     ) -> Optional[Process]:
-        """Update process status"""
+        """Update process status (commit=False only flushes; the caller's next commit publishes it)"""
         process = ProcessRepository.get_by_id(db, process_id)
         if not process:
             return None
@@ -57,8 +90,13 @@ class ProcessRepository:
         if status in ["completed", "error", "cancelled"]:
             process.completed_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(process)
+        if commit:
+            db.commit()
+            db.refresh(process)
+            get_progress_broker().publish(process_id, process_event(process))
+        else:
+            db.flush()
+            publish_on_commit(db, process_id, process_event(process))
         logger.info(f"Updated process {process_id}: status={status}, progress={progress}")
         return process
     
@@ -70,7 +108,118 @@ class ProcessRepository:
     @staticmethod
     def get_active_processes(db: Session):
         """Get all active processes"""
+        # Statuses are rendered as literals so the partial index on active processes applies
         return db.query(Process).filter(
-            Process.status.in_(["pending", "processing"])
+            Process.status.in_(bindparam("active_statuses", ACTIVE_PROCESS_STATUSES, expanding=True, literal_execute=True))
         ).all()
-
+    
+    @staticmethod
+    def get_progress_view(
+        db: Session,
+        process_id: str,
+        include_validation: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Get process, steps and visualization ID for progress reporting in one query"""
+        columns = [
+            Process.status,
+            Process.progress,
+            Process.current_step,
+            Process.error_message,
+            Visualization.id.label("visualization_id"),
+            PipelineStep.id.label("step_id"),
+            PipelineStep.step_name,
+            PipelineStep.step_number,
+            PipelineStep.status.label("step_status"),
+            PipelineStep.error_message.label("step_error_message"),
+            PipelineStep.retry_count,
+            PipelineStep.started_at,
+            PipelineStep.completed_at,
+            # Read only the cache flag instead of loading the whole output blob
+            PipelineStep.output_data["_cached"].as_boolean().label("cached")
+        ]
+        if include_validation:
+            columns.append(PipelineStep.validation_result)
+        
+        rows = db.query(*columns).select_from(Process).outerjoin(
+            Visualization, Visualization.process_id == Process.id
+        ).outerjoin(
+            PipelineStep, PipelineStep.process_id == Process.id
+        ).filter(
+            Process.id == process_id
+        ).order_by(PipelineStep.step_number).all()
+        
+        if not rows:
+            return None
+        
+        first = rows[0]
+        steps = []
+        for row in rows:
+            if row.step_id is None:
+                continue
+            step = {
+                "id": row.step_id,
+                "step_name": row.step_name,
+                "step_number": row.step_number,
+                "status": row.step_status,
+                "error_message": row.step_error_message,
+                "retry_count": row.retry_count or 0,
+                "started_at": row.started_at.isoformat() if row.started_at else None,
+                "completed_at": row.completed_at.isoformat() if row.completed_at else None,
+                "cached": bool(row.cached)
+            }
+            if include_validation:
+                step["validation_result"] = row.validation_result
+            steps.append(step)
+        
+        return {
+            "process_id": process_id,
+            "status": first.status,
+            "progress": first.progress,
+            "current_step": first.current_step,
+            "error_message": first.error_message,
+            "visualization_id": first.visualization_id,
+            "steps": steps
+        }
+    
+    @staticmethod
+    def get_batch_progress(db: Session, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Aggregate progress of every process in a batch in one query"""
+        rows = db.query(
+            Process.id,
+            Process.question_id,
+            Process.status,
+            Process.progress,
+            Process.current_step,
+            Process.error_message,
+            Visualization.id.label("visualization_id")
+        ).outerjoin(
+            Visualization, Visualization.process_id == Process.id
+        ).filter(
+            Process.batch_id == batch_id
+        ).order_by(Process.batch_index).all()
+        
+        if not rows:
+            return None
+        
+        status_counts: Dict[str, int] = {}
+        for row in rows:
+            status_counts[row.status] = status_counts.get(row.status, 0) + 1
+        
+        return {
+            "batch_id": batch_id,
+            "total": len(rows),
+            "status_counts": status_counts,
+            "progress": round(sum(row.progress or 0 for row in rows) / len(rows)),
+            "processes": [
+                {
+                    "process_id": row.id,
+                    "question_id": row.question_id,
+                    "status": row.status,
+                    "progress": row.progress or 0,
+                    "current_step": row.current_step,
+                    "error_message": row.error_message,
+                    "visualization_id": row.visualization_id
+                }
+                for row in rows
+            ]
+        }
@@ -1,7 +1,7 @@
 """Repository for Question operations"""
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
-from app.db.models import Question
+from typing import Optional, Dict, Any, List
+from app.db.models import Question, generate_uuid
 from app.utils.logger import setup_logger
 
 logger = setup_logger("question_repository")
@@ -24,6 +24,28 @@ class QuestionRepository:
         logger.info(f"Created question: {question.id}")
         return question
     
+    @staticmethod
+    def bulk_create(db: Session, questions_data: List[Dict[str, Any]], commit: bool = True) -> List[str]:
+        """Create several questions in one transaction; returns their IDs in order (commit=False only flushes)"""
+        # Assign IDs up front so callers don't have to reload every row after the commit
+        question_ids = [generate_uuid() for _ in questions_data]
+        db.add_all([
+            Question(
+                id=question_id,
+                text=question_data["text"],
+                options=question_data.get("options"),
+                file_type=question_data.get("file_type"),
+                full_text=question_data.get("full_text", question_data.get("text"))
+            )
+            for question_id, question_data in zip(question_ids, questions_data)
+        ])
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        logger.info(f"Created {len(question_ids)} questions")
+        return question_ids
+    
     @staticmethod
     def get_by_id(db: Session, question_id: str) -> Optional[Question]:
         """Get question by ID"""
@@ -10,8 +10,8 @@ class StoryRepository:
     """Repository for story data operations"""
     
     @staticmethod
-    def create(db: Session, question_id: str, story_data: Dict[str, Any]) -> Story:
-        """Create a new story from story data"""
+    def create(db: Session, question_id: str, story_data: Dict[str, Any], commit: bool = True) -> Story:
+        """Create a new story from story data (commit=False only flushes)"""
         story = Story(
             question_id=question_id,
             story_title=story_data.get("story_title", "Untitled"),
@@ -27,8 +27,11 @@ class StoryRepository:
             question_implementation_notes=story_data.get("question_implementation_notes")
         )
         db.add(story)
-        db.commit()
-        db.refresh(story)
+        if commit:
+            db.commit()
+            db.refresh(story)
+        else:
+            db.flush()
         logger.info(f"Created story: {story.id} for question: {question_id}")
         return story
     
@@ -15,9 +15,10 @@ class VisualizationRepository:
         process_id: str,
         question_id: str,
         html_content: str,
-        story_data_json: Dict[str, Any]
+        story_data_json: Dict[str, Any],
+        commit: bool = True
     ) -> Visualization:
-        """Create a new visualization"""
+        """Create a new visualization (commit=False only flushes)"""
         visualization = Visualization(
             process_id=process_id,
             question_id=question_id,
@@ -25,8 +26,11 @@ class VisualizationRepository:
             story_data_json=story_data_json
         )
         db.add(visualization)
-        db.commit()
-        db.refresh(visualization)
+        if commit:
+            db.commit()
+            db.refresh(visualization)
+        else:
+            db.flush()
         logger.info(f"Created visualization: {visualization.id} for process: {process_id}")
         return visualization
     
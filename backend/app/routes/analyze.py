@@ -1,5 +1,6 @@
 """Analyze route - refactored to use database"""
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.services.pipeline.layer2_classification import ClassificationOrchestrator
 from app.repositories.question_repository import QuestionRepository
@@ -27,7 +28,7 @@ async def analyze_question(
     try:
         # Use classification orchestrator
         classifier = ClassificationOrchestrator()
-        result = classifier.analyze_question(question.text, question.options)
+        result = await run_in_threadpool(classifier.analyze_question, question.text, question.options)
         analysis_data = result["data"]
         
         # Store analysis in database
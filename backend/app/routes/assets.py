@@ -0,0 +1,29 @@
+"""Asset routes - serve generated assets from the content-addressed store"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from app.services.asset_store import get_asset_store
+from app.utils.logger import setup_logger
+
+logger = setup_logger("assets")
+
+router = APIRouter()
+
+@router.get("/assets/{asset_key}")
+async def get_asset(asset_key: str):
+    """Serve a stored asset by its content hash"""
+    store = get_asset_store()
+
+    if not store.is_valid_key(asset_key):
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    path = store.get_path(asset_key)
+    if not path.exists():
+        logger.warning(f"[API] Asset {asset_key[:8]}... not found")
+        raise HTTPException(status_code=404, detail="Asset not found")
+
+    # Content-addressed, so the bytes behind a key never change
+    return FileResponse(
+        path,
+        media_type=store.get_media_type(asset_key),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
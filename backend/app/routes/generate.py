@@ -1,38 +1,96 @@
 """Generate route - refactored to use orchestrator and database"""
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.services.pipeline.orchestrator import PipelineOrchestrator
 from app.repositories.question_repository import QuestionRepository
 from app.repositories.process_repository import ProcessRepository
 from app.repositories.visualization_repository import VisualizationRepository
 from app.repositories.game_blueprint_repository import GameBlueprintRepository
+from app.repositories.pipeline_job_repository import PipelineJobRepository
 from app.db.session import get_db
 from app.utils.logger import setup_logger
+from typing import List, Tuple
 import uuid
 import asyncio
+import os
 
 # Set up logging
 logger = setup_logger("generate")
 
 router = APIRouter()
 
+# Where pipelines run: "background" (in the API process) or "queue" (claimed by worker processes)
+PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "background")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Pipelines of one batch upload run at the same time in the background executor
+BATCH_PIPELINE_CONCURRENCY = int(os.getenv("BATCH_PIPELINE_CONCURRENCY", "4"))
+
+def _run_pipeline(process_id: str, question_id: str):
+    """Run the (blocking) pipeline with its own database session"""
+    from app.db.database import SessionLocal
+    db = SessionLocal()
+    try:
+        orchestrator = PipelineOrchestrator(db)
+        return orchestrator.execute_pipeline(process_id, question_id)
+    finally:
+        db.close()
+
 async def process_pipeline_background(
     process_id: str,
     question_id: str
 ):
     """Background task to process question through pipeline"""
-    from app.db.database import SessionLocal
-    db = SessionLocal()
     try:
-        orchestrator = PipelineOrchestrator(db)
-        result = orchestrator.execute_pipeline(process_id, question_id)
+        # The pipeline makes blocking LLM calls, so keep it off the event loop
+        result = await run_in_threadpool(_run_pipeline, process_id, question_id)
         logger.info(f"Background pipeline completed: {process_id}")
         return result
     except Exception as e:
         logger.error(f"Background pipeline failed: {e}", exc_info=True)
         raise
-    finally:
-        db.close()
+
+async def process_batch_background(jobs: List[Tuple[str, str]]):
+    """Background task to process a batch of (process_id, question_id) pipelines with bounded concurrency"""
+    semaphore = asyncio.Semaphore(max(1, BATCH_PIPELINE_CONCURRENCY))
+    
+    async def run(process_id: str, question_id: str):
+        async with semaphore:
+            try:
+                await process_pipeline_background(process_id, question_id)
+            except Exception:
+                pass  # Already logged; the process row records the error
+    
+    await asyncio.gather(*(run(process_id, question_id) for process_id, question_id in jobs))
+    logger.info(f"Background batch completed: {len(jobs)} pipelines")
+
+def dispatch_pipeline(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    process_id: str,
+    question_id: str
+):
+    """Hand a pipeline run to the configured executor"""
+    if PIPELINE_EXECUTOR == "queue":
+        PipelineJobRepository.enqueue(db, process_id, question_id, max_attempts=JOB_MAX_ATTEMPTS)
+        logger.info(f"[API] Pipeline job queued for process_id={process_id}")
+    else:
+        background_tasks.add_task(process_pipeline_background, process_id, question_id)
+        logger.info(f"[API] Background task added for process_id={process_id}")
+
+def dispatch_pipelines(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    jobs: List[Tuple[str, str]]
+):
+    """Hand a batch of (process_id, question_id) pipeline runs to the configured executor"""
+    if PIPELINE_EXECUTOR == "queue":
+        PipelineJobRepository.enqueue_many(db, jobs, max_attempts=JOB_MAX_ATTEMPTS)
+        logger.info(f"[API] {len(jobs)} pipeline jobs queued")
+    else:
+        background_tasks.add_task(process_batch_background, jobs)
+        logger.info(f"[API] Background batch task added for {len(jobs)} pipelines")
 
 @router.post("/process/{question_id}")
 async def start_processing(
@@ -56,8 +114,7 @@ async def start_processing(
     logger.info(f"[API] Starting processing pipeline - process_id={process_id}, question_id={question_id}")
     
     # Start background processing
-    background_tasks.add_task(process_pipeline_background, process_id, question_id)
-    logger.info(f"[API] Background task added for process_id={process_id}")
+    dispatch_pipeline(db, background_tasks, process_id, question_id)
     
     return {
         "process_id": process_id,
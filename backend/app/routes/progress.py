@@ -1,115 +1,271 @@
 """Progress route - refactored to use database"""
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Optional, Dict, Any, List
 from app.repositories.process_repository import ProcessRepository
 from app.repositories.pipeline_step_repository import PipelineStepRepository
+from app.repositories.blob_repository import BlobRepository
 from app.services.pipeline.orchestrator import PipelineOrchestrator
-from app.db.session import get_db
+from app.services.progress_broker import get_progress_broker
+from app.db.database import ReadSessionLocal
+from app.db.session import get_db, get_read_db
 from app.utils.logger import setup_logger
+import json
+import os
+import time
 
 # Set up logging
 logger = setup_logger("progress")
 
 router = APIRouter()
 
+# SSE stream tuning: comment keepalives, and how often an idle stream re-reads the DB
+# to pick up updates published by other processes (queue workers)
+PROGRESS_STREAM_KEEPALIVE = float(os.getenv("PROGRESS_STREAM_KEEPALIVE", "15"))
+PROGRESS_STREAM_RESYNC_INTERVAL = float(os.getenv("PROGRESS_STREAM_RESYNC_INTERVAL", "10"))
+
+TERMINAL_STATUSES = {"completed", "error", "cancelled"}
+
+def _calculate_progress(progress: Optional[int], steps: List[Dict[str, Any]]) -> int:
+    """Use the stored process progress if available, otherwise calculate from steps"""
+    calculated_progress = progress if progress is not None else 0
+    
+    # Fallback: Calculate progress from steps if process.progress is 0 or None
+    if calculated_progress == 0 and steps:
+        # Count completed and processing steps
+        completed_steps = [s for s in steps if s["status"] == 'completed']
+        processing_steps = [s for s in steps if s["status"] == 'processing']
+        
+        # Total pipeline steps (9 steps total)
+        total_steps = 9
+        
+        if completed_steps:
+            # Progress based on completed steps
+            calculated_progress = int((len(completed_steps) / total_steps) * 100)
+        elif processing_steps:
+            # If a step is processing, show progress at start of that step
+            processing_step = processing_steps[0]
+            # Progress = (step_number - 1) / total_steps * 100
+            calculated_progress = int(((processing_step["step_number"] - 1) / total_steps) * 100)
+    
+    # Ensure progress is between 0 and 100
+    return max(0, min(100, calculated_progress))
+
+def _build_progress(
+    db: Session,
+    process_id: str,
+    include_validation: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Build the progress response for a process, or None if it does not exist"""
+    view = ProcessRepository.get_progress_view(db, process_id, include_validation=include_validation)
+    if not view:
+        return None
+    
+    view["progress"] = _calculate_progress(view["progress"], view["steps"])
+    view["current_step"] = view["current_step"] or "Initializing"
+    return view
+
 @router.get("/progress/{process_id}")
 async def get_progress(
     process_id: str,
-    db: Session = Depends(get_db)
+    include_validation: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    """Get progress status for a process"""
+    """Get progress status for a process (validation results only if requested)"""
     logger.info(f"[API] /progress/{process_id} - Request received")
     
     try:
-        process = ProcessRepository.get_by_id(db, process_id)
-        if not process:
+        progress = _build_progress(db, process_id, include_validation=include_validation)
+        if not progress:
             logger.warning(f"[API] Process {process_id} not found")
             raise HTTPException(status_code=404, detail="Process not found")
         
-        # Get all steps for this process
-        steps = PipelineStepRepository.get_by_process_id(db, process_id)
-        
-        # Get visualization ID if exists - query separately to avoid relationship issues
-        from app.repositories.visualization_repository import VisualizationRepository
-        visualization_id = None
-        try:
-            visualization = VisualizationRepository.get_by_process_id(db, process_id)
-            if visualization:
-                visualization_id = visualization.id
-                logger.debug(f"[API] Process {process_id} has visualization: {visualization_id}")
-            else:
-                logger.debug(f"[API] Process {process_id} has no visualization yet")
-        except Exception as e:
-            logger.warning(f"[API] Error loading visualization for process {process_id}: {e}")
-            # Continue without visualization_id
-            pass
-        
-        # Calculate progress - use process.progress if available, otherwise calculate from steps
-        calculated_progress = process.progress if process.progress is not None else 0
-        
-        # Fallback: Calculate progress from steps if process.progress is 0 or None
-        if calculated_progress == 0 and steps:
-            # Count completed and processing steps
-            completed_steps = [s for s in steps if s.status == 'completed']
-            processing_steps = [s for s in steps if s.status == 'processing']
-            
-            # Total pipeline steps (9 steps total)
-            total_steps = 9
-            
-            if completed_steps:
-                # Progress based on completed steps
-                calculated_progress = int((len(completed_steps) / total_steps) * 100)
-            elif processing_steps:
-                # If a step is processing, show progress at start of that step
-                processing_step = processing_steps[0]
-                # Progress = (step_number - 1) / total_steps * 100
-                calculated_progress = int(((processing_step.step_number - 1) / total_steps) * 100)
-        
-        # Ensure progress is between 0 and 100
-        calculated_progress = max(0, min(100, calculated_progress))
-        
-        logger.info(f"[API] Returning status: {process.status}, progress: {calculated_progress}%, steps: {len(steps)}, visualization_id: {visualization_id}")
-        
-        return {
-            "process_id": process_id,
-            "status": process.status,
-            "progress": calculated_progress,
-            "current_step": process.current_step or "Initializing",
-            "visualization_id": visualization_id,
-            "error_message": process.error_message,
-            "steps": [
-                {
-                    "id": step.id,
-                    "step_name": step.step_name,
-                    "step_number": step.step_number,
-                    "status": step.status,
-                    "error_message": step.error_message,
-                    "retry_count": getattr(step, 'retry_count', 0) or 0,
-                    "started_at": step.started_at.isoformat() if step.started_at else None,
-                    "completed_at": step.completed_at.isoformat() if step.completed_at else None,
-                    "validation_result": step.validation_result,
-                    "cached": step.output_data.get("_cached", False) if step.output_data else False
-                }
-                for step in steps
-            ]
-        }
+        logger.info(
+            f"[API] Returning status: {progress['status']}, progress: {progress['progress']}%, "
+            f"steps: {len(progress['steps'])}, visualization_id: {progress['visualization_id']}"
+        )
+        return progress
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"[API] Error getting progress for {process_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error getting progress: {str(e)}")
 
+@router.get("/batch/{batch_id}/progress")
+async def get_batch_progress(
+    batch_id: str,
+    db: Session = Depends(get_read_db)
+):
+    """Get aggregate progress for every process started by a batch upload"""
+    logger.info(f"[API] /batch/{batch_id}/progress - Request received")
+    
+    try:
+        progress = ProcessRepository.get_batch_progress(db, batch_id)
+        if not progress:
+            logger.warning(f"[API] Batch {batch_id} not found")
+            raise HTTPException(status_code=404, detail="Batch not found")
+        
+        counts = progress["status_counts"]
+        finished = sum(count for status, count in counts.items() if status in TERMINAL_STATUSES)
+        if finished < progress["total"]:
+            progress["status"] = "processing"
+        elif counts.get("completed", 0) == progress["total"]:
+            progress["status"] = "completed"
+        else:
+            progress["status"] = "completed_with_errors"
+        progress["finished"] = finished
+        
+        logger.info(
+            f"[API] Batch {batch_id} status: {progress['status']}, progress: {progress['progress']}%, "
+            f"finished: {finished}/{progress['total']}"
+        )
+        return progress
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[API] Error getting batch progress for {batch_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error getting batch progress: {str(e)}")
+
+def _load_progress(process_id: str) -> Optional[Dict[str, Any]]:
+    """Build a progress snapshot with its own session (for use off the event loop)"""
+    db = ReadSessionLocal()
+    try:
+        return _build_progress(db, process_id)
+    finally:
+        db.close()
+
+def _apply_event(state: Dict[str, Any], event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Merge an event into the stream's known state; returns only what changed"""
+    if event["type"] == "process":
+        changed = {
+            key: value for key, value in event.items()
+            if key != "type" and value is not None and state.get(key) != value
+        }
+        if "progress" in changed:
+            # Progress never moves backwards within a stream
+            if changed["progress"] <= state.get("progress", 0):
+                del changed["progress"]
+        state.update(changed)
+        return {"type": "process", **changed} if changed else None
+    
+    steps = state.setdefault("steps", [])
+    existing = next((s for s in steps if s["id"] == event["id"]), None)
+    step = {key: value for key, value in event.items() if key != "type"}
+    if existing is None:
+        steps.append(step)
+        return event
+    if any(existing.get(key) != value for key, value in step.items()):
+        existing.update(step)
+        return event
+    return None
+
+def _diff_snapshot(state: Dict[str, Any], snapshot: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Turn a fresh DB snapshot into deltas against the stream's known state"""
+    deltas = []
+    for step in snapshot["steps"]:
+        delta = _apply_event(state, {"type": "step", **step})
+        if delta:
+            deltas.append(delta)
+    delta = _apply_event(state, {
+        "type": "process",
+        "status": snapshot["status"],
+        "progress": snapshot["progress"],
+        "current_step": snapshot["current_step"],
+        "error_message": snapshot["error_message"],
+        "visualization_id": snapshot["visualization_id"]
+    })
+    if delta:
+        deltas.append(delta)
+    return deltas
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("/progress/{process_id}/stream")
+async def stream_progress(process_id: str, request: Request):
+    """Stream progress as Server-Sent Events: a snapshot, then deltas"""
+    logger.info(f"[API] /progress/{process_id}/stream - Client connected")
+    broker = get_progress_broker()
+    
+    # Subscribe before taking the snapshot so no update falls in between
+    subscription = broker.subscribe(process_id)
+    try:
+        snapshot = await run_in_threadpool(_load_progress, process_id)
+    except Exception:
+        broker.unsubscribe(subscription)
+        raise
+    if not snapshot:
+        broker.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Process not found")
+    
+    async def event_stream():
+        state = snapshot
+        try:
+            yield _sse("snapshot", state)
+            last_sent = time.monotonic()
+            last_synced = last_sent
+            
+            while state["status"] not in TERMINAL_STATUSES:
+                if await request.is_disconnected():
+                    break
+                
+                event = await subscription.get(timeout=min(PROGRESS_STREAM_KEEPALIVE, PROGRESS_STREAM_RESYNC_INTERVAL))
+                if event:
+                    deltas = [delta for delta in [_apply_event(state, event)] if delta]
+                    if state["status"] in TERMINAL_STATUSES:
+                        # The visualization is written before completion; pick up its id
+                        deltas.extend(_diff_snapshot(state, await run_in_threadpool(_load_progress, process_id)))
+                elif time.monotonic() - last_synced >= PROGRESS_STREAM_RESYNC_INTERVAL:
+                    # Nothing published in this process (e.g. a queue worker is running the
+                    # pipeline), so diff against the database instead
+                    latest = await run_in_threadpool(_load_progress, process_id)
+                    last_synced = time.monotonic()
+                    deltas = _diff_snapshot(state, latest) if latest else []
+                else:
+                    deltas = []
+                
+                for delta in deltas:
+                    yield _sse(delta["type"], delta)
+                    last_sent = time.monotonic()
+                
+                if time.monotonic() - last_sent >= PROGRESS_STREAM_KEEPALIVE:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            broker.unsubscribe(subscription)
+            logger.info(f"[API] /progress/{process_id}/stream - Stream closed")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/pipeline/steps/{process_id}")
 async def get_pipeline_steps(
     process_id: str,
-    db: Session = Depends(get_db)
+    resolve_blobs: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    """Get all steps for a process"""
+    """Get all steps for a process.
+    
+    Large payloads come back as {"$blob": hash} references that clients load
+    on demand from /pipeline/blobs/{hash}; resolve_blobs=true inlines them.
+    """
     steps = PipelineStepRepository.get_by_process_id(db, process_id)
     
     if not steps:
         raise HTTPException(status_code=404, detail="Process not found or has no steps")
     
+    inputs = [step.input_data for step in steps]
+    outputs = [step.output_data for step in steps]
+    if resolve_blobs:
+        payloads = BlobRepository.resolve_many(db, inputs + outputs)
+        inputs, outputs = payloads[:len(steps)], payloads[len(steps):]
+    
     return {
         "process_id": process_id,
         "steps": [
@@ -118,18 +274,29 @@ async def get_pipeline_steps(
                 "step_name": step.step_name,
                 "step_number": step.step_number,
                 "status": step.status,
-                "input_data": step.input_data,
-                "output_data": step.output_data,
+                "input_data": input_data,
+                "output_data": output_data,
                 "error_message": step.error_message,
                 "validation_result": step.validation_result,
                 "retry_count": step.retry_count,
                 "started_at": step.started_at.isoformat() if step.started_at else None,
                 "completed_at": step.completed_at.isoformat() if step.completed_at else None
             }
-            for step in steps
+            for step, input_data, output_data in zip(steps, inputs, outputs)
         ]
     }
 
+@router.get("/pipeline/blobs/{blob_hash}")
+async def get_pipeline_blob(
+    blob_hash: str,
+    db: Session = Depends(get_read_db)
+):
+    """Get a step payload blob referenced as {"$blob": hash}"""
+    blob = BlobRepository.get(db, blob_hash)
+    if not blob:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return {"hash": blob.hash, "size": blob.size, "data": blob.data}
+
 @router.post("/pipeline/retry/{step_id}")
 async def retry_step(
     step_id: str,
@@ -139,7 +306,7 @@ async def retry_step(
     logger.info(f"Retry request for step: {step_id}")
     
     orchestrator = PipelineOrchestrator(db)
-    result = orchestrator.retry_step(step_id)
+    result = await run_in_threadpool(orchestrator.retry_step, step_id)
     
     if not result["success"]:
         raise HTTPException(status_code=500, detail=result.get("error", "Retry failed"))
@@ -153,7 +320,7 @@ async def retry_step(
 @router.get("/pipeline/history/{question_id}")
 async def get_pipeline_history(
     question_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get processing history for a question"""
     processes = ProcessRepository.get_by_question_id(db, question_id)
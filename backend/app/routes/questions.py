@@ -3,7 +3,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.repositories.question_repository import QuestionRepository
 from app.repositories.story_repository import StoryRepository
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.utils.logger import setup_logger
 
 # Set up logging
@@ -14,7 +14,7 @@ router = APIRouter()
 @router.get("/questions/{question_id}")
 async def get_question(
     question_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get question details by ID"""
     logger.info(f"Get question request - ID: {question_id}")
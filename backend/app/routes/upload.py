@@ -1,16 +1,47 @@
 """Upload route - refactored to use database"""
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
 from app.services.document_parser import DocumentParser
+from app.services.parse_pool import get_parse_pool, ParseQueueFull, ParseTimeout
 from app.repositories.question_repository import QuestionRepository
+from app.repositories.process_repository import ProcessRepository
+from app.routes.generate import dispatch_pipelines
 from app.db.session import get_db
 from app.utils.logger import setup_logger
+from pathlib import Path
+from typing import Optional, Tuple
+import tempfile
+import uuid
+import os
 
 # Set up logging
 logger = setup_logger("upload")
 
 router = APIRouter()
 
+# Largest number of questions accepted from one batch upload
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+
+# Uploads are streamed to a temp file in chunks of this size instead of being read into memory
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def _spool_upload(file: UploadFile) -> Tuple[str, int]:
+    """Stream an upload to a temp file; returns its path and size"""
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=Path(file.filename or "").suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, size
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -19,15 +50,15 @@ async def upload_file(
     """Upload and parse a document containing a question"""
     logger.info(f"File upload request received - Filename: {file.filename}, Content-Type: {file.content_type}")
     
+    spool_path = None
     try:
-        # Read file content
-        file_content = await file.read()
-        logger.info(f"File read successfully - Size: {len(file_content)} bytes")
+        # Spool file content to disk
+        spool_path, size = await _spool_upload(file)
+        logger.info(f"File read successfully - Size: {size} bytes")
         
-        # Parse document
+        # Parse document in the parse pool (CPU-bound, must not block the event loop)
         logger.info(f"Parsing document: {file.filename}")
-        parser = DocumentParser()
-        question_data = parser.parse(file_content, file.filename)
+        question_data = await get_parse_pool().run(DocumentParser.parse, spool_path, file.filename)
         logger.info(f"Document parsed successfully - Type: {question_data.get('file_type')}, Question length: {len(question_data.get('text', ''))}")
         logger.debug(f"Extracted question: {question_data.get('text', '')[:200]}...")
         logger.debug(f"Extracted options: {question_data.get('options', [])}")
@@ -48,6 +79,91 @@ async def upload_file(
             "options": question.options,
             "message": "File uploaded and parsed successfully"
         }
+    except ParseQueueFull as e:
+        logger.warning(f"File upload rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ParseTimeout as e:
+        logger.error(f"File upload failed: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"File upload failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if spool_path:
+            os.unlink(spool_path)
+
+@router.post("/upload/batch")
+async def upload_batch(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    max_questions: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Upload a document containing several questions, store them all and start their pipelines.
+    
+    With max_questions only the first questions are ingested, and PDF parsing
+    stops as soon as they have been found.
+    """
+    logger.info(f"Batch upload request received - Filename: {file.filename}, Content-Type: {file.content_type}")
+    if max_questions is not None and not 1 <= max_questions <= BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"max_questions must be between 1 and {BATCH_MAX_QUESTIONS}")
+    
+    spool_path = None
+    try:
+        spool_path, size = await _spool_upload(file)
+        logger.info(f"File read successfully - Size: {size} bytes")
+        
+        # Text extraction is CPU-bound, so it runs in the parse pool. Without a
+        # limit, stop one question past the cap so oversized documents are rejected early.
+        questions_data = await get_parse_pool().run(
+            DocumentParser.parse_batch, spool_path, file.filename, max_questions or BATCH_MAX_QUESTIONS + 1
+        )
+        questions_data = [question_data for question_data in questions_data if question_data["text"]]
+    except ParseQueueFull as e:
+        logger.warning(f"Batch upload rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ParseTimeout as e:
+        logger.error(f"Batch upload failed: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch upload failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if spool_path:
+            os.unlink(spool_path)
+    
+    if not questions_data:
+        raise HTTPException(status_code=400, detail="No questions found in document")
+    if len(questions_data) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Document contains more than {BATCH_MAX_QUESTIONS} questions"
+        )
+    
+    # Store all questions and their processes, then start every pipeline under one batch ID.
+    # Both inserts share one commit, so a failure never leaves questions without their processes
+    batch_id = str(uuid.uuid4())
+    try:
+        question_ids = QuestionRepository.bulk_create(db, questions_data, commit=False)
+        process_ids = ProcessRepository.bulk_create(db, question_ids, batch_id=batch_id, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    dispatch_pipelines(db, background_tasks, list(zip(process_ids, question_ids)))
+    logger.info(f"Batch {batch_id} stored - Questions: {len(question_ids)}")
+    
+    return {
+        "batch_id": batch_id,
+        "count": len(question_ids),
+        "questions": [
+            {
+                "question_id": question_id,
+                "process_id": process_id,
+                "text": question_data["text"],
+                "options": question_data.get("options")
+            }
+            for question_id, process_id, question_data in zip(question_ids, process_ids, questions_data)
+        ],
+        "message": f"File uploaded and {len(question_ids)} questions queued for processing"
+    }
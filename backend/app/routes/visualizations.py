@@ -3,7 +3,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from app.repositories.visualization_repository import VisualizationRepository
 from app.repositories.game_blueprint_repository import GameBlueprintRepository
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.utils.logger import setup_logger
 
 logger = setup_logger("visualizations")
@@ -13,7 +13,7 @@ router = APIRouter()
 @router.get("/blueprint/{blueprint_id}")
 async def get_blueprint(
     blueprint_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get blueprint by ID"""
     logger.info(f"[API] /blueprint/{blueprint_id} - Request received")
@@ -50,7 +50,7 @@ async def get_blueprint(
 @router.get("/visualization/{visualization_id}")
 async def get_visualization(
     visualization_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get visualization (blueprint or HTML)"""
     logger.info(f"[API] /visualization/{visualization_id} - Request received")
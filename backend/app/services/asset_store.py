@@ -0,0 +1,123 @@
+"""Content-addressed on-disk store for generated assets"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import urllib.request
+from pathlib import Path
+from typing import Optional
+from app.utils.logger import setup_logger
+
+logger = setup_logger("asset_store")
+
+# Directory for stored assets (defaults to backend/asset_store)
+ASSET_STORE_DIR = os.getenv("ASSET_STORE_DIR")
+
+# Public URL prefix served by routes/assets.py
+ASSET_URL_PREFIX = "/api/assets/"
+
+# Download limits for provider URLs
+ASSET_DOWNLOAD_TIMEOUT = float(os.getenv("ASSET_DOWNLOAD_TIMEOUT", "30"))
+ASSET_MAX_BYTES = int(os.getenv("ASSET_MAX_BYTES", str(20 * 1024 * 1024)))
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Magic bytes for the image formats providers return
+_MEDIA_TYPES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+class AssetStore:
+    """Store generated asset bytes keyed by a hash of (prompt, size, model)"""
+
+    def __init__(self, store_dir: Optional[Path] = None):
+        """Initialize asset store"""
+        if store_dir is None:
+            store_dir = Path(ASSET_STORE_DIR) if ASSET_STORE_DIR else Path(__file__).parent.parent.parent / "asset_store"
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Asset store initialized with directory: {self.store_dir}")
+
+    @staticmethod
+    def compute_key(prompt: str, size: str, model: str) -> str:
+        """Content address for an asset generation request"""
+        payload = json.dumps([prompt, size, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_valid_key(key: str) -> bool:
+        """Check that a key is a SHA-256 hex digest (guards against path traversal)"""
+        return bool(_KEY_PATTERN.match(key or ""))
+
+    @staticmethod
+    def get_url(key: str) -> str:
+        """Public URL for a stored asset"""
+        return f"{ASSET_URL_PREFIX}{key}"
+
+    def get_path(self, key: str) -> Path:
+        """Sharded path for an asset key: ab/cd/abcd..."""
+        return self.store_dir / key[:2] / key[2:4] / key
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the public URL if the asset is already stored"""
+        if self.is_valid_key(key) and self.get_path(key).exists():
+            logger.info(f"Asset store HIT - key: {key[:8]}...")
+            return self.get_url(key)
+        return None
+
+    def save_bytes(self, key: str, data: bytes) -> str:
+        """Write asset bytes atomically and return the public URL"""
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temp file in the same directory, then rename into place
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        logger.info(f"Stored asset - key: {key[:8]}..., size: {len(data)} bytes")
+        return self.get_url(key)
+
+    def store_from_url(self, key: str, source_url: str) -> Optional[str]:
+        """Download a provider URL once and store it; returns the public URL or None"""
+        try:
+            with urllib.request.urlopen(source_url, timeout=ASSET_DOWNLOAD_TIMEOUT) as response:
+                data = response.read(ASSET_MAX_BYTES + 1)
+            if len(data) > ASSET_MAX_BYTES:
+                logger.warning(f"Asset download exceeds {ASSET_MAX_BYTES} bytes, not storing - key: {key[:8]}...")
+                return None
+            return self.save_bytes(key, data)
+        except Exception as e:
+            logger.warning(f"Failed to store asset from provider URL - key: {key[:8]}..., error: {e}")
+            return None
+
+    def get_media_type(self, key: str) -> str:
+        """Detect media type from the stored bytes"""
+        with open(self.get_path(key), "rb") as f:
+            header = f.read(12)
+        for magic, media_type in _MEDIA_TYPES:
+            if header.startswith(magic):
+                return media_type
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "image/webp"
+        return "application/octet-stream"
+
+# Global asset store instance
+_asset_store_instance: Optional[AssetStore] = None
+
+def get_asset_store() -> AssetStore:
+    """Get global asset store instance"""
+    global _asset_store_instance
+    if _asset_store_instance is None:
+        _asset_store_instance = AssetStore()
+    return _asset_store_instance
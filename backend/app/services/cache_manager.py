@@ -0,0 +1,284 @@
+"""Cache manager - sharded layout, TTL and size-capped eviction for the cache directory"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+from app.utils.logger import setup_logger
+
+logger = setup_logger("cache_manager")
+
+# Total size cap for cache files (0 disables eviction)
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Per-type TTLs in seconds (0 means entries never expire)
+CACHE_TTL_SECONDS = {
+    "story": int(os.getenv("CACHE_TTL_STORY", str(30 * 24 * 3600))),
+    "blueprint": int(os.getenv("CACHE_TTL_BLUEPRINT", str(30 * 24 * 3600))),
+    "llm": int(os.getenv("CACHE_TTL_LLM", str(30 * 24 * 3600))),
+}
+
+# Eviction order when over the size cap: "lru" (least recently used) or "lfu" (least frequently used)
+CACHE_EVICTION_POLICY = os.getenv("CACHE_EVICTION_POLICY", "lru")
+
+# Access log buffering: flush to the index after this many accesses or seconds
+CACHE_ACCESS_FLUSH_SIZE = int(os.getenv("CACHE_ACCESS_FLUSH_SIZE", "50"))
+CACHE_ACCESS_FLUSH_INTERVAL = float(os.getenv("CACHE_ACCESS_FLUSH_INTERVAL", "30"))
+
+INDEX_FILENAME = ".cache_index.db"
+
+class CacheManager:
+    """Track cache files in a SQLite index and keep the directory within its limits"""
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = CACHE_MAX_BYTES, policy: str = CACHE_EVICTION_POLICY):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.policy = policy if policy in ("lru", "lfu") else "lru"
+        self.index_path = self.cache_dir / INDEX_FILENAME
+        self._lock = threading.Lock()
+        self._access_buffer: Dict[str, List[float]] = {}  # key -> [hits, last_access]
+        self._last_flush = time.time()
+        self.evictions = 0
+        self.expirations = 0
+        self._init_index()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open an index connection (safe to share the index between processes)"""
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _init_index(self):
+        """Create the index table"""
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    data_type TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_last_access ON cache_entries (last_access)")
+            
+            # Running total of indexed bytes, kept in step with cache_entries by triggers so
+            # writes never have to SUM the whole index
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_meta (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (name, value) "
+                "SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM cache_entries"
+            )
+            conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS cache_entries_total_insert AFTER INSERT ON cache_entries BEGIN
+                    UPDATE cache_meta SET value = value + NEW.size WHERE name = 'total_bytes';
+                END;
+                CREATE TRIGGER IF NOT EXISTS cache_entries_total_update AFTER UPDATE OF size ON cache_entries BEGIN
+                    UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'total_bytes';
+                END;
+                CREATE TRIGGER IF NOT EXISTS cache_entries_total_delete AFTER DELETE ON cache_entries BEGIN
+                    UPDATE cache_meta SET value = value - OLD.size WHERE name = 'total_bytes';
+                END;
+            """)
+        conn.close()
+    
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        """Running total of indexed bytes"""
+        row = conn.execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()
+        return row[0] if row else 0
+    
+    def resync_total(self) -> int:
+        """Recompute the running total from the index (corrects any drift)"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE cache_meta SET value = (SELECT COALESCE(SUM(size), 0) FROM cache_entries) "
+                "WHERE name = 'total_bytes'"
+            )
+            total = self._total_bytes(conn)
+        conn.close()
+        return total
+    
+    def get_path(self, question_hash: str, data_type: str) -> Path:
+        """Sharded path: ab/cd/{hash}_{type}.json"""
+        return self.cache_dir / question_hash[:2] / question_hash[2:4] / f"{question_hash}_{data_type}.json"
+    
+    def get_legacy_path(self, question_hash: str, data_type: str) -> Path:
+        """Flat path used before sharding"""
+        return self.cache_dir / f"{question_hash}_{data_type}.json"
+    
+    def is_expired(self, data_type: str, written_at: float) -> bool:
+        """Check an entry's age against its type's TTL"""
+        ttl = CACHE_TTL_SECONDS.get(data_type, 0)
+        return ttl > 0 and time.time() - written_at > ttl
+    
+    def migrate_legacy(self, question_hash: str, data_type: str) -> Optional[Path]:
+        """Move a flat-layout cache file into its shard; returns the new path if one was moved"""
+        legacy_path = self.get_legacy_path(question_hash, data_type)
+        if not legacy_path.exists():
+            return None
+        path = self.get_path(question_hash, data_type)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(legacy_path, path)
+        except FileNotFoundError:
+            # Another worker migrated it first
+            pass
+        if not path.exists():
+            return None
+        self.record_write(question_hash, data_type, path.stat().st_size)
+        logger.info(f"Migrated legacy cache file - hash: {question_hash[:8]}..., type: {data_type}")
+        return path
+    
+    def record_write(self, question_hash: str, data_type: str, size: int) -> List[str]:
+        """Index a written cache file; returns keys evicted to stay under the size cap"""
+        key = f"{question_hash}_{data_type}"
+        now = time.time()
+        path = self.get_path(question_hash, data_type).relative_to(self.cache_dir)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO cache_entries (key, data_type, path, size, created_at, last_access, hits)
+                VALUES (?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT(key) DO UPDATE SET
+                    path = excluded.path, size = excluded.size,
+                    created_at = excluded.created_at, last_access = excluded.last_access
+                """,
+                (key, data_type, str(path), size, now, now)
+            )
+            total = self._total_bytes(conn)
+        conn.close()
+        
+        if self.max_bytes > 0 and total > self.max_bytes:
+            return self.evict(total)
+        return []
+    
+    def record_access(self, key: str):
+        """Buffer a cache hit for the access log"""
+        with self._lock:
+            entry = self._access_buffer.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] = time.time()
+            should_flush = (
+                len(self._access_buffer) >= CACHE_ACCESS_FLUSH_SIZE
+                or time.time() - self._last_flush >= CACHE_ACCESS_FLUSH_INTERVAL
+            )
+        if should_flush:
+            self.flush_access_log()
+    
+    def flush_access_log(self):
+        """Write buffered hits to the index"""
+        with self._lock:
+            buffered = self._access_buffer
+            self._access_buffer = {}
+            self._last_flush = time.time()
+        if not buffered:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE cache_entries SET hits = hits + ?, last_access = MAX(last_access, ?) WHERE key = ?",
+                    [(hits, last_access, key) for key, (hits, last_access) in buffered.items()]
+                )
+            conn.close()
+        except Exception as e:
+            logger.warning(f"Failed to flush cache access log: {e}")
+    
+    def remove(self, key: str):
+        """Drop an entry's file and index row"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT path FROM cache_entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        conn.close()
+        question_hash, _, data_type = key.rpartition("_")
+        path = self.cache_dir / row[0] if row else self.get_path(question_hash, data_type)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    def evict(self, total: Optional[int] = None) -> List[str]:
+        """Evict entries by policy until the cache fits under max_bytes"""
+        self.flush_access_log()
+        order = "hits ASC, last_access ASC" if self.policy == "lfu" else "last_access ASC"
+        evicted = []
+        with self._connect() as conn:
+            if total is None:
+                total = self._total_bytes(conn)
+            for key, path, size in conn.execute(f"SELECT key, path, size FROM cache_entries ORDER BY {order}").fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(self.cache_dir / path)
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                total -= size
+                evicted.append(key)
+        conn.close()
+        
+        if evicted:
+            self.evictions += len(evicted)
+            logger.info(f"Evicted {len(evicted)} cache entries ({self.policy}), cache size now {total} bytes")
+        return evicted
+    
+    def expire(self) -> List[str]:
+        """Delete entries older than their type's TTL"""
+        now = time.time()
+        expired = []
+        with self._connect() as conn:
+            for data_type, ttl in CACHE_TTL_SECONDS.items():
+                if ttl <= 0:
+                    continue
+                rows = conn.execute(
+                    "SELECT key, path FROM cache_entries WHERE data_type = ? AND created_at < ?",
+                    (data_type, now - ttl)
+                ).fetchall()
+                for key, path in rows:
+                    try:
+                        os.unlink(self.cache_dir / path)
+                    except FileNotFoundError:
+                        pass
+                    conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                    expired.append(key)
+        conn.close()
+        
+        if expired:
+            self.expirations += len(expired)
+            logger.info(f"Expired {len(expired)} cache entries")
+        return expired
+    
+    def cleanup(self) -> Dict[str, int]:
+        """Migrate flat files into shards, resync the size total, then expire and evict"""
+        migrated = 0
+        for legacy_path in self.cache_dir.glob("*_*.json"):
+            question_hash, _, data_type = legacy_path.stem.rpartition("_")
+            if question_hash and self.migrate_legacy(question_hash, data_type):
+                migrated += 1
+        self.resync_total()
+        expired = self.expire()
+        evicted = self.evict() if self.max_bytes > 0 else []
+        return {"migrated": migrated, "expired": len(expired), "evicted": len(evicted)}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size and eviction counters"""
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            total = self._total_bytes(conn)
+        conn.close()
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "policy": self.policy,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -1,12 +1,150 @@
 """Cache service for story and blueprint generation"""
+import copy
+import gzip
 import hashlib
 import json
-from typing import Optional, Dict, Any
+import os
+import struct
+import tempfile
+import threading
+import zlib
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, List
 from pathlib import Path
+from app.services.cache_manager import CacheManager, CACHE_TTL_SECONDS
+from app.services.near_duplicate_index import NearDuplicateIndex, CACHE_NEAR_DUP_ENABLED
+from app.services.single_flight import SingleFlight
+from app.services.prompt_store import get_prompt_store
 from app.utils.logger import setup_logger
 
 logger = setup_logger("cache_service")
 
+# In-process LRU tier in front of the cache files
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "256"))
+CACHE_MEMORY_MAX_BYTES = int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Compression for cache files: "none", "gzip" or "zstd" (needs the zstandard package)
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "none")
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+    if CACHE_COMPRESSION == "zstd":
+        logger.warning("CACHE_COMPRESSION=zstd but zstandard is not installed, using gzip")
+        CACHE_COMPRESSION = "gzip"
+
+# Cache file format: magic, codec id, CRC32 of the uncompressed JSON, payload.
+# Files without the magic are read as plain JSON (written by older versions).
+CACHE_FILE_MAGIC = b"LCF1"
+_HEADER = struct.Struct(">4sBI")
+_CODECS = {"none": 0, "gzip": 1, "zstd": 2}
+
+def encode_cache_payload(raw: bytes, compression: str = CACHE_COMPRESSION) -> bytes:
+    """Wrap serialized JSON in the cache file format"""
+    if compression == "zstd" and zstandard is None:
+        compression = "gzip"
+    codec = _CODECS.get(compression, 0)
+    if codec == 1:
+        payload = gzip.compress(raw, compresslevel=6)
+    elif codec == 2:
+        payload = zstandard.ZstdCompressor(level=3).compress(raw)
+    else:
+        payload = raw
+    return _HEADER.pack(CACHE_FILE_MAGIC, codec, zlib.crc32(raw)) + payload
+
+def decode_cache_payload(data: bytes) -> bytes:
+    """Unwrap a cache file into serialized JSON, validating its checksum"""
+    if not data.startswith(CACHE_FILE_MAGIC):
+        return data  # Legacy plain-JSON file
+    _, codec, checksum = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size:]
+    if codec == 1:
+        raw = gzip.decompress(payload)
+    elif codec == 2:
+        if zstandard is None:
+            raise ValueError("Cache file is zstd-compressed but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == 0:
+        raw = payload
+    else:
+        raise ValueError(f"Unknown cache codec: {codec}")
+    if zlib.crc32(raw) != checksum:
+        raise ValueError("Cache file checksum mismatch")
+    return raw
+
+class MemoryLRU:
+    """Thread-safe LRU bounded by entry count and (serialized) byte size"""
+    
+    def __init__(self, max_entries: int = CACHE_MEMORY_MAX_ENTRIES, max_bytes: int = CACHE_MEMORY_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a copy of a cached value (callers may mutate what they get back)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.time():
+                # Expired - drop it and treat as a miss
+                self._entries.pop(key)
+                self._bytes -= entry[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+        return copy.deepcopy(value)
+    
+    def put(self, key: str, value: Any, size: int, expires_at: Optional[float] = None):
+        """Store a value, evicting least recently used entries to stay within limits"""
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def contains(self, key: str) -> bool:
+        """Check for a key without touching recency or counters"""
+        with self._lock:
+            return key in self._entries
+    
+    def invalidate(self, key: str):
+        """Drop a key"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Counters and current usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
 class CacheService:
     """Service to cache generated story and blueprint data"""
     
@@ -17,6 +155,13 @@ class CacheService:
             cache_dir = Path(__file__).parent.parent.parent / "cache"
         self.cache_dir = cache_dir
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory = MemoryLRU()
+        self.manager = CacheManager(self.cache_dir)
+        self.near_duplicates = NearDuplicateIndex(self.manager.index_path) if CACHE_NEAR_DUP_ENABLED else None
+        self.near_duplicate_hits = 0
+        self.single_flight = SingleFlight(self.cache_dir / ".locks")
+        self.disk_hits = 0
+        self.disk_misses = 0
         logger.info(f"Cache service initialized with directory: {self.cache_dir}")
     
     def _get_question_hash(self, question_text: str, options: list = None) -> str:
@@ -36,62 +181,170 @@ class CacheService:
         hash_obj = hashlib.sha256(cache_key.encode('utf-8'))
         return hash_obj.hexdigest()
     
+    def compute_fingerprint(self, prompt_names: List[str], model: str) -> str:
+        """Fingerprint of the prompt/template files and model that produce a cached entry.
+        
+        Digests come from the prompt store, the same copy generation reads, so an
+        entry is never keyed to file contents the store has not loaded yet.
+        """
+        prompt_store = get_prompt_store()
+        parts = [f"model={model}"]
+        parts.extend(f"{name}={prompt_store.digest(name)}" for name in prompt_names)
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+    
+    def _get_cache_key(self, question_hash: str, fingerprint: Optional[str] = None) -> str:
+        """Cache key for a question under a prompt fingerprint"""
+        if not fingerprint:
+            return question_hash
+        return hashlib.sha256(f"{question_hash}:{fingerprint}".encode('utf-8')).hexdigest()
+    
     def _get_cache_path(self, question_hash: str, data_type: str) -> Path:
-        """Get cache file path for a question hash and data type"""
-        return self.cache_dir / f"{question_hash}_{data_type}.json"
+        """Get cache file path for a question hash and data type (sharded by hash prefix)"""
+        return self.manager.get_path(question_hash, data_type)
     
-    def get_story(self, question_text: str, options: list = None) -> Optional[Dict[str, Any]]:
-        """Get cached story data for a question"""
-        question_hash = self._get_question_hash(question_text, options)
-        cache_path = self._get_cache_path(question_hash, "story")
+    def _expires_at(self, data_type: str, written_at: float) -> Optional[float]:
+        """Absolute expiry time for an entry, or None if its type never expires"""
+        ttl = CACHE_TTL_SECONDS.get(data_type, 0)
+        return written_at + ttl if ttl > 0 else None
+    
+    def _read(self, question_hash: str, data_type: str) -> Optional[Dict[str, Any]]:
+        """Read cached data from the memory tier, falling back to the cache file"""
+        memory_key = f"{question_hash}_{data_type}"
+        cached_data = self.memory.get(memory_key)
+        if cached_data is not None:
+            self.manager.record_access(memory_key)
+            logger.info(f"Cache HIT (memory) for {data_type} - hash: {question_hash[:8]}...")
+            return cached_data
         
-        if cache_path.exists():
+        cache_path = self._get_cache_path(question_hash, data_type)
+        try:
             try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    cached_data = json.load(f)
-                logger.info(f"Cache HIT for story - hash: {question_hash[:8]}...")
-                return cached_data
-            except Exception as e:
-                logger.warning(f"Failed to read story cache: {e}")
+                f = open(cache_path, 'rb')
+            except FileNotFoundError:
+                # Entries written before sharding live in the flat directory
+                cache_path = self.manager.migrate_legacy(question_hash, data_type)
+                if cache_path is None:
+                    raise
+                f = open(cache_path, 'rb')
+            with f:
+                written_at = os.fstat(f.fileno()).st_mtime
+                raw = decode_cache_payload(f.read())
+            if self.manager.is_expired(data_type, written_at):
+                self.disk_misses += 1
+                self.manager.remove(memory_key)
+                logger.info(f"Cache EXPIRED for {data_type} - hash: {question_hash[:8]}...")
+                return None
+            cached_data = json.loads(raw)
+        except FileNotFoundError:
+            self.disk_misses += 1
+            logger.debug(f"Cache MISS for {data_type} - hash: {question_hash[:8]}...")
+            return None
+        except Exception as e:
+            self.disk_misses += 1
+            logger.warning(f"Failed to read {data_type} cache: {e}")
+            return None
         
-        logger.debug(f"Cache MISS for story - hash: {question_hash[:8]}...")
-        return None
+        self.disk_hits += 1
+        self.manager.record_access(memory_key)
+        self.memory.put(memory_key, cached_data, len(raw), self._expires_at(data_type, written_at))
+        logger.info(f"Cache HIT for {data_type} - hash: {question_hash[:8]}...")
+        return cached_data
     
-    def get_blueprint(self, question_text: str, options: list = None) -> Optional[Dict[str, Any]]:
-        """Get cached blueprint data for a question"""
-        question_hash = self._get_question_hash(question_text, options)
-        cache_path = self._get_cache_path(question_hash, "blueprint")
+    def _write(self, question_hash: str, data_type: str, data: Dict[str, Any]):
+        """Write data to the cache file and refresh the memory tier"""
+        memory_key = f"{question_hash}_{data_type}"
+        # Invalidate first so a failed write never leaves a stale memory entry
+        self.memory.invalidate(memory_key)
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cache_path = self._get_cache_path(question_hash, data_type)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
         
-        if cache_path.exists():
-            try:
-                with open(cache_path, 'r', encoding='utf-8') as f:
-                    cached_data = json.load(f)
-                logger.info(f"Cache HIT for blueprint - hash: {question_hash[:8]}...")
-                return cached_data
-            except Exception as e:
-                logger.warning(f"Failed to read blueprint cache: {e}")
+        # Write to a temp file in the same directory, then rename into place so
+        # concurrent readers see either the old file or the new one, never a torn write
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(encode_cache_payload(raw))
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
         
-        logger.debug(f"Cache MISS for blueprint - hash: {question_hash[:8]}...")
+        # Index the file; writing may push the directory over its size cap
+        for evicted_key in self.manager.record_write(question_hash, data_type, cache_path.stat().st_size):
+            self.memory.invalidate(evicted_key)
+        self.memory.put(memory_key, data, len(raw), self._expires_at(data_type, time.time()))
+    
+    def _read_near_duplicate(
+        self,
+        question_text: str,
+        options: list,
+        question_hash: str,
+        data_type: str,
+        fingerprint: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """On an exact miss, read the entry of the most similar cached question"""
+        if self.near_duplicates is None:
+            return None
+        try:
+            matches = self.near_duplicates.find(question_text, options, exclude_hash=question_hash)
+        except Exception as e:
+            logger.warning(f"Near-duplicate lookup failed: {e}")
+            return None
+        
+        for near_hash, similarity in matches:
+            cached_data = self._read(self._get_cache_key(near_hash, fingerprint), data_type)
+            if cached_data is not None:
+                self.near_duplicate_hits += 1
+                logger.info(
+                    f"Cache HIT (near-duplicate) for {data_type} - hash: {question_hash[:8]}... "
+                    f"matched {near_hash[:8]}... (similarity {similarity:.2f})"
+                )
+                return cached_data
         return None
     
-    def save_story(self, question_text: str, options: list, story_data: Dict[str, Any]) -> bool:
+    def _index_question(self, question_text: str, options: list, question_hash: str):
+        """Register a cached question for near-duplicate lookups"""
+        if self.near_duplicates is None:
+            return
+        try:
+            self.near_duplicates.add(question_hash, question_text, options)
+        except Exception as e:
+            logger.warning(f"Failed to index question for near-duplicate lookup: {e}")
+    
+    def get_story(self, question_text: str, options: list = None, fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get cached story data for a question (or a near-duplicate of it)"""
+        question_hash = self._get_question_hash(question_text, options)
+        cached_data = self._read(self._get_cache_key(question_hash, fingerprint), "story")
+        if cached_data is None:
+            cached_data = self._read_near_duplicate(question_text, options, question_hash, "story", fingerprint)
+        return cached_data
+    
+    def get_blueprint(self, question_text: str, options: list = None, fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get cached blueprint data for a question (or a near-duplicate of it)"""
+        question_hash = self._get_question_hash(question_text, options)
+        cached_data = self._read(self._get_cache_key(question_hash, fingerprint), "blueprint")
+        if cached_data is None:
+            cached_data = self._read_near_duplicate(question_text, options, question_hash, "blueprint", fingerprint)
+        return cached_data
+    
+    def save_story(self, question_text: str, options: list, story_data: Dict[str, Any], fingerprint: Optional[str] = None) -> bool:
         """Save story data to cache"""
         question_hash = self._get_question_hash(question_text, options)
-        cache_path = self._get_cache_path(question_hash, "story")
         
         try:
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(story_data, f, indent=2, ensure_ascii=False)
+            self._write(self._get_cache_key(question_hash, fingerprint), "story", story_data)
+            self._index_question(question_text, options, question_hash)
             logger.info(f"Cached story - hash: {question_hash[:8]}...")
             return True
         except Exception as e:
             logger.error(f"Failed to save story cache: {e}")
             return False
     
-    def save_blueprint(self, question_text: str, options: list, blueprint_data: Dict[str, Any], template_type: str = None) -> bool:
+    def save_blueprint(self, question_text: str, options: list, blueprint_data: Dict[str, Any], template_type: str = None, fingerprint: Optional[str] = None) -> bool:
         """Save blueprint data to cache"""
         question_hash = self._get_question_hash(question_text, options)
-        cache_path = self._get_cache_path(question_hash, "blueprint")
         
         try:
             # Include template_type in cached data for reference
@@ -99,23 +352,87 @@ class CacheService:
                 "blueprint": blueprint_data,
                 "template_type": template_type
             }
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, indent=2, ensure_ascii=False)
+            self._write(self._get_cache_key(question_hash, fingerprint), "blueprint", cache_data)
+            self._index_question(question_text, options, question_hash)
             logger.info(f"Cached blueprint - hash: {question_hash[:8]}..., template: {template_type}")
             return True
         except Exception as e:
             logger.error(f"Failed to save blueprint cache: {e}")
             return False
     
-    def has_cache(self, question_text: str, options: list = None) -> Dict[str, bool]:
+    def generation_lock(self, question_text: str, options: list, data_type: str, fingerprint: Optional[str] = None):
+        """Single-flight lock for generating one cache entry.
+        
+        Pipelines that miss the cache take this lock and check the cache again
+        before generating, so concurrent pipelines for the same question wait for
+        one generation and reuse its cached result.
+        """
+        question_hash = self._get_question_hash(question_text, options)
+        return self.single_flight.lock(f"{self._get_cache_key(question_hash, fingerprint)}_{data_type}")
+    
+    def get_llm_response(self, request_key: str) -> Optional[str]:
+        """Get a memoized LLM response by request key"""
+        cached_data = self._read(request_key, "llm")
+        return cached_data.get("response") if cached_data else None
+    
+    def save_llm_response(self, request_key: str, stage: str, response: str) -> bool:
+        """Memoize an LLM response under its request key"""
+        try:
+            self._write(request_key, "llm", {"stage": stage, "response": response})
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save LLM response cache: {e}")
+            return False
+    
+    def _exists(self, question_hash: str, data_type: str) -> bool:
+        """Check the memory tier before statting the cache file"""
+        if self.memory.contains(f"{question_hash}_{data_type}"):
+            return True
+        return (
+            self._get_cache_path(question_hash, data_type).exists()
+            or self.manager.get_legacy_path(question_hash, data_type).exists()
+        )
+    
+    def has_cache(
+        self,
+        question_text: str,
+        options: list = None,
+        story_fingerprint: Optional[str] = None,
+        blueprint_fingerprint: Optional[str] = None
+    ) -> Dict[str, bool]:
         """Check if cache exists for story and/or blueprint"""
         question_hash = self._get_question_hash(question_text, options)
-        story_path = self._get_cache_path(question_hash, "story")
-        blueprint_path = self._get_cache_path(question_hash, "blueprint")
+        has_story = self._exists(self._get_cache_key(question_hash, story_fingerprint), "story")
+        has_blueprint = self._exists(self._get_cache_key(question_hash, blueprint_fingerprint), "blueprint")
         
         return {
-            "story": story_path.exists(),
-            "blueprint": blueprint_path.exists(),
-            "both": story_path.exists() and blueprint_path.exists()
+            "story": has_story,
+            "blueprint": has_blueprint,
+            "both": has_story and has_blueprint
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for both tiers"""
+        return {
+            "memory": self.memory.get_stats(),
+            "disk": {
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "near_duplicate_hits": self.near_duplicate_hits,
+                **self.manager.get_stats()
+            },
+            "single_flight": self.single_flight.get_stats()
         }
 
+# Global cache service instance, so the memory tier is shared across pipeline runs
+_cache_service_instance: Optional[CacheService] = None
+_cache_service_lock = threading.Lock()
+
+def get_cache_service() -> CacheService:
+    """Get global cache service instance"""
+    global _cache_service_instance
+    if _cache_service_instance is None:
+        with _cache_service_lock:
+            if _cache_service_instance is None:
+                _cache_service_instance = CacheService()
+    return _cache_service_instance
@@ -1,39 +1,75 @@
 import PyPDF2
 from docx import Document
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Optional, Union
+import os
 import re
 from io import BytesIO
+from itertools import islice
+from pathlib import Path
 from app.utils.logger import setup_logger
 
 # Set up logging
 logger = setup_logger("document_parser")
 
+# Numbered question starts ("1.", "2)", "Q3.", "Question 4:") and option lines ("a)", "(b)", "C.")
+QUESTION_START_PATTERN = re.compile(r'^(?:Q(?:uestion)?\s*)?(\d{1,3})\s*[.):]\s+(.+)$', re.IGNORECASE)
+OPTION_LINE_PATTERN = re.compile(r'^\(?([a-h])[.)]\s*(.+)$', re.IGNORECASE)
+# Several options on one line: "a) 2  b) 4  c) 6"
+INLINE_OPTION_SPLIT = re.compile(r'\s+(?=\(?[a-h]\)\s)', re.IGNORECASE)
+
+# PDFs with more pages than this are rejected before extraction (0 disables the guard)
+PARSE_MAX_PAGES = int(os.getenv("PARSE_MAX_PAGES", "500"))
+
+# Uploaded file contents, or the path of an upload spooled to disk
+FileSource = Union[bytes, str, Path]
+
+def _source_size(source: FileSource) -> int:
+    """Size in bytes of file contents or a file on disk"""
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
 class DocumentParser:
     @staticmethod
-    def parse_pdf(file_content: bytes) -> Dict[str, any]:
-        """Extract text from PDF file"""
-        logger.info(f"Parsing PDF - Size: {len(file_content)} bytes")
+    def iter_pdf_pages(source: FileSource) -> Iterator[str]:
+        """Yield the text of each PDF page in order, so callers can stop early"""
+        reader = PyPDF2.PdfReader(BytesIO(source) if isinstance(source, bytes) else str(source))
+        page_count = len(reader.pages)
+        logger.debug(f"PDF has {page_count} pages")
+        if PARSE_MAX_PAGES and page_count > PARSE_MAX_PAGES:
+            raise ValueError(f"PDF has {page_count} pages, the limit is {PARSE_MAX_PAGES}")
+        
+        for page in reader.pages:
+            yield page.extract_text() or ""
+    
+    @staticmethod
+    def parse_pdf(file_content: FileSource, max_questions: Optional[int] = None) -> Dict[str, any]:
+        """Extract text from PDF file, stopping once max_questions questions are complete"""
+        logger.info(f"Parsing PDF - Size: {_source_size(file_content)} bytes")
         try:
-            pdf_reader = PyPDF2.PdfReader(file_content)
-            logger.debug(f"PDF has {len(pdf_reader.pages)} pages")
-            text = ""
-            for i, page in enumerate(pdf_reader.pages):
-                page_text = page.extract_text()
-                text += page_text + "\n"
-                logger.debug(f"Page {i+1} extracted - {len(page_text)} chars")
-            logger.info(f"PDF parsing successful - Total text length: {len(text)} chars")
+            pages = []
+            question_starts = 0
+            for page_text in DocumentParser.iter_pdf_pages(file_content):
+                pages.append(page_text)
+                if max_questions:
+                    # Question N is complete once question N+1 starts
+                    question_starts += sum(
+                        1 for line in page_text.splitlines() if QUESTION_START_PATTERN.match(line.strip())
+                    )
+                    if question_starts > max_questions:
+                        logger.info(f"Found {max_questions} questions after {len(pages)} pages, stopping early")
+                        break
+            text = "\n".join(pages)
+            logger.info(f"PDF parsing successful - Pages: {len(pages)}, Total text length: {len(text)} chars")
             return {"text": text, "type": "pdf"}
         except Exception as e:
             logger.error(f"PDF parsing failed: {str(e)}", exc_info=True)
             raise ValueError(f"Failed to parse PDF: {str(e)}")
 
     @staticmethod
-    def parse_docx(file_content: bytes) -> Dict[str, any]:
+    def parse_docx(file_content: FileSource) -> Dict[str, any]:
         """Extract text from DOCX file"""
-        logger.info(f"Parsing DOCX - Size: {len(file_content)} bytes")
+        logger.info(f"Parsing DOCX - Size: {_source_size(file_content)} bytes")
         try:
-            from io import BytesIO
-            doc = Document(BytesIO(file_content))
+            doc = Document(BytesIO(file_content) if isinstance(file_content, bytes) else str(file_content))
             paragraphs = [paragraph.text for paragraph in doc.paragraphs]
             text = "\n".join(paragraphs)
             logger.info(f"DOCX parsing successful - Paragraphs: {len(paragraphs)}, Total text length: {len(text)} chars")
@@ -43,10 +79,12 @@ class DocumentParser:
             raise ValueError(f"Failed to parse DOCX: {str(e)}")
 
     @staticmethod
-    def parse_txt(file_content: bytes) -> Dict[str, any]:
+    def parse_txt(file_content: FileSource) -> Dict[str, any]:
         """Extract text from TXT file"""
-        logger.info(f"Parsing TXT - Size: {len(file_content)} bytes")
+        logger.info(f"Parsing TXT - Size: {_source_size(file_content)} bytes")
         try:
+            if not isinstance(file_content, bytes):
+                file_content = Path(file_content).read_bytes()
             text = file_content.decode('utf-8')
             logger.info(f"TXT parsing successful - Text length: {len(text)} chars")
             return {"text": text, "type": "txt"}
@@ -90,18 +128,87 @@ class DocumentParser:
         return result
 
     @staticmethod
-    def parse(file_content: bytes, filename: str) -> Dict[str, any]:
-        """Parse document based on file extension"""
+    def iter_questions(text: str) -> Iterator[Dict[str, any]]:
+        """Yield each numbered question with its options as it is found in the text"""
+        block = None
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+            
+            start = QUESTION_START_PATTERN.match(stripped)
+            if start:
+                if block:
+                    yield DocumentParser._finish_question(block)
+                block = {"lines": [start.group(2)], "options": [], "raw": [stripped]}
+                continue
+            if block is None:
+                continue  # Title, instructions, etc. before the first question
+            
+            block["raw"].append(stripped)
+            if OPTION_LINE_PATTERN.match(stripped):
+                for part in INLINE_OPTION_SPLIT.split(stripped):
+                    option = OPTION_LINE_PATTERN.match(part)
+                    if option and option.group(2).strip():
+                        block["options"].append(option.group(2).strip())
+            elif block["options"]:
+                # Wrapped option text
+                block["options"][-1] += " " + stripped
+            else:
+                # Wrapped question text
+                block["lines"].append(stripped)
+        
+        if block:
+            yield DocumentParser._finish_question(block)
+    
+    @staticmethod
+    def _finish_question(block: Dict[str, List[str]]) -> Dict[str, any]:
+        """Build question data from a collected block"""
+        return {
+            "text": " ".join(block["lines"]).strip(),
+            "options": block["options"] or None,
+            "full_text": "\n".join(block["raw"])
+        }
+    
+    @staticmethod
+    def extract_questions(text: str, max_questions: Optional[int] = None) -> List[Dict[str, any]]:
+        """Extract every question (or the first max_questions) and its options from text"""
+        logger.info(f"Extracting questions from text - Length: {len(text)} chars")
+        questions = list(islice(DocumentParser.iter_questions(text), max_questions))
+        if not questions:
+            # No numbered questions - treat the document as a single question
+            logger.info("No numbered questions found, falling back to single-question extraction")
+            return [DocumentParser.extract_question(text)]
+        logger.info(f"Question extraction complete - Questions: {len(questions)}")
+        return questions
+    
+    @staticmethod
+    def extract_text(file_content: FileSource, filename: str, max_questions: Optional[int] = None) -> Dict[str, any]:
+        """Extract raw text based on file extension (PDFs may stop after max_questions questions)"""
         ext = filename.split('.')[-1].lower()
         
         if ext == 'pdf':
-            parsed = DocumentParser.parse_pdf(file_content)
+            return DocumentParser.parse_pdf(file_content, max_questions=max_questions)
         elif ext in ['docx', 'doc']:
-            parsed = DocumentParser.parse_docx(file_content)
+            return DocumentParser.parse_docx(file_content)
         elif ext in ['txt', 'md']:
-            parsed = DocumentParser.parse_txt(file_content)
+            return DocumentParser.parse_txt(file_content)
         else:
             raise ValueError(f"Unsupported file type: {ext}")
+    
+    @staticmethod
+    def parse_batch(file_content: FileSource, filename: str, max_questions: Optional[int] = None) -> List[Dict[str, any]]:
+        """Parse a document containing several questions"""
+        parsed = DocumentParser.extract_text(file_content, filename, max_questions=max_questions)
+        questions = DocumentParser.extract_questions(parsed["text"], max_questions=max_questions)
+        for question_data in questions:
+            question_data["file_type"] = parsed["type"]
+        return questions
+    
+    @staticmethod
+    def parse(file_content: FileSource, filename: str) -> Dict[str, any]:
+        """Parse document based on file extension"""
+        parsed = DocumentParser.extract_text(file_content, filename)
         
         # Extract question from parsed text
         question_data = DocumentParser.extract_question(parsed["text"])
@@ -1,11 +1,19 @@
 import os
 import json
-from typing import Dict, Any, Optional
-from openai import OpenAI
-from anthropic import Anthropic
+import hashlib
+import threading
+import contextvars
+import openai
+import anthropic
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+from anthropic import Anthropic, AsyncAnthropic
 from dotenv import load_dotenv
 from app.utils.logger import setup_logger
 from app.services.pipeline.retry_handler import RetryHandler, retry_on_failure
+from app.services.cache_service import get_cache_service
+from app.services.prompt_store import get_prompt_store
 
 # Load environment variables
 load_dotenv()
@@ -16,10 +24,61 @@ logger = setup_logger("llm_service")
 # Initialize retry handler for LLM calls
 llm_retry_handler = RetryHandler(max_retries=3, initial_delay=1.0, max_delay=30.0)
 
+# Connection pool settings for the async clients (one pool per provider)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "600"))
+
+# Pipeline stages whose LLM responses are memoized ("*" for every stage).
+# Story and blueprint generation have their own cache in CacheService.
+LLM_CACHE_STAGES = {
+    stage.strip() for stage in os.getenv("LLM_CACHE_STAGES", "question_analysis,template_routing,strategy").split(",")
+    if stage.strip()
+}
+
+# Bump to invalidate every memoized response (prompt files are versioned automatically)
+LLM_CACHE_VERSION = os.getenv("LLM_CACHE_VERSION", "1")
+
+# Stages whose responses are free text; all others must contain JSON to be cached
+LLM_TEXT_STAGES = {"html"}
+
+# Responses memoized inside LLMService.deferred_cache() wait here until the block succeeds
+_deferred_cache_writes: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar(
+    "deferred_cache_writes", default=None
+)
+
+DEFAULT_TEMPERATURE = 0.7
+
+def _extract_json_text(response: str) -> str:
+    """Strip markdown code fences the way the pipeline parsers do"""
+    if "```json" in response:
+        return response.split("```json")[1].split("```")[0].strip()
+    if "```" in response:
+        return response.split("```")[1].split("```")[0].strip()
+    return response
+
+def _create_async_http_client(sdk):
+    """Create a pooled keep-alive HTTP client for an async LLM SDK client"""
+    # Build the pool from the SDK's own httpx types; the SDK rejects clients from another httpx install
+    limits_cls = type(sdk.DEFAULT_CONNECTION_LIMITS)
+    return sdk.DefaultAsyncHttpxClient(
+        limits=limits_cls(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        timeout=sdk.Timeout(LLM_REQUEST_TIMEOUT, connect=10.0)
+    )
+
 class LLMService:
     def __init__(self):
         self.openai_client = None
         self.anthropic_client = None
+        self.async_openai_client = None
+        self.async_anthropic_client = None
+        self._openai_key = None
+        self._anthropic_key = None
         self._initialized = False
         self._initialize()
     
@@ -30,6 +89,7 @@ class LLMService:
         
         # Try to initialize OpenAI
         openai_key = os.getenv("OPENAI_API_KEY")
+        self._openai_key = openai_key
         if openai_key:
             try:
                 self.openai_client = OpenAI(api_key=openai_key)
@@ -41,6 +101,7 @@ class LLMService:
         
         # Try to initialize Anthropic
         anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+        self._anthropic_key = anthropic_key
         if anthropic_key:
             try:
                 self.anthropic_client = Anthropic(api_key=anthropic_key)
@@ -62,7 +123,7 @@ class LLMService:
         
         # Don't raise error here - check when actually using the service
 
-    def _call_openai(self, messages: list, model: str = "gpt-4", temperature: float = 0.7) -> str:
+    def _call_openai(self, messages: list, model: str = "gpt-4", temperature: float = 0.7, response_format: Optional[Dict[str, Any]] = None) -> str:
         """Call OpenAI API with retry logic"""
         if not self.openai_client:
             raise ValueError("OpenAI client not initialized")
@@ -72,11 +133,16 @@ class LLMService:
         logger.debug(f"OpenAI Request - System message: {messages[0].get('content', '')[:200] if messages else 'None'}...")
         
         def _make_call():
-            response = self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature
-            )
+            request = {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature
+            }
+            # Structured output (e.g. json_schema) is only sent when requested,
+            # since not every model supports it
+            if response_format:
+                request["response_format"] = response_format
+            response = self.openai_client.chat.completions.create(**request)
             return response
         
         # Use retry handler
@@ -140,8 +206,118 @@ class LLMService:
             logger.error(f"Anthropic API call failed after retries: {str(e)}", exc_info=True)
             raise
 
-    def call_llm(self, messages: list, model: Optional[str] = None, use_anthropic: bool = False) -> str:
-        """Call LLM (OpenAI primary, Anthropic fallback)"""
+    def _cache_key(
+        self,
+        stage: Optional[str],
+        provider: str,
+        model: str,
+        messages: list,
+        response_format: Optional[Dict[str, Any]]
+    ) -> Optional[str]:
+        """Memoization key for a request, or None if the stage is not cached"""
+        if not stage or not ("*" in LLM_CACHE_STAGES or stage in LLM_CACHE_STAGES):
+            return None
+        normalized_messages = [
+            {"role": msg["role"], "content": " ".join(str(msg["content"]).split())}
+            for msg in messages
+        ]
+        payload = json.dumps(
+            [
+                LLM_CACHE_VERSION,
+                get_prompt_store().version,
+                provider,
+                model,
+                DEFAULT_TEMPERATURE,
+                normalized_messages,
+                response_format if provider == "openai" else None
+            ],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _get_cached_response(self, cache_key: Optional[str], stage: Optional[str]) -> Optional[str]:
+        """Look up a memoized response"""
+        if not cache_key:
+            return None
+        response = get_cache_service().get_llm_response(cache_key)
+        if response is not None:
+            logger.info(f"LLM cache HIT - stage: {stage}, key: {cache_key[:8]}...")
+        return response
+    
+    def _save_cached_response(self, cache_key: Optional[str], stage: Optional[str], response: str):
+        """Memoize a response if it is usable (JSON stages must return parseable JSON)"""
+        if not cache_key or not response:
+            return
+        if stage not in LLM_TEXT_STAGES:
+            try:
+                json.loads(_extract_json_text(response))
+            except (ValueError, IndexError):
+                logger.debug(f"Not caching unparseable LLM response - stage: {stage}")
+                return
+        pending = _deferred_cache_writes.get()
+        if pending is not None:
+            pending.append((cache_key, stage, response))
+            return
+        get_cache_service().save_llm_response(cache_key, stage, response)
+    
+    @contextmanager
+    def deferred_cache(self):
+        """Memoize the responses of this block only if it exits without an exception.
+        
+        Callers validate what they parsed inside the block (or clear the yielded
+        list to drop it), so a rejected response is never replayed on retry.
+        Thread pools started in the block take part when their tasks run in a
+        copy of the current context.
+        """
+        outer = _deferred_cache_writes.get()
+        pending = []
+        token = _deferred_cache_writes.set(pending)
+        try:
+            yield pending
+        finally:
+            _deferred_cache_writes.reset(token)
+        if outer is not None:
+            outer.extend(pending)
+            return
+        for cache_key, stage, response in pending:
+            get_cache_service().save_llm_response(cache_key, stage, response)
+    
+    def _resolve_route(self, model: Optional[str], use_anthropic: bool, has_openai: bool, has_anthropic: bool) -> Tuple[str, str]:
+        """Pick provider and model (OpenAI primary, Anthropic fallback)"""
+        if use_anthropic and has_anthropic:
+            return "anthropic", model or "claude-3-opus-20240229"
+        elif has_openai:
+            return "openai", model or "gpt-4"
+        elif has_anthropic:
+            return "anthropic", model or "claude-3-opus-20240229"
+        raise ValueError("No LLM client available")
+    
+    def resolve_model(self, model: Optional[str] = None, use_anthropic: bool = False) -> str:
+        """Model call_llm would use for these arguments ("none" if no client is configured)"""
+        if not self._initialized:
+            self._initialize()
+        try:
+            return self._resolve_route(
+                model, use_anthropic, bool(self.openai_client), bool(self.anthropic_client)
+            )[1]
+        except ValueError:
+            return "none"
+    
+    def call_llm(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        use_anthropic: bool = False,
+        response_format: Optional[Dict[str, Any]] = None,
+        stage: Optional[str] = None
+    ) -> str:
+        """Call LLM (OpenAI primary, Anthropic fallback)
+        
+        response_format is forwarded to OpenAI only; Anthropic relies on the
+        prompt to describe the expected JSON. Responses are memoized when
+        stage is listed in LLM_CACHE_STAGES.
+        """
         # Ensure initialized
         if not self._initialized:
             self._initialize()
@@ -150,15 +326,154 @@ class LLMService:
         if not self.openai_client and not self.anthropic_client:
             raise ValueError("At least one LLM API key must be configured (OPENAI_API_KEY or ANTHROPIC_API_KEY). Please create a .env file in the backend directory with your API key.")
         
-        # OpenAI is primary, Anthropic is fallback
-        if use_anthropic and self.anthropic_client:
-            return self._call_anthropic(messages, model or "claude-3-opus-20240229")
-        elif self.openai_client:
-            return self._call_openai(messages, model or "gpt-4")
-        elif self.anthropic_client:
-            return self._call_anthropic(messages, model or "claude-3-opus-20240229")
+        provider, model = self._resolve_route(
+            model, use_anthropic, bool(self.openai_client), bool(self.anthropic_client)
+        )
+        cache_key = self._cache_key(stage, provider, model, messages, response_format)
+        cached = self._get_cached_response(cache_key, stage)
+        if cached is not None:
+            return cached
+        
+        if provider == "anthropic":
+            response = self._call_anthropic(messages, model)
+        else:
+            response = self._call_openai(messages, model, response_format=response_format)
+        
+        self._save_cached_response(cache_key, stage, response)
+        return response
+
+    def _get_async_openai(self) -> AsyncOpenAI:
+        """Lazily create the async OpenAI client with its pooled HTTP client"""
+        if self.async_openai_client is None:
+            if not self._openai_key:
+                raise ValueError("OpenAI client not initialized")
+            self.async_openai_client = AsyncOpenAI(
+                api_key=self._openai_key,
+                http_client=_create_async_http_client(openai)
+            )
+            logger.info("Async OpenAI client initialized successfully")
+        return self.async_openai_client
+    
+    def _get_async_anthropic(self) -> AsyncAnthropic:
+        """Lazily create the async Anthropic client with its pooled HTTP client"""
+        if self.async_anthropic_client is None:
+            if not self._anthropic_key:
+                raise ValueError("Anthropic client not initialized")
+            self.async_anthropic_client = AsyncAnthropic(
+                api_key=self._anthropic_key,
+                http_client=_create_async_http_client(anthropic)
+            )
+            logger.info("Async Anthropic client initialized successfully")
+        return self.async_anthropic_client
+    
+    async def _acall_openai(self, messages: list, model: str = "gpt-4", temperature: float = 0.7, response_format: Optional[Dict[str, Any]] = None) -> str:
+        """Call OpenAI API asynchronously with retry logic"""
+        client = self._get_async_openai()
+        
+        logger.info(f"Calling OpenAI API (async) - Model: {model}, Temperature: {temperature}")
+        logger.debug(f"OpenAI Request - Messages count: {len(messages)}")
+        
+        async def _make_call():
+            request = {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature
+            }
+            if response_format:
+                request["response_format"] = response_format
+            return await client.chat.completions.create(**request)
+        
+        try:
+            response = await llm_retry_handler.execute_async(_make_call)
+            
+            content = response.choices[0].message.content
+            logger.info(f"OpenAI API call successful (async) - Response length: {len(content)} chars")
+            logger.debug(f"OpenAI Usage - Tokens: {response.usage.total_tokens if hasattr(response, 'usage') else 'N/A'}")
+            
+            return content
+        except Exception as e:
+            logger.error(f"OpenAI API call failed after retries (async): {str(e)}", exc_info=True)
+            raise
+    
+    async def _acall_anthropic(self, messages: list, model: str = "claude-3-opus-20240229", temperature: float = 0.7) -> str:
+        """Call Anthropic API asynchronously with retry logic"""
+        client = self._get_async_anthropic()
+        
+        # Convert messages format for Anthropic
+        system_message = None
+        conversation = []
+        
+        for msg in messages:
+            if msg["role"] == "system":
+                system_message = msg["content"]
+            else:
+                conversation.append({
+                    "role": msg["role"],
+                    "content": msg["content"]
+                })
+        
+        logger.info(f"Calling Anthropic API (async) - Model: {model}, Temperature: {temperature}")
+        logger.debug(f"Anthropic Request - Conversation messages: {len(conversation)}")
+        
+        async def _make_call():
+            return await client.messages.create(
+                model=model,
+                max_tokens=4096,
+                system=system_message if system_message else "",
+                messages=conversation,
+                temperature=temperature
+            )
+        
+        try:
+            response = await llm_retry_handler.execute_async(_make_call)
+            
+            content = response.content[0].text
+            logger.info(f"Anthropic API call successful (async) - Response length: {len(content)} chars")
+            
+            return content
+        except Exception as e:
+            logger.error(f"Anthropic API call failed after retries (async): {str(e)}", exc_info=True)
+            raise
+    
+    async def acall_llm(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        use_anthropic: bool = False,
+        response_format: Optional[Dict[str, Any]] = None,
+        stage: Optional[str] = None
+    ) -> str:
+        """Async counterpart of call_llm that does not block the event loop"""
+        if not self._initialized:
+            self._initialize()
+        
+        if not self._openai_key and not self._anthropic_key:
+            raise ValueError("At least one LLM API key must be configured (OPENAI_API_KEY or ANTHROPIC_API_KEY). Please create a .env file in the backend directory with your API key.")
+        
+        provider, model = self._resolve_route(
+            model, use_anthropic, bool(self._openai_key), bool(self._anthropic_key)
+        )
+        cache_key = self._cache_key(stage, provider, model, messages, response_format)
+        cached = self._get_cached_response(cache_key, stage)
+        if cached is not None:
+            return cached
+        
+        if provider == "anthropic":
+            response = await self._acall_anthropic(messages, model)
         else:
-            raise ValueError("No LLM client available")
+            response = await self._acall_openai(messages, model, response_format=response_format)
+        
+        self._save_cached_response(cache_key, stage, response)
+        return response
+    
+    async def aclose(self):
+        """Close the pooled async HTTP connections"""
+        if self.async_openai_client is not None:
+            await self.async_openai_client.close()
+            self.async_openai_client = None
+        if self.async_anthropic_client is not None:
+            await self.async_anthropic_client.close()
+            self.async_anthropic_client = None
 
     def analyze_question(self, question_text: str, options: list = None) -> Dict[str, Any]:
         """Analyze question to determine type, subject, difficulty, etc."""
@@ -185,7 +500,7 @@ Respond with ONLY valid JSON, no additional text."""
         # Try OpenAI first, fallback to Anthropic
         try:
             logger.info("Attempting question analysis with OpenAI...")
-            response = self.call_llm(messages, use_anthropic=False)
+            response = self.call_llm(messages, use_anthropic=False, stage="question_analysis")
         except Exception as e:
             logger.warning(f"OpenAI API call failed: {e}. Falling back to Anthropic...")
             if not self.anthropic_client:
@@ -204,7 +519,7 @@ Respond with ONLY valid JSON, no additional text."""
                 )
                 raise ValueError(error_msg)
             logger.info("Using Anthropic as fallback for question analysis")
-            response = self.call_llm(messages, use_anthropic=True)
+            response = self.call_llm(messages, use_anthropic=True, stage="question_analysis")
         
         # Try to extract JSON from response
         try:
@@ -262,7 +577,7 @@ Follow the schema and requirements in the system prompt. Respond with ONLY valid
         # Try OpenAI first, fallback to Anthropic
         try:
             logger.info("Attempting story generation with OpenAI...")
-            response = self.call_llm(messages, use_anthropic=False)
+            response = self.call_llm(messages, use_anthropic=False, stage="story")
         except Exception as e:
             logger.warning(f"OpenAI API call failed: {e}. Falling back to Anthropic...")
             if not self.anthropic_client:
@@ -281,7 +596,7 @@ Follow the schema and requirements in the system prompt. Respond with ONLY valid
                 )
                 raise ValueError(error_msg)
             logger.info("Using Anthropic as fallback for story generation")
-            response = self.call_llm(messages, use_anthropic=True)
+            response = self.call_llm(messages, use_anthropic=True, stage="story")
         
         # Extract JSON
         try:
@@ -332,7 +647,7 @@ Generate ONLY the HTML code, no markdown, no explanations."""
         # Try OpenAI first, fallback to Anthropic
         try:
             logger.info("Attempting HTML generation with OpenAI...")
-            response = self.call_llm(messages, use_anthropic=False)
+            response = self.call_llm(messages, use_anthropic=False, stage="html")
         except Exception as e:
             logger.warning(f"OpenAI API call failed: {e}. Falling back to Anthropic...")
             if not self.anthropic_client:
@@ -351,7 +666,7 @@ Generate ONLY the HTML code, no markdown, no explanations."""
                 )
                 raise ValueError(error_msg)
             logger.info("Using Anthropic as fallback for HTML generation")
-            response = self.call_llm(messages, use_anthropic=True)
+            response = self.call_llm(messages, use_anthropic=True, stage="html")
         
         # Extract HTML
         logger.debug(f"Raw HTML response length: {len(response)} chars")
@@ -366,3 +681,15 @@ Generate ONLY the HTML code, no markdown, no explanations."""
         logger.debug(f"HTML preview (first 500 chars): {response[:500]}...")
         return response
 
+# Global LLM service instance, shared by every generator, orchestrator and request
+_llm_service_instance: Optional[LLMService] = None
+_llm_service_lock = threading.Lock()
+
+def get_llm_service() -> LLMService:
+    """Get global LLM service instance (one client and HTTP pool per provider)"""
+    global _llm_service_instance
+    if _llm_service_instance is None:
+        with _llm_service_lock:
+            if _llm_service_instance is None:
+                _llm_service_instance = LLMService()
+    return _llm_service_instance
@@ -0,0 +1,203 @@
+"""Near-duplicate question index (MinHash + LSH) for cache lookups"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+from pathlib import Path
+from typing import Optional, List, Set, Tuple
+
+# Near-duplicate lookup on exact cache misses (off by default); the threshold is the minimum
+# estimated Jaccard similarity of word shingles for a cached question to be reused
+CACHE_NEAR_DUP_ENABLED = os.getenv("CACHE_NEAR_DUP_ENABLED", "false").lower() == "true"
+CACHE_NEAR_DUP_THRESHOLD = float(os.getenv("CACHE_NEAR_DUP_THRESHOLD", "0.9"))
+
+# 32 bands x 4 rows: pairs at 0.9 similarity collide in at least one band with ~100% probability,
+# pairs at 0.5 with ~87%, so candidates are always re-checked against the threshold
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def _permutations() -> List[Tuple[int, int]]:
+    """Deterministic (a, b) pairs for the hash permutations, stable across processes"""
+    params = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.sha256(f"minhash-{i}".encode("utf-8")).digest()
+        a, b = struct.unpack("<QQ", digest[:16])
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return params
+
+_PERMUTATIONS = _permutations()
+
+# Question numbering ("3.", "Q3)", "Question 3:") and option labels ("(a)", "B.")
+# vary between documents and carry no meaning
+_QUESTION_NUMBER = re.compile(r"^\s*(?:q(?:uestion)?\s*)?\d+\s*[.):]\s+", re.IGNORECASE)
+_OPTION_LABEL = re.compile(r"^\s*(?:\([a-z]\)\s*|[a-z]\s*[.):]\s+)", re.IGNORECASE)
+
+def tokenize(question_text: str, options: list = None) -> List[str]:
+    """Lowercase word tokens with numbering, option labels and punctuation removed"""
+    text = _QUESTION_NUMBER.sub("", question_text or "", count=1)
+    if options:
+        text += " " + " ".join(sorted(_OPTION_LABEL.sub("", str(opt), count=1).lower() for opt in options))
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def shingles(tokens: List[str]) -> Set[str]:
+    """Word n-gram shingles (the whole token list if it is shorter than one shingle)"""
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+def minhash(shingle_set: Set[str]) -> List[int]:
+    """MinHash signature of a shingle set"""
+    hashes = [
+        struct.unpack("<I", hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest())[0]
+        for s in shingle_set
+    ]
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERMUTATIONS
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+def estimate_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity from two signatures"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERMUTATIONS
+
+def _band_keys(signature: List[int]) -> List[str]:
+    """LSH bucket key per band"""
+    return [
+        hashlib.md5(json.dumps(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]).encode("utf-8")).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
+
+def _numbers(tokens: List[str]) -> List[str]:
+    """Numeric tokens - questions differing only in their numbers are different questions"""
+    return sorted(t for t in tokens if t.isdigit())
+
+# Words that flip or change what a question asks for. A single one of them barely moves
+# the similarity of a long question ("which is NOT the most ..."), so they must match exactly.
+QUALIFIER_WORDS = {
+    "not", "no", "never", "none", "nor", "neither", "cannot", "except", "excluding", "without",
+    "false", "incorrect", "untrue", "invalid", "wrong", "unlikely",
+    "least", "most", "minimum", "maximum", "min", "max", "fewest", "smallest", "largest",
+    "lowest", "highest", "best", "worst", "more", "less", "fewer", "greater", "smaller",
+    "larger", "lower", "higher", "first", "last", "only", "all", "always"
+}
+
+_WORD = re.compile(r"[a-z]+n['\u2019]t|[a-z]+")
+
+def _qualifiers(question_text: str) -> List[str]:
+    """Negation and comparison words of a question ("isn't" counts as "not"), with repeats"""
+    words = (
+        "not" if word[-2:] in ("'t", "\u2019t") else word
+        for word in _WORD.findall((question_text or "").lower())
+    )
+    return sorted(word for word in words if word in QUALIFIER_WORDS)
+
+def _option_set(options: list = None) -> List[str]:
+    """Options without their labels, normalized and sorted"""
+    return sorted(
+        " ".join(re.findall(r"[a-z0-9]+", _OPTION_LABEL.sub("", str(opt), count=1).lower()))
+        for opt in options or []
+    )
+
+def _guard(question_text: str, options: list = None) -> str:
+    """What must match exactly for a near-duplicate to be reused"""
+    return json.dumps({"qualifiers": _qualifiers(question_text), "options": _option_set(options)}, sort_keys=True)
+
+class NearDuplicateIndex:
+    """Persistent LSH index from question signatures to question hashes"""
+    
+    def __init__(self, index_path: Path, threshold: float = CACHE_NEAR_DUP_THRESHOLD):
+        self.index_path = Path(index_path)
+        self.threshold = threshold
+        self._init_index()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _init_index(self):
+        """Create the signature and bucket tables"""
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_signatures (
+                    question_hash TEXT PRIMARY KEY,
+                    signature TEXT NOT NULL,
+                    numbers TEXT NOT NULL,
+                    guard TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(question_signatures)")}
+            if "guard" not in columns:
+                # Indexes written before the guard existed; their rows never match until re-added
+                conn.execute("ALTER TABLE question_signatures ADD COLUMN guard TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_lsh (
+                    band INTEGER NOT NULL,
+                    bucket TEXT NOT NULL,
+                    question_hash TEXT NOT NULL,
+                    PRIMARY KEY (band, bucket, question_hash)
+                )
+            """)
+        conn.close()
+    
+    def add(self, question_hash: str, question_text: str, options: list = None):
+        """Index a cached question"""
+        tokens = tokenize(question_text, options)
+        signature = minhash(shingles(tokens))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO question_signatures (question_hash, signature, numbers, guard) VALUES (?, ?, ?, ?)",
+                (question_hash, json.dumps(signature), json.dumps(_numbers(tokens)), _guard(question_text, options))
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO question_lsh (band, bucket, question_hash) VALUES (?, ?, ?)",
+                [(band, key, question_hash) for band, key in enumerate(_band_keys(signature))]
+            )
+        conn.close()
+    
+    def find(self, question_text: str, options: list = None, exclude_hash: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Indexed questions at or above the threshold as (question_hash, similarity), most similar first.
+        
+        Candidates must also have the same numbers, negation/comparison words and
+        option set, since those change the answer however similar the text is.
+        """
+        tokens = tokenize(question_text, options)
+        if not tokens:
+            return []
+        signature = minhash(shingles(tokens))
+        numbers = _numbers(tokens)
+        guard = _guard(question_text, options)
+        
+        bands = list(enumerate(_band_keys(signature)))
+        clause = " OR ".join(["(band = ? AND bucket = ?)"] * len(bands))
+        params = [value for band in bands for value in band]
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT question_hash, signature, numbers, guard FROM question_signatures
+                WHERE question_hash IN (SELECT question_hash FROM question_lsh WHERE {clause})
+                """,
+                params
+            ).fetchall()
+        conn.close()
+        
+        matches = []
+        for question_hash, candidate_signature, candidate_numbers, candidate_guard in rows:
+            if question_hash == exclude_hash or json.loads(candidate_numbers) != numbers:
+                continue
+            if candidate_guard != guard:
+                continue
+            similarity = estimate_similarity(signature, json.loads(candidate_signature))
+            if similarity >= self.threshold:
+                matches.append((question_hash, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
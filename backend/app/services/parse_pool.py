@@ -0,0 +1,166 @@
+"""Parse pool - bounded worker processes for CPU-bound document parsing"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+from app.utils.logger import setup_logger
+
+logger = setup_logger("parse_pool")
+
+# Worker processes parsing uploads at the same time
+PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS", "2"))
+
+# Seconds a parse may take before its worker is killed
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "60"))
+
+# Parses allowed to wait for a free worker before new uploads are rejected
+PARSE_MAX_PENDING = int(os.getenv("PARSE_MAX_PENDING", "16"))
+
+class ParseQueueFull(Exception):
+    """Raised when too many parses are already waiting for a worker"""
+
+class ParseTimeout(Exception):
+    """Raised when a parse runs longer than the pool's timeout"""
+
+class ParsePool:
+    """Run document parsing in a bounded process pool, off the event loop"""
+    
+    def __init__(
+        self,
+        workers: int = PARSE_POOL_WORKERS,
+        timeout: float = PARSE_TIMEOUT,
+        max_pending: int = PARSE_MAX_PENDING
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._executor = self._create_executor()
+        self._lock = threading.Lock()
+        # At most one submitted parse per worker, so a submitted parse starts at once and
+        # its timeout measures execution only; the rest wait here, not in the executor
+        self._slots = asyncio.Semaphore(self.workers)
+        self._in_flight = 0  # Running plus waiting for a worker
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.resubmitted = 0
+        self.total_seconds = 0.0
+    
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers)
+    
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run a parse function in the pool and wait for its result"""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise ParseQueueFull(f"Parse queue is full ({self._in_flight} documents in flight)")
+            self._in_flight += 1
+        
+        try:
+            async with self._slots:
+                with self._lock:
+                    self._running += 1
+                try:
+                    return await self._execute(fn, *args)
+                finally:
+                    with self._lock:
+                        self._running -= 1
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    async def _execute(self, fn: Callable, *args) -> Any:
+        """Submit to the current executor, resubmitting if another parse's timeout recycled it"""
+        while True:
+            executor = self._executor
+            started = time.monotonic()
+            future = executor.submit(fn, *args)
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._record(started)
+                # wait_for cancels the future; only a parse that already started needs its worker killed
+                if not future.cancelled():
+                    self._recycle(executor)
+                raise ParseTimeout(f"Document parsing timed out after {self.timeout:g}s")
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                recycled = executor is not self._executor and not asyncio.current_task().cancelling()
+                if not recycled:
+                    if isinstance(e, BrokenProcessPool):
+                        # A worker died (e.g. out of memory); replace the pool so later parses can run
+                        self.failed += 1
+                        self._record(started)
+                        self._recycle(executor)
+                    raise
+                # Killed by a recycle for another document's timeout: not this document's fault
+                self.resubmitted += 1
+                logger.info("Resubmitting parse interrupted by a pool recycle")
+                continue
+            except Exception:
+                self.failed += 1
+                self._record(started)
+                raise
+            self.completed += 1
+            self._record(started)
+            return result
+    
+    def _record(self, started: float):
+        with self._lock:
+            self.total_seconds += time.monotonic() - started
+    
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Replace the pool after a timeout or crash, killing the worker stuck on the slow document.
+        
+        Worker processes cannot be cancelled individually, so the whole pool is
+        replaced; parses running on its other workers are resubmitted to the new pool.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return  # Already replaced by another failed parse
+            self._executor = self._create_executor()
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        logger.warning(f"Parse pool recycled, terminated {len(processes)} worker(s)")
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and outcome counters"""
+        with self._lock:
+            finished = self.completed + self.failed + self.timeouts
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queue_depth": self._in_flight - self._running,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "resubmitted": self.resubmitted,
+                "avg_seconds": round(self.total_seconds / finished, 3) if finished else 0.0
+            }
+
+# Global parse pool instance
+_parse_pool_instance: Optional[ParsePool] = None
+_parse_pool_lock = threading.Lock()
+
+def get_parse_pool() -> ParsePool:
+    """Get global parse pool instance"""
+    global _parse_pool_instance
+    if _parse_pool_instance is None:
+        with _parse_pool_lock:
+            if _parse_pool_instance is None:
+                _parse_pool_instance = ParsePool()
+    return _parse_pool_instance
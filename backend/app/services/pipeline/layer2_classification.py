@@ -1,17 +1,50 @@
 """Layer 2: Intent Recognition & Classification"""
-from typing import Dict, Any, List
-from app.services.llm_service import LLMService
+from typing import Dict, Any, List, Optional
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from app.services.llm_service import get_llm_service
 from app.services.pipeline.validators import AnalysisValidator, ValidationResult
 from app.utils.logger import setup_logger
 import json
+import os
 
 logger = setup_logger("layer2_classification")
 
+# Analysis mode: "sequential" (each classifier sees the previous results),
+# "concurrent" (all classifiers run in parallel with partial context) or
+# "fused" (one structured call, per-field classifiers only as fallback)
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "sequential").lower()
+ANALYSIS_MODES = ["sequential", "concurrent", "fused"]
+
+# Optional OpenAI model for the fused call. When set, the call uses
+# json_schema structured output, which requires a model that supports it
+# (e.g. gpt-4o). When unset, the schema is only described in the prompt.
+FUSED_ANALYSIS_MODEL = os.getenv("FUSED_ANALYSIS_MODEL")
+
+QUESTION_TYPES = ["coding", "math", "science", "reasoning", "application", "word_problem", "code_completion", "fact_recall"]
+DIFFICULTY_LEVELS = ["beginner", "intermediate", "advanced"]
+
+# JSON schema for the fused analysis response
+FUSED_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question_type": {"type": "string", "enum": QUESTION_TYPES},
+        "subject": {"type": "string"},
+        "topic": {"type": "string"},
+        "difficulty": {"type": "string", "enum": DIFFICULTY_LEVELS},
+        "complexity_score": {"type": "integer"},
+        "key_concepts": {"type": "array", "items": {"type": "string"}},
+        "intent": {"type": "string"}
+    },
+    "required": ["question_type", "subject", "topic", "difficulty", "complexity_score", "key_concepts", "intent"],
+    "additionalProperties": False
+}
+
 class QuestionTypeClassifier:
     """Classify question types"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def classify(self, question_text: str, options: List[str] = None) -> Dict[str, Any]:
         """Classify question type"""
@@ -31,7 +64,7 @@ class QuestionTypeClassifier:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="question_analysis")
             
             # Parse JSON response
             if "```json" in response:
@@ -50,7 +83,7 @@ class SubjectIdentifier:
     """Identify subject and topic"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def identify(self, question_text: str, question_type: str = None) -> Dict[str, Any]:
         """Identify subject and topic"""
@@ -69,7 +102,7 @@ class SubjectIdentifier:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="question_analysis")
             
             # Parse JSON response
             if "```json" in response:
@@ -88,7 +121,7 @@ class ComplexityAnalyzer:
     """Analyze question complexity/difficulty"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def analyze(self, question_text: str, question_type: str = None, subject: str = None) -> Dict[str, Any]:
         """Analyze question complexity"""
@@ -109,7 +142,7 @@ class ComplexityAnalyzer:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="question_analysis")
             
             # Parse JSON response
             if "```json" in response:
@@ -128,7 +161,7 @@ class KeywordExtractor:
     """Extract key concepts and keywords"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def extract(self, question_text: str, subject: str = None) -> Dict[str, Any]:
         """Extract key concepts and keywords"""
@@ -147,7 +180,7 @@ class KeywordExtractor:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="question_analysis")
             
             # Parse JSON response
             if "```json" in response:
@@ -162,64 +195,216 @@ class KeywordExtractor:
             logger.error(f"Keyword extraction failed: {e}", exc_info=True)
             raise
 
+class FusedQuestionAnalyzer:
+    """Produce the complete analysis in a single schema-constrained call"""
+    
+    def __init__(self):
+        self.llm_service = get_llm_service()
+    
+    def analyze(self, question_text: str, options: List[str] = None) -> Dict[str, Any]:
+        """Analyze question type, subject, complexity and key concepts at once"""
+        logger.info("Running fused question analysis")
+        
+        prompt = f"""Analyze the following question and classify it in one pass.
+        
+        - question_type: one of {", ".join(QUESTION_TYPES)}
+        - subject: the subject area
+        - topic: the specific topic within the subject
+        - difficulty: one of {", ".join(DIFFICULTY_LEVELS)}
+        - complexity_score: integer from 1 to 10
+        - key_concepts: list of key concepts tested
+        - intent: what this question tests
+        
+        Question: {question_text}
+        Options: {options if options else "None"}
+        
+        Respond with ONLY a JSON object matching this schema: {json.dumps(FUSED_ANALYSIS_SCHEMA)}"""
+        
+        messages = [
+            {"role": "system", "content": "You are an educational content analysis expert. Always respond with valid JSON only."},
+            {"role": "user", "content": prompt}
+        ]
+        
+        # Structured output is an OpenAI feature; Anthropic-only setups use the prompt schema
+        model = None
+        response_format = None
+        if FUSED_ANALYSIS_MODEL and self.llm_service.openai_client:
+            model = FUSED_ANALYSIS_MODEL
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": "question_analysis", "schema": FUSED_ANALYSIS_SCHEMA, "strict": True}
+            }
+        
+        try:
+            response = self.llm_service.call_llm(
+                messages, model=model, use_anthropic=False, response_format=response_format,
+                stage="question_analysis"
+            )
+            
+            # Parse JSON response
+            if "```json" in response:
+                response = response.split("```json")[1].split("```")[0].strip()
+            elif "```" in response:
+                response = response.split("```")[1].split("```")[0].strip()
+            
+            result = json.loads(response)
+            logger.info(
+                f"Fused analysis - Type: {result.get('question_type')}, Subject: {result.get('subject')}, "
+                f"Difficulty: {result.get('difficulty')}"
+            )
+            return result
+        except Exception as e:
+            logger.error(f"Fused question analysis failed: {e}", exc_info=True)
+            raise
+
 class ClassificationOrchestrator:
     """Orchestrate all classification steps"""
     
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None):
         self.type_classifier = QuestionTypeClassifier()
         self.subject_identifier = SubjectIdentifier()
         self.complexity_analyzer = ComplexityAnalyzer()
         self.keyword_extractor = KeywordExtractor()
+        self.fused_analyzer = FusedQuestionAnalyzer()
         self.validator = AnalysisValidator()
+        self.llm_service = get_llm_service()
+        
+        self.mode = (mode or ANALYSIS_MODE).lower()
+        if self.mode not in ANALYSIS_MODES:
+            logger.warning(f"Unknown analysis mode '{self.mode}', falling back to sequential")
+            self.mode = "sequential"
+    
+    def _run_sequential(self, question_text: str, options: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Run classifiers one after another, feeding each result into the next"""
+        # Step 1: Classify question type
+        type_result = self.type_classifier.classify(question_text, options)
+        question_type = type_result.get("question_type", "reasoning")
+        
+        # Step 2: Identify subject
+        subject_result = self.subject_identifier.identify(question_text, question_type)
+        subject = subject_result.get("subject", "General")
+        
+        # Step 3: Analyze complexity
+        complexity_result = self.complexity_analyzer.analyze(question_text, question_type, subject)
+        
+        # Step 4: Extract keywords
+        keyword_result = self.keyword_extractor.extract(question_text, subject)
+        
+        return {
+            "type": type_result,
+            "subject": subject_result,
+            "complexity": complexity_result,
+            "keywords": keyword_result
+        }
+    
+    def _run_concurrent(self, question_text: str, options: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Fan all classifiers out on a thread pool with partial context.
+        
+        Each classifier already accepts missing question_type/subject, so the
+        four LLM round-trips overlap and the step costs roughly one round-trip.
+        Tasks run in a copy of the caller's context so their responses join its
+        deferred cache writes.
+        """
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="classification") as executor:
+            def submit(fn, *args):
+                return executor.submit(contextvars.copy_context().run, fn, *args)
+            
+            futures = {
+                "type": submit(self.type_classifier.classify, question_text, options),
+                "subject": submit(self.subject_identifier.identify, question_text),
+                "complexity": submit(self.complexity_analyzer.analyze, question_text),
+                "keywords": submit(self.keyword_extractor.extract, question_text)
+            }
+            # result() re-raises the first classifier failure, same as sequential mode
+            return {name: future.result() for name, future in futures.items()}
+    
+    def _run_fused(self, question_text: str, options: List[str] = None) -> Optional[Dict[str, Any]]:
+        """Run the single-call analysis; return None if it fails validation"""
+        try:
+            # The response is memoized only once it passed validation
+            with self.llm_service.deferred_cache():
+                result = self.fused_analyzer.analyze(question_text, options)
+                
+                analysis = {
+                    "question_type": result.get("question_type"),
+                    "subject": result.get("subject"),
+                    "difficulty": result.get("difficulty"),
+                    "key_concepts": result.get("key_concepts", []),
+                    "intent": result.get("intent", ""),
+                    "complexity_score": result.get("complexity_score"),
+                    "topic": result.get("topic")
+                }
+                
+                validation_result = self.validator.validate(analysis)
+                if not validation_result.is_valid:
+                    raise ValueError(f"validation failed: {validation_result.errors}")
+        except Exception as e:
+            logger.warning(f"Fused analysis failed, falling back to per-field classifiers: {e}")
+            return None
+        
+        logger.info(
+            f"Question analysis complete (fused) - Type: {analysis['question_type']}, "
+            f"Subject: {analysis['subject']}, Difficulty: {analysis['difficulty']}"
+        )
+        return {
+            "success": True,
+            "data": analysis,
+            "validation": validation_result.to_dict()
+        }
     
     def analyze_question(self, question_text: str, options: List[str] = None) -> Dict[str, Any]:
         """Run complete classification pipeline"""
-        logger.info("Starting complete question analysis")
+        logger.info(f"Starting complete question analysis (mode: {self.mode})")
+        
+        if self.mode == "fused":
+            fused_result = self._run_fused(question_text, options)
+            if fused_result:
+                return fused_result
         
         try:
-            # Step 1: Classify question type
-            type_result = self.type_classifier.classify(question_text, options)
-            question_type = type_result.get("question_type", "reasoning")
-            
-            # Step 2: Identify subject
-            subject_result = self.subject_identifier.identify(question_text, question_type)
-            subject = subject_result.get("subject", "General")
-            
-            # Step 3: Analyze complexity
-            complexity_result = self.complexity_analyzer.analyze(question_text, question_type, subject)
-            difficulty = complexity_result.get("difficulty", "intermediate")
-            
-            # Step 4: Extract keywords
-            keyword_result = self.keyword_extractor.extract(question_text, subject)
-            key_concepts = keyword_result.get("key_concepts", [])
-            intent = keyword_result.get("intent", "")
-            
-            # Combine results
-            analysis = {
-                "question_type": question_type,
-                "subject": subject,
-                "difficulty": difficulty,
-                "key_concepts": key_concepts,
-                "intent": intent,
-                "complexity_score": complexity_result.get("complexity_score"),
-                "topic": subject_result.get("topic")
-            }
-            
-            # Validate analysis
-            validation_result = self.validator.validate(analysis)
-            
-            if not validation_result.is_valid:
-                logger.error(f"Analysis validation failed: {validation_result.errors}")
-                raise ValueError(f"Analysis validation failed: {', '.join(validation_result.errors)}")
-            
-            logger.info(f"Question analysis complete - Type: {question_type}, Subject: {subject}, Difficulty: {difficulty}")
-            
-            return {
-                "success": True,
-                "data": analysis,
-                "validation": validation_result.to_dict()
-            }
+            # Classifier responses are memoized only once the combined analysis passed validation
+            with self.llm_service.deferred_cache():
+                if self.mode in ["concurrent", "fused"]:
+                    results = self._run_concurrent(question_text, options)
+                else:
+                    results = self._run_sequential(question_text, options)
+                
+                type_result = results["type"]
+                subject_result = results["subject"]
+                complexity_result = results["complexity"]
+                keyword_result = results["keywords"]
+                
+                question_type = type_result.get("question_type", "reasoning")
+                subject = subject_result.get("subject", "General")
+                difficulty = complexity_result.get("difficulty", "intermediate")
+                key_concepts = keyword_result.get("key_concepts", [])
+                intent = keyword_result.get("intent", "")
+                
+                # Combine results
+                analysis = {
+                    "question_type": question_type,
+                    "subject": subject,
+                    "difficulty": difficulty,
+                    "key_concepts": key_concepts,
+                    "intent": intent,
+                    "complexity_score": complexity_result.get("complexity_score"),
+                    "topic": subject_result.get("topic")
+                }
+                
+                # Validate analysis
+                validation_result = self.validator.validate(analysis)
+                
+                if not validation_result.is_valid:
+                    logger.error(f"Analysis validation failed: {validation_result.errors}")
+                    raise ValueError(f"Analysis validation failed: {', '.join(validation_result.errors)}")
+                
+                logger.info(f"Question analysis complete - Type: {question_type}, Subject: {subject}, Difficulty: {difficulty}")
+                
+                return {
+                    "success": True,
+                    "data": analysis,
+                    "validation": validation_result.to_dict()
+                }
         except Exception as e:
             logger.error(f"Question analysis failed: {e}", exc_info=True)
             raise
-
@@ -1,7 +1,7 @@
 """Layer 2.5: Template Router - Selects appropriate game template"""
 from typing import Dict, Any
-from pathlib import Path
-from app.services.llm_service import LLMService
+from app.services.llm_service import get_llm_service
+from app.services.prompt_store import get_prompt_store
 from app.utils.logger import setup_logger
 import json
 
@@ -11,21 +11,20 @@ class TemplateRouter:
     """Routes questions to appropriate game templates"""
     
     def __init__(self):
-        self.llm_service = LLMService()
-        self._load_system_prompt()
+        self.llm_service = get_llm_service()
+        self.prompt_store = get_prompt_store()
     
-    def _load_system_prompt(self) -> str:
-        """Load template router system prompt"""
-        prompt_path = Path(__file__).parent.parent.parent.parent / "prompts" / "template_router_system.txt"
-        try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                self.system_prompt = f.read()
-        except Exception as e:
-            logger.error(f"Failed to load template router prompt: {e}")
+    @property
+    def system_prompt(self) -> str:
+        """Template router system prompt"""
+        system_prompt = self.prompt_store.get("template_router_system.txt")
+        if system_prompt is None:
+            logger.error("Failed to load template router prompt")
             # Fallback prompt
-            self.system_prompt = """You are a template router for an educational game engine.
+            return """You are a template router for an educational game engine.
 Select one template from: LABEL_DIAGRAM, IMAGE_HOTSPOT_QA, SEQUENCE_BUILDER, TIMELINE_ORDER, BUCKET_SORT, MATCH_PAIRS, MATRIX_MATCH, PARAMETER_PLAYGROUND, GRAPH_SKETCHER, VECTOR_SANDBOX, STATE_TRACER_CODE, SPOT_THE_MISTAKE, CONCEPT_MAP_BUILDER, MICRO_SCENARIO_BRANCHING, DESIGN_CONSTRAINT_BUILDER, PROBABILITY_LAB, BEFORE_AFTER_TRANSFORMER, GEOMETRY_BUILDER.
 Respond with JSON: {"templateType": "...", "confidence": 0.0-1.0, "rationale": "..."}"""
+        return system_prompt
     
     def route_template(
         self,
@@ -61,10 +60,10 @@ Choose the best templateType."""
             # Try OpenAI first, fallback to Anthropic
             try:
                 logger.info("Attempting template routing with OpenAI...")
-                response = self.llm_service.call_llm(messages, use_anthropic=False)
+                response = self.llm_service.call_llm(messages, use_anthropic=False, stage="template_routing")
             except Exception as e:
                 logger.warning(f"OpenAI failed, trying Anthropic: {e}")
-                response = self.llm_service.call_llm(messages, use_anthropic=True)
+                response = self.llm_service.call_llm(messages, use_anthropic=True, stage="template_routing")
             
             # Extract JSON
             if "```json" in response:
@@ -1,17 +1,26 @@
 """Layer 3: Gamification Strategy Engine"""
-from typing import Dict, Any
-from app.services.llm_service import LLMService
+from typing import Dict, Any, Optional
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from app.services.llm_service import get_llm_service
 from app.services.prompt_selector import PromptSelector
 from app.utils.logger import setup_logger
 import json
+import os
 
 logger = setup_logger("layer3_strategy")
 
+# Strategy mode: "concurrent" runs the strategy calls as a dependency graph
+# (format first, then storyline and interactions in parallel), "sequential"
+# runs them one after another. Both produce the same strategy.
+STRATEGY_MODE = os.getenv("STRATEGY_MODE", "concurrent").lower()
+STRATEGY_MODES = ["sequential", "concurrent"]
+
 class GameFormatSelector:
     """Select optimal game format for question"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def select_format(
         self,
@@ -39,7 +48,7 @@ class GameFormatSelector:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="strategy")
             
             # Parse JSON response
             if "```json" in response:
@@ -59,7 +68,7 @@ class StorylineGenerator:
     """Generate narrative context and storyline"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def generate_storyline(
         self,
@@ -91,7 +100,7 @@ class StorylineGenerator:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="strategy")
             
             # Parse JSON response
             if "```json" in response:
@@ -110,7 +119,7 @@ class InteractionDesigner:
     """Define UI interactions and user experience"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def design_interactions(
         self,
@@ -140,7 +149,7 @@ class InteractionDesigner:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="strategy")
             
             # Parse JSON response
             if "```json" in response:
@@ -165,7 +174,7 @@ class DifficultyAdapter:
     """Adjust challenge level based on performance"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
     
     def adapt_difficulty(
         self,
@@ -196,7 +205,7 @@ class DifficultyAdapter:
         ]
         
         try:
-            response = self.llm_service.call_llm(messages, use_anthropic=False)
+            response = self.llm_service.call_llm(messages, use_anthropic=False, stage="strategy")
             
             # Parse JSON response
             if "```json" in response:
@@ -214,12 +223,95 @@ class DifficultyAdapter:
 class StrategyOrchestrator:
     """Orchestrate gamification strategy"""
     
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None):
         self.format_selector = GameFormatSelector()
         self.storyline_generator = StorylineGenerator()
         self.interaction_designer = InteractionDesigner()
         self.difficulty_adapter = DifficultyAdapter()
         self.prompt_selector = PromptSelector()
+        
+        self.mode = (mode or STRATEGY_MODE).lower()
+        if self.mode not in STRATEGY_MODES:
+            logger.warning(f"Unknown strategy mode '{self.mode}', falling back to concurrent")
+            self.mode = "concurrent"
+    
+    def _run_sequential(
+        self,
+        question_text: str,
+        question_type: str,
+        subject: str,
+        difficulty: str,
+        key_concepts: list
+    ) -> Dict[str, Any]:
+        """Run the strategy calls one after another"""
+        # Step 1: Select game format
+        format_result = self.format_selector.select_format(
+            question_type, subject, difficulty, key_concepts
+        )
+        game_format = format_result.get("game_format", "quiz")
+        
+        # Step 2: Generate storyline
+        storyline_result = self.storyline_generator.generate_storyline(
+            question_text, question_type, subject, game_format
+        )
+        
+        # Step 3: Design interactions
+        interaction_result = self.interaction_designer.design_interactions(
+            game_format, question_type, difficulty
+        )
+        
+        # Step 4: Get prompt template
+        prompt_template = self.prompt_selector.select_prompt(question_type, subject)
+        
+        return {
+            "format": format_result,
+            "storyline": storyline_result,
+            "interactions": interaction_result,
+            "prompt_template": prompt_template
+        }
+    
+    def _run_concurrent(
+        self,
+        question_text: str,
+        question_type: str,
+        subject: str,
+        difficulty: str,
+        key_concepts: list
+    ) -> Dict[str, Any]:
+        """Run the strategy calls following their dependencies.
+        
+        The prompt lookup has no LLM dependency and overlaps everything;
+        storyline and interactions only need game_format, so they run in
+        parallel once the format is known (two round-trips instead of three).
+        """
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="strategy") as executor:
+            def submit(fn, *args):
+                # Run in a copy of the caller's context so responses join its deferred cache writes
+                return executor.submit(contextvars.copy_context().run, fn, *args)
+            
+            prompt_future = submit(self.prompt_selector.select_prompt, question_type, subject)
+            format_future = submit(
+                self.format_selector.select_format, question_type, subject, difficulty, key_concepts
+            )
+            
+            format_result = format_future.result()
+            game_format = format_result.get("game_format", "quiz")
+            
+            storyline_future = submit(
+                self.storyline_generator.generate_storyline,
+                question_text, question_type, subject, game_format
+            )
+            interaction_future = submit(
+                self.interaction_designer.design_interactions,
+                game_format, question_type, difficulty
+            )
+            
+            return {
+                "format": format_result,
+                "storyline": storyline_future.result(),
+                "interactions": interaction_future.result(),
+                "prompt_template": prompt_future.result()
+            }
     
     def create_strategy(
         self,
@@ -227,7 +319,7 @@ class StrategyOrchestrator:
         analysis: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Create complete gamification strategy"""
-        logger.info("Creating gamification strategy")
+        logger.info(f"Creating gamification strategy (mode: {self.mode})")
         
         try:
             question_type = analysis.get("question_type", "reasoning")
@@ -235,31 +327,20 @@ class StrategyOrchestrator:
             difficulty = analysis.get("difficulty", "intermediate")
             key_concepts = analysis.get("key_concepts", [])
             
-            # Step 1: Select game format
-            format_result = self.format_selector.select_format(
-                question_type, subject, difficulty, key_concepts
-            )
-            game_format = format_result.get("game_format", "quiz")
-            
-            # Step 2: Generate storyline
-            storyline_result = self.storyline_generator.generate_storyline(
-                question_text, question_type, subject, game_format
-            )
+            if self.mode == "concurrent":
+                results = self._run_concurrent(question_text, question_type, subject, difficulty, key_concepts)
+            else:
+                results = self._run_sequential(question_text, question_type, subject, difficulty, key_concepts)
             
-            # Step 3: Design interactions
-            interaction_result = self.interaction_designer.design_interactions(
-                game_format, question_type, difficulty
-            )
-            
-            # Step 4: Get prompt template
-            prompt_template = self.prompt_selector.select_prompt(question_type, subject)
+            format_result = results["format"]
+            game_format = format_result.get("game_format", "quiz")
             
             strategy = {
                 "game_format": game_format,
                 "format_rationale": format_result.get("rationale"),
-                "storyline": storyline_result,
-                "interactions": interaction_result,
-                "prompt_template": prompt_template,
+                "storyline": results["storyline"],
+                "interactions": results["interactions"],
+                "prompt_template": results["prompt_template"],
                 "difficulty": difficulty
             }
             
@@ -271,4 +352,3 @@ class StrategyOrchestrator:
         except Exception as e:
             logger.error(f"Strategy creation failed: {e}", exc_info=True)
             raise
-
@@ -1,20 +1,98 @@
 """Layer 4: Multi-Modal Content Generation"""
-from typing import Dict, Any, Optional
-from pathlib import Path
-from app.services.llm_service import LLMService
+from typing import Dict, Any, Optional, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+from app.services.llm_service import get_llm_service
+from app.services.prompt_store import get_prompt_store
 from app.services.pipeline.validators import StoryValidator, HTMLValidator, ValidationResult
 from app.services.template_registry import get_registry
+from app.services.asset_store import get_asset_store
 from app.utils.logger import setup_logger
 import json
+import os
+import threading
+import time
 
 logger = setup_logger("layer4_generation")
 
+# Maximum number of asset requests generated at the same time
+ASSET_MAX_CONCURRENCY = int(os.getenv("ASSET_MAX_CONCURRENCY", "4"))
+
+# Per-provider limits: concurrent calls and requests per minute (0 = unlimited)
+DALLE_MAX_CONCURRENCY = int(os.getenv("DALLE_MAX_CONCURRENCY", "3"))
+DALLE_REQUESTS_PER_MINUTE = int(os.getenv("DALLE_REQUESTS_PER_MINUTE", "0"))
+
+class ProviderRateLimiter:
+    """Bound concurrent calls and pace call starts for one provider"""
+    
+    def __init__(self, name: str, max_concurrency: int, requests_per_minute: int = 0):
+        self.name = name
+        self._semaphore = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._min_interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        self._semaphore.acquire()
+        if self._min_interval:
+            # Reserve the next start slot, then sleep outside the lock
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, self._next_start)
+                self._next_start = start_at + self._min_interval
+            delay = start_at - now
+            if delay > 0:
+                logger.debug(f"Rate limiting {self.name} call - waiting {delay:.2f}s")
+                time.sleep(delay)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._semaphore.release()
+        return False
+
+# Global provider limiters, shared by every generator in the process
+_provider_limiters: Dict[str, ProviderRateLimiter] = {
+    "dalle": ProviderRateLimiter("dalle", DALLE_MAX_CONCURRENCY, DALLE_REQUESTS_PER_MINUTE)
+}
+
+def get_provider_limiter(provider: str) -> ProviderRateLimiter:
+    """Get rate limiter for an asset provider"""
+    return _provider_limiters[provider]
+
 class StoryGenerator:
     """Generate story data from question and strategy"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.validator = StoryValidator()
+        self.prompt_store = get_prompt_store()
+    
+    @staticmethod
+    def _is_algorithmic(question_data: Dict[str, Any], template_type: str) -> bool:
+        """Check if this is an algorithmic/coding question (regardless of initial template routing)"""
+        question_type = question_data.get('question_type', '')
+        subject = question_data.get('subject', '')
+        key_concepts = question_data.get('key_concepts', [])
+        question_text = question_data.get('text', '').lower()
+        
+        # If template is STATE_TRACER_CODE or PARAMETER_PLAYGROUND, route to ALGORITHM_VISUALIZATION
+        return (
+            template_type in ["PARAMETER_PLAYGROUND", "STATE_TRACER_CODE"] or
+            question_type == "coding" or 
+            "algorithm" in str(key_concepts).lower() or
+            "coding" in subject.lower() or
+            any(concept in ["binary search", "sorting", "graph", "cycle", "two pointer", "sliding window", "dynamic programming", "floyd", "tortoise", "hare", "duplicate", "array", "linked list"] 
+                for concept in str(key_concepts).lower() + question_text)
+        )
+    
+    def prompt_files(self, question_data: Dict[str, Any], template_type: Optional[str]) -> List[str]:
+        """Prompt store names generate() will read for this question (used for cache keys)"""
+        files = ["story_base.md"]
+        if template_type:
+            template_name = "ALGORITHM_VISUALIZATION" if self._is_algorithmic(question_data, template_type) else template_type
+            if not self.prompt_store.exists(f"story_templates/{template_name}.txt"):
+                template_name = template_type
+            files.append(f"story_templates/{template_name}.txt")
+        return files
     
     def generate(
         self,
@@ -25,61 +103,38 @@ class StoryGenerator:
     ) -> Dict[str, Any]:
         """Generate complete story data"""
         
-        # Load base story prompt
-        base_prompt_path = Path(__file__).parent.parent.parent.parent / "prompts" / "story_base.md"
-        try:
-            with open(base_prompt_path, 'r', encoding='utf-8') as f:
-                base_prompt = f.read()
-        except Exception as e:
-            logger.warning(f"Failed to load story_base.md, using provided template: {e}")
+        # Base story prompt and template supplements come precomposed from the prompt store
+        base_prompt = self.prompt_store.get("story_base.md")
+        if base_prompt is None:
+            logger.warning("story_base.md not found, using provided template")
             base_prompt = prompt_template
         
-        # Load template-specific supplement if template_type is provided
         system_prompt = base_prompt
         actual_template = template_type  # Track the actual template being used
         if template_type:
             # Check if this is an algorithmic/coding question - use ALGORITHM_VISUALIZATION for any coding/algorithm question
-            question_type = question_data.get('question_type', '')
-            subject = question_data.get('subject', '')
-            key_concepts = question_data.get('key_concepts', [])
-            question_text = question_data.get('text', '').lower()
-            
-            # Check if this is an algorithmic/coding question (regardless of initial template routing)
-            # If template is STATE_TRACER_CODE or PARAMETER_PLAYGROUND, route to ALGORITHM_VISUALIZATION
-            is_algorithmic = (
-                template_type in ["PARAMETER_PLAYGROUND", "STATE_TRACER_CODE"] or
-                question_type == "coding" or 
-                "algorithm" in str(key_concepts).lower() or
-                "coding" in subject.lower() or
-                any(concept in ["binary search", "sorting", "graph", "cycle", "two pointer", "sliding window", "dynamic programming", "floyd", "tortoise", "hare", "duplicate", "array", "linked list"] 
-                    for concept in str(key_concepts).lower() + question_text)
-            )
+            is_algorithmic = self._is_algorithmic(question_data, template_type)
             
             # Use ALGORITHM_VISUALIZATION for algorithmic questions, otherwise use template_type
             template_name = "ALGORITHM_VISUALIZATION" if is_algorithmic else template_type
             actual_template = template_name  # Update to show actual template being used
             
-            template_supplement_path = Path(__file__).parent.parent.parent.parent / "prompts" / "story_templates" / f"{template_name}.txt"
-            try:
-                with open(template_supplement_path, 'r', encoding='utf-8') as f:
-                    template_supplement = f.read()
-                    system_prompt = base_prompt + "\n\n" + template_supplement
-                    logger.info(f"Generating story data (template: {template_name})")
-                    if is_algorithmic:
-                        logger.info(f"Using ALGORITHM_VISUALIZATION template for algorithmic question (routed from {template_type})")
-            except Exception as e:
-                # Fallback to original template_type if ALGORITHM_VISUALIZATION doesn't exist
+            composed_prompt = self.prompt_store.compose("story_base.md", f"story_templates/{template_name}.txt")
+            if composed_prompt is not None:
+                system_prompt = composed_prompt
+                logger.info(f"Generating story data (template: {template_name})")
                 if is_algorithmic:
-                    template_supplement_path = Path(__file__).parent.parent.parent.parent / "prompts" / "story_templates" / f"{template_type}.txt"
-                    try:
-                        with open(template_supplement_path, 'r', encoding='utf-8') as f:
-                            template_supplement = f.read()
-                            system_prompt = base_prompt + "\n\n" + template_supplement
-                            logger.info(f"Loaded fallback template supplement for {template_type}")
-                    except Exception as e2:
-                        logger.warning(f"Failed to load template supplement for {template_type}: {e2}")
+                    logger.info(f"Using ALGORITHM_VISUALIZATION template for algorithmic question (routed from {template_type})")
+            elif is_algorithmic:
+                # Fallback to original template_type if ALGORITHM_VISUALIZATION doesn't exist
+                composed_prompt = self.prompt_store.compose("story_base.md", f"story_templates/{template_type}.txt")
+                if composed_prompt is not None:
+                    system_prompt = composed_prompt
+                    logger.info(f"Loaded fallback template supplement for {template_type}")
                 else:
-                    logger.warning(f"Failed to load template supplement for {template_type}: {e}")
+                    logger.warning(f"Failed to load template supplement for {template_type}")
+            else:
+                logger.warning(f"Failed to load template supplement for {template_type}")
                 # Use base prompt only
         
         user_prompt = f"""Generate a story-based visualization for the following question:
@@ -107,10 +162,10 @@ Follow the schema and requirements in the system prompt. Respond with ONLY valid
             # Try OpenAI first, fallback to Anthropic
             try:
                 logger.info("Attempting story generation with OpenAI...")
-                response = self.llm_service.call_llm(messages, use_anthropic=False)
+                response = self.llm_service.call_llm(messages, use_anthropic=False, stage="story")
             except Exception as e:
                 logger.warning(f"OpenAI failed, trying Anthropic: {e}")
-                response = self.llm_service.call_llm(messages, use_anthropic=True)
+                response = self.llm_service.call_llm(messages, use_anthropic=True, stage="story")
             
             # Extract JSON
             if "```json" in response:
@@ -174,7 +229,7 @@ class HTMLGenerator:
     """Generate HTML visualization from story data"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.validator = HTMLValidator()
     
     def generate(self, story_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -205,10 +260,10 @@ Generate ONLY the HTML code, no markdown, no explanations."""
             # Try OpenAI first, fallback to Anthropic
             try:
                 logger.info("Attempting HTML generation with OpenAI...")
-                response = self.llm_service.call_llm(messages, use_anthropic=False)
+                response = self.llm_service.call_llm(messages, use_anthropic=False, stage="html")
             except Exception as e:
                 logger.warning(f"OpenAI failed, trying Anthropic: {e}")
-                response = self.llm_service.call_llm(messages, use_anthropic=True)
+                response = self.llm_service.call_llm(messages, use_anthropic=True, stage="html")
             
             # Extract HTML
             if "```html" in response:
@@ -241,7 +296,7 @@ class ImageGenerator:
     """Generate images for visualizations using DALL-E"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.openai_client = None
         if self.llm_service.openai_client:
             self.openai_client = self.llm_service.openai_client
@@ -289,7 +344,7 @@ class AnimationGenerator:
     """Generate animations using DALL-E frame sequences"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.openai_client = None
         if self.llm_service.openai_client:
             self.openai_client = self.llm_service.openai_client
@@ -350,68 +405,75 @@ class AnimationGenerator:
                 "message": f"Animation generation failed: {str(e)}"
             }
 
+BLUEPRINT_FALLBACK_PROMPT = """You are a Game Blueprint Generator. Generate JSON blueprints matching TypeScript interfaces."""
+
 class BlueprintGenerator:
     """Generate game blueprint JSON from story data and template"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
         self.template_registry = get_registry()
-        self._load_base_prompt()
+        self.prompt_store = get_prompt_store()
     
-    def _load_base_prompt(self):
-        """Load base blueprint prompt"""
-        prompt_path = Path(__file__).parent.parent.parent.parent / "prompts" / "blueprint_base.md"
-        try:
-            with open(prompt_path, 'r', encoding='utf-8') as f:
-                self.base_prompt = f.read()
-        except Exception as e:
-            logger.error(f"Failed to load blueprint_base.md: {e}")
-            self.base_prompt = """You are a Game Blueprint Generator. Generate JSON blueprints matching TypeScript interfaces."""
+    @property
+    def base_prompt(self) -> str:
+        """Base blueprint prompt"""
+        base_prompt = self.prompt_store.get("blueprint_base.md")
+        if base_prompt is None:
+            logger.error("Failed to load blueprint_base.md")
+            return BLUEPRINT_FALLBACK_PROMPT
+        return base_prompt
     
-    def _load_ts_interface(self, template_type: str, story_data: Dict[str, Any] = None) -> str:
-        """Load TypeScript interface for template"""
+    def _is_algorithmic_story(self, story_data: Dict[str, Any]) -> bool:
+        """Check story data for algorithmic indicators"""
+        key_concepts = story_data.get('key_concepts', [])
+        learning_alignment = story_data.get('learning_alignment', '')
+        story_title = story_data.get('story_title', '').lower()
+        
+        return (
+            "algorithm" in str(key_concepts).lower() or
+            "coding" in str(learning_alignment).lower() or
+            any(concept in ["binary search", "sorting", "graph", "cycle", "two pointer", "sliding window", "dynamic programming", "floyd", "tortoise", "hare", "duplicate", "array", "linked list"] 
+                for concept in str(key_concepts).lower() + str(learning_alignment).lower() + story_title)
+        )
+    
+    def _resolve_interface(self, template_type: str, story_data: Dict[str, Any] = None) -> str:
+        """Name of the TypeScript interface to use for a template"""
         # For coding/algorithm questions, use ALGORITHM_VISUALIZATION regardless of initial template routing
         # If template is STATE_TRACER_CODE or PARAMETER_PLAYGROUND, route to ALGORITHM_VISUALIZATION
-        if template_type in ["PARAMETER_PLAYGROUND", "STATE_TRACER_CODE"]:
-            interface_path = Path(__file__).parent.parent.parent.parent / "prompts" / "blueprint_templates" / "ALGORITHM_VISUALIZATION.ts.txt"
-            try:
-                with open(interface_path, 'r', encoding='utf-8') as f:
-                    logger.info(f"Loaded ALGORITHM_VISUALIZATION blueprint interface (routed from {template_type})")
-                    return f.read()
-            except Exception as e:
-                logger.warning(f"Failed to load ALGORITHM_VISUALIZATION interface, falling back to {template_type}: {e}")
-        
-        # Also check story_data for algorithmic indicators
-        if story_data:
-            key_concepts = story_data.get('key_concepts', [])
-            learning_alignment = story_data.get('learning_alignment', '')
-            story_title = story_data.get('story_title', '').lower()
-            
-            # Check if this is an algorithmic/coding question
-            is_algorithmic = (
-                "algorithm" in str(key_concepts).lower() or
-                "coding" in str(learning_alignment).lower() or
-                any(concept in ["binary search", "sorting", "graph", "cycle", "two pointer", "sliding window", "dynamic programming", "floyd", "tortoise", "hare", "duplicate", "array", "linked list"] 
-                    for concept in str(key_concepts).lower() + str(learning_alignment).lower() + story_title)
-            )
-            
-            if is_algorithmic:
-                interface_path = Path(__file__).parent.parent.parent.parent / "prompts" / "blueprint_templates" / "ALGORITHM_VISUALIZATION.ts.txt"
-                try:
-                    with open(interface_path, 'r', encoding='utf-8') as f:
-                        logger.info(f"Loaded ALGORITHM_VISUALIZATION blueprint interface (detected algorithmic question)")
-                        return f.read()
-                except Exception as e:
-                    logger.warning(f"Failed to load ALGORITHM_VISUALIZATION interface, falling back to {template_type}: {e}")
-        
-        # Default: use template_type
-        interface_path = Path(__file__).parent.parent.parent.parent / "prompts" / "blueprint_templates" / f"{template_type}.ts.txt"
-        try:
-            with open(interface_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            logger.error(f"Failed to load TS interface for {template_type}: {e}")
+        uses_algorithm = (
+            template_type in ["PARAMETER_PLAYGROUND", "STATE_TRACER_CODE"]
+            or (story_data and self._is_algorithmic_story(story_data))
+        )
+        if uses_algorithm:
+            if self.prompt_store.exists("blueprint_templates/ALGORITHM_VISUALIZATION.ts.txt"):
+                return "ALGORITHM_VISUALIZATION"
+            logger.warning(f"ALGORITHM_VISUALIZATION interface not found, falling back to {template_type}")
+        return template_type
+    
+    def prompt_files(self, template_type: str, story_data: Dict[str, Any] = None) -> List[str]:
+        """Prompt store names generate() will read for this story (used for cache keys)"""
+        interface_name = self._resolve_interface(template_type, story_data)
+        return ["blueprint_base.md", f"blueprint_templates/{interface_name}.ts.txt"]
+    
+    def _load_ts_interface(self, template_type: str, story_data: Dict[str, Any] = None) -> str:
+        """Load TypeScript interface for template"""
+        interface_name = self._resolve_interface(template_type, story_data)
+        ts_interface = self.prompt_store.get(f"blueprint_templates/{interface_name}.ts.txt")
+        if ts_interface is None:
+            logger.error(f"Failed to load TS interface for {template_type}")
             return f"// TypeScript interface for {template_type}"
+        if interface_name != template_type:
+            logger.info(f"Loaded ALGORITHM_VISUALIZATION blueprint interface (routed from {template_type})")
+        return ts_interface
+    
+    def _system_prompt(self, template_type: str, story_data: Dict[str, Any], ts_interface: str) -> str:
+        """Base prompt plus the template's TypeScript interface (precomposed by the prompt store)"""
+        interface_name = self._resolve_interface(template_type, story_data)
+        system_prompt = self.prompt_store.compose("blueprint_base.md", f"blueprint_templates/{interface_name}.ts.txt")
+        if system_prompt is None:
+            system_prompt = self.base_prompt + "\n\n" + ts_interface
+        return system_prompt
     
     def generate(
         self,
@@ -428,19 +490,8 @@ class BlueprintGenerator:
             actual_template = "ALGORITHM_VISUALIZATION"
             logger.info(f"Generating blueprint for template: {actual_template} (routed from {template_type})")
         elif story_data:
-            key_concepts = story_data.get('key_concepts', [])
-            learning_alignment = story_data.get('learning_alignment', '')
-            story_title = story_data.get('story_title', '').lower()
-            
             # Check if this is an algorithmic/coding question
-            is_algorithmic = (
-                "algorithm" in str(key_concepts).lower() or
-                "coding" in str(learning_alignment).lower() or
-                any(concept in ["binary search", "sorting", "graph", "cycle", "two pointer", "sliding window", "dynamic programming", "floyd", "tortoise", "hare", "duplicate", "array", "linked list"] 
-                    for concept in str(key_concepts).lower() + str(learning_alignment).lower() + story_title)
-            )
-            
-            if is_algorithmic:
+            if self._is_algorithmic_story(story_data):
                 actual_template = "ALGORITHM_VISUALIZATION"
                 logger.info(f"Generating blueprint for template: {actual_template} (detected algorithmic question)")
             else:
@@ -458,7 +509,7 @@ class BlueprintGenerator:
         ts_interface = self._load_ts_interface(template_type, story_data)
         
         # Build system prompt
-        system_prompt = self.base_prompt + "\n\n" + ts_interface
+        system_prompt = self._system_prompt(template_type, story_data, ts_interface)
         
         # Build user prompt with original question for algorithm correctness
         question_context = ""
@@ -491,10 +542,10 @@ Do not wrap the response in any additional text."""
             # Try OpenAI first, fallback to Anthropic
             try:
                 logger.info("Attempting blueprint generation with OpenAI...")
-                response = self.llm_service.call_llm(messages, use_anthropic=False)
+                response = self.llm_service.call_llm(messages, use_anthropic=False, stage="blueprint")
             except Exception as e:
                 logger.warning(f"OpenAI failed, trying Anthropic: {e}")
-                response = self.llm_service.call_llm(messages, use_anthropic=True)
+                response = self.llm_service.call_llm(messages, use_anthropic=True, stage="blueprint")
             
             # Extract JSON
             if "```json" in response:
@@ -654,13 +705,26 @@ class AssetGenerator:
     """Generates assets (images, animations, etc.) from prompts using DALL-E and other services"""
     
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = get_llm_service()
+        self.asset_store = get_asset_store()
         self.openai_client = None
         if self.llm_service.openai_client:
             self.openai_client = self.llm_service.openai_client
     
     def _generate_image_dalle(self, prompt: str, size: str = "1024x1024") -> Optional[str]:
-        """Generate image using DALL-E API"""
+        """Generate image using DALL-E API
+        
+        Images are content-addressed by (prompt, size, model): a stored image
+        is returned without calling the provider, and new images are
+        downloaded once into the asset store.
+        """
+        model = "dall-e-3"
+        asset_key = self.asset_store.compute_key(prompt, size, model)
+        stored_url = self.asset_store.lookup(asset_key)
+        if stored_url:
+            logger.info(f"Reusing stored image for prompt: {prompt[:100]}...")
+            return stored_url
+        
         if not self.openai_client:
             logger.warning("OpenAI client not available, cannot generate images with DALL-E")
             return None
@@ -671,20 +735,24 @@ class AssetGenerator:
             # Enhanced prompt for educational content
             enhanced_prompt = f"Educational illustration, clear and colorful, suitable for learning: {prompt}"
             
-            response = self.openai_client.images.generate(
-                model="dall-e-3",
-                prompt=enhanced_prompt,
-                size=size,
-                quality="standard",
-                n=1,
-            )
+            with get_provider_limiter("dalle"):
+                response = self.openai_client.images.generate(
+                    model=model,
+                    prompt=enhanced_prompt,
+                    size=size,
+                    quality="standard",
+                    n=1,
+                )
             
             image_url = response.data[0].url
             logger.info(
                 f"DALL-E image generated successfully - URL: {image_url[:100]}... "
-                f"Model: dall-e-3, Size: {size}"
+                f"Model: {model}, Size: {size}"
             )
-            return image_url
+            
+            # Provider URLs expire, so keep our own copy; fall back to the provider URL if that fails
+            stored_url = self.asset_store.store_from_url(asset_key, image_url)
+            return stored_url or image_url
             
         except Exception as e:
             logger.error(
@@ -702,13 +770,17 @@ class AssetGenerator:
         try:
             logger.info(f"Generating animation: {prompt[:100]}...")
             
-            # Generate multiple frames for animation
-            frame_urls = []
-            for i in range(frames):
-                frame_prompt = f"{prompt}, frame {i+1} of {frames}, showing progression"
-                frame_url = self._generate_image_dalle(frame_prompt, size="1024x1024")
-                if frame_url:
-                    frame_urls.append(frame_url)
+            # Generate frames concurrently; the DALL-E limiter bounds the actual calls
+            frame_prompts = [
+                f"{prompt}, frame {i+1} of {frames}, showing progression"
+                for i in range(frames)
+            ]
+            with ThreadPoolExecutor(max_workers=max(1, frames), thread_name_prefix="animation_frame") as executor:
+                results = list(executor.map(
+                    lambda frame_prompt: self._generate_image_dalle(frame_prompt, size="1024x1024"),
+                    frame_prompts
+                ))
+            frame_urls = [frame_url for frame_url in results if frame_url]
             
             if len(frame_urls) > 1:
                 # For now, return the first frame URL
@@ -724,8 +796,43 @@ class AssetGenerator:
             logger.error(f"Failed to generate animation: {e}")
             return None
     
+    def _placeholder_url(self, purpose: str) -> str:
+        """Placeholder URL used when an asset cannot be generated"""
+        return f"https://placeholder.com/800x600?text={purpose.replace('_', '+')}"
+    
+    def _generate_asset(self, req: AssetRequest) -> Tuple[Optional[str], bool]:
+        """Generate a single asset and return (url, generated)"""
+        if req.type == "image":
+            logger.info(f"Generating image asset: {req.purpose} - Prompt: {req.prompt[:100]}...")
+            url = self._generate_image_dalle(req.prompt)
+            label = "DALL-E image"
+        elif req.type == "animation":
+            logger.info(f"Generating animation: {req.purpose} - Prompt: {req.prompt[:100]}...")
+            url = self._generate_animation(req.prompt)
+            label = "animation"
+        else:
+            logger.warning(f"Unsupported asset type {req.type} for {req.purpose}, skipping")
+            return None, False
+        
+        if url:
+            logger.info(f"Successfully generated {label} for {req.purpose} - URL: {url[:100]}...")
+            return url, True
+        
+        # Fallback to placeholder if generation fails
+        logger.warning(
+            f"{label} generation failed for {req.purpose}, using placeholder. "
+            f"Prompt was: {req.prompt[:100]}"
+        )
+        return self._placeholder_url(req.purpose), False
+    
     def generate_assets(self, requests: list[AssetRequest]) -> Dict[str, str]:
-        """Generate assets and return URL map"""
+        """Generate assets concurrently and return URL map
+        
+        Requests run on a bounded thread pool (ASSET_MAX_CONCURRENCY) and
+        provider calls go through the provider rate limiters, so the step
+        takes roughly the slowest asset instead of the sum of all of them.
+        A failing request falls back to a placeholder without affecting others.
+        """
         urls = {}
         total_requests = len(requests)
         dalle_success = 0
@@ -734,54 +841,27 @@ class AssetGenerator:
         
         logger.info(f"Starting asset generation for {total_requests} asset(s)")
         
-        for req in requests:
-            if req.type == "image":
-                logger.info(f"Generating image asset: {req.purpose} - Prompt: {req.prompt[:100]}...")
-                
-                # Try DALL-E generation
-                image_url = self._generate_image_dalle(req.prompt)
+        if requests:
+            max_workers = max(1, min(ASSET_MAX_CONCURRENCY, total_requests))
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asset") as executor:
+                futures = [(req, executor.submit(self._generate_asset, req)) for req in requests]
                 
-                if image_url:
-                    urls[req.purpose] = image_url
-                    dalle_success += 1
-                    logger.info(
-                        f"Successfully generated DALL-E image for {req.purpose} - "
-                        f"URL: {image_url[:100]}..."
-                    )
-                else:
-                    # Fallback to placeholder if DALL-E fails
-                    dalle_failed += 1
-                    placeholder_used += 1
-                    placeholder_url = f"https://placeholder.com/800x600?text={req.purpose.replace('_', '+')}"
-                    urls[req.purpose] = placeholder_url
-                    logger.warning(
-                        f"DALL-E generation failed for {req.purpose}, using placeholder. "
-                        f"Prompt was: {req.prompt[:100]}"
-                    )
-            
-            elif req.type == "animation":
-                logger.info(f"Generating animation: {req.purpose} - Prompt: {req.prompt[:100]}...")
-                
-                # Generate animation
-                animation_url = self._generate_animation(req.prompt)
-                
-                if animation_url:
-                    urls[req.purpose] = animation_url
-                    dalle_success += 1
-                    logger.info(
-                        f"Successfully generated animation for {req.purpose} - "
-                        f"URL: {animation_url[:100]}..."
-                    )
-                else:
-                    # Fallback to placeholder
-                    dalle_failed += 1
-                    placeholder_used += 1
-                    placeholder_url = f"https://placeholder.com/800x600?text={req.purpose.replace('_', '+')}"
-                    urls[req.purpose] = placeholder_url
-                    logger.warning(
-                        f"Animation generation failed for {req.purpose}, using placeholder. "
-                        f"Prompt was: {req.prompt[:100]}"
-                    )
+                for req, future in futures:
+                    try:
+                        url, generated = future.result()
+                    except Exception as e:
+                        logger.error(f"Asset generation raised for {req.purpose}: {e}", exc_info=True)
+                        url, generated = self._placeholder_url(req.purpose), False
+                    
+                    if url is None:
+                        continue
+                    
+                    urls[req.purpose] = url
+                    if generated:
+                        dalle_success += 1
+                    else:
+                        dalle_failed += 1
+                        placeholder_used += 1
         
         # Log summary
         logger.info(
@@ -1,4 +1,5 @@
 """Pipeline Orchestrator - Executes pipeline steps with validation and tracking"""
+import threading
 from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
 from datetime import datetime
@@ -9,6 +10,7 @@ from app.repositories.question_repository import QuestionRepository
 from app.repositories.story_repository import StoryRepository
 from app.repositories.visualization_repository import VisualizationRepository
 from app.repositories.game_blueprint_repository import GameBlueprintRepository
+from app.repositories.blob_repository import BlobRepository
 from app.services.pipeline.layer1_input import DocumentParserService, QuestionExtractorService
 from app.services.pipeline.layer2_classification import ClassificationOrchestrator
 from app.services.pipeline.layer2_template_router import TemplateRouter
@@ -16,7 +18,9 @@ from app.services.pipeline.layer3_strategy import StrategyOrchestrator
 from app.services.pipeline.layer4_generation import GenerationOrchestrator
 from app.services.pipeline.validators import get_validator
 from app.services.pipeline.retry_handler import RetryHandler
-from app.services.cache_service import CacheService
+from app.services.cache_service import get_cache_service
+from app.services.llm_service import get_llm_service
+from app.services.asset_store import ASSET_URL_PREFIX
 from app.utils.logger import setup_logger
 
 logger = setup_logger("orchestrator")
@@ -48,22 +52,23 @@ class PipelineOrchestrator:
         self.template_router = TemplateRouter()
         self.strategy_orchestrator = StrategyOrchestrator()
         self.generation_orchestrator = GenerationOrchestrator()
-        self.cache_service = CacheService()
+        self.cache_service = get_cache_service()
     
     def execute_pipeline(
         self,
         process_id: str,
         question_id: str,
         file_content: bytes = None,
-        filename: str = None
+        filename: str = None,
+        abandon: Optional[threading.Event] = None
     ) -> Dict[str, Any]:
-        """Execute complete pipeline for a question"""
+        """Execute complete pipeline for a question (stops before the next step once abandon is set)"""
         logger.info(f"Starting pipeline execution - Process: {process_id}, Question: {question_id}")
         
         try:
-            # Update process status
+            # Update process status (committed together with the first step's start)
             ProcessRepository.update_status(
-                self.db, process_id, "processing", progress=0, current_step="Initializing"
+                self.db, process_id, "processing", progress=0, current_step="Initializing", commit=False
             )
             
             # Get question
@@ -89,14 +94,27 @@ class PipelineOrchestrator:
             }
             
             # Execute each step
+            # Steps left pending/processing by a dead worker are closed out even if none finished
+            self._mark_interrupted_steps(process_id)
             last_completed_step = PipelineStepRepository.get_last_completed_step(self.db, process_id)
             start_from_step = (last_completed_step.step_number + 1) if last_completed_step else 1
             
+            if start_from_step > 1:
+                # Resuming (e.g. a worker picked up an abandoned job) - rebuild state from stored outputs
+                logger.info(f"Resuming process {process_id} from step {start_from_step}")
+                self._restore_pipeline_state(process_id, pipeline_state, start_from_step)
+            
             for step_def in self.PIPELINE_STEPS:
                 if step_def["number"] < start_from_step:
                     logger.info(f"Skipping step {step_def['number']} - already completed")
                     continue
                 
+                if abandon is not None and abandon.is_set():
+                    # The process now belongs to whoever reclaimed the job; leave its state alone
+                    self.db.rollback()
+                    logger.warning(f"Abandoning process {process_id} before step {step_def['number']}")
+                    return {"success": False, "abandoned": True, "error": "Pipeline job lease lost"}
+                
                 step_result = self._execute_step(
                     process_id,
                     step_def,
@@ -118,7 +136,7 @@ class PipelineOrchestrator:
                 pipeline_state.update(step_result.get("state_updates", {}))
                 
                 # Update progress at END of step (after it completes)
-                # This ensures progress reflects completed steps
+                # This ensures progress reflects completed steps, and commits the step's own writes
                 progress = int((step_def["number"] / len(self.PIPELINE_STEPS)) * 100)
                 ProcessRepository.update_status(
                     self.db,
@@ -132,7 +150,7 @@ class PipelineOrchestrator:
             # Store final results
             visualization_id = self._store_results(process_id, question_id, pipeline_state)
             
-            # Mark process as completed
+            # Mark process as completed, committing the results in the same transaction
             ProcessRepository.update_status(
                 self.db,
                 process_id,
@@ -179,7 +197,21 @@ class PipelineOrchestrator:
         step_def: Dict[str, Any],
         pipeline_state: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Execute a single pipeline step"""
+        """Execute a single pipeline step, memoizing its LLM responses only if it succeeds"""
+        # A response the step validation rejected must not be replayed when the step is retried
+        with get_llm_service().deferred_cache() as pending:
+            result = self._run_step(process_id, step_def, pipeline_state)
+            if not result["success"]:
+                pending.clear()
+        return result
+    
+    def _run_step(
+        self,
+        process_id: str,
+        step_def: Dict[str, Any],
+        pipeline_state: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Run a single pipeline step"""
         step_name = step_def["name"]
         step_number = step_def["number"]
         
@@ -188,6 +220,7 @@ class PipelineOrchestrator:
         # Update progress at START of step (before it completes)
         # Calculate progress based on step number: (step_number - 1) / total_steps * 100
         # This shows progress while the step is processing
+        # The process update, step creation and "processing" status are written in one commit
         total_steps = len(self.PIPELINE_STEPS)
         progress_at_start = int(((step_number - 1) / total_steps) * 100)
         ProcessRepository.update_status(
@@ -195,7 +228,8 @@ class PipelineOrchestrator:
             process_id,
             "processing",
             progress=progress_at_start,
-            current_step=step_name
+            current_step=step_name,
+            commit=False
         )
         logger.debug(f"Updated progress to {progress_at_start}% at start of step {step_number}")
         
@@ -206,7 +240,9 @@ class PipelineOrchestrator:
                 process_id,
                 step_name,
                 step_number,
-                input_data=self._sanitize_for_storage(pipeline_state)
+                # Large state values (story, blueprint, prompts) are stored once and referenced by hash
+                input_data=BlobRepository.store_values(self.db, self._sanitize_for_storage(pipeline_state)),
+                commit=False
             )
         except Exception as create_error:
             # If step creation fails (e.g., JSON serialization), rollback and re-raise
@@ -236,7 +272,8 @@ class PipelineOrchestrator:
                     # Skip if no file content (question already in DB)
                     PipelineStepRepository.update_status(
                         self.db, step.id, "skipped",
-                        output_data={"message": "File content not provided, using existing question"}
+                        output_data={"message": "File content not provided, using existing question"},
+                        commit=False
                     )
                     return {"success": True, "state_updates": {}}
             
@@ -292,7 +329,8 @@ class PipelineOrchestrator:
                     )
                     self.db.add(analysis)
                 
-                self.db.commit()
+                # Committed with the step's completion
+                self.db.flush()
                 step_result = result
             
             elif step_name == "template_routing":
@@ -331,9 +369,37 @@ class PipelineOrchestrator:
             elif step_name == "story_generation":
                 question_text = pipeline_state["question_text"]
                 question_options = pipeline_state["question_options"]
+                question_data = {
+                    "text": question_text,
+                    "options": question_options,
+                    **pipeline_state["analysis"]
+                }
+                
+                # Cache key covers the prompt files this story would be generated from
+                story_generator = self.generation_orchestrator.story_generator
+                story_fingerprint = self.cache_service.compute_fingerprint(
+                    story_generator.prompt_files(question_data, pipeline_state.get("template_type")),
+                    story_generator.llm_service.resolve_model()
+                )
                 
                 # Check cache first
-                cached_story = self.cache_service.get_story(question_text, question_options)
+                cached_story = self.cache_service.get_story(question_text, question_options, fingerprint=story_fingerprint)
+                if not cached_story:
+                    # Single-flight: wait for any identical pipeline generating this story, then check again
+                    with self.cache_service.generation_lock(question_text, question_options, "story", story_fingerprint):
+                        cached_story = self.cache_service.get_story(question_text, question_options, fingerprint=story_fingerprint)
+                        if not cached_story:
+                            # Generate new story
+                            result = story_generator.generate(
+                                question_data,
+                                pipeline_state["strategy"]["prompt_template"],
+                                pipeline_state["strategy"],
+                                pipeline_state.get("template_type")
+                            )
+                            
+                            # Save to cache before releasing the lock so waiting pipelines find it
+                            self.cache_service.save_story(question_text, question_options, result["data"], fingerprint=story_fingerprint)
+                
                 if cached_story:
                     logger.info(f"Using cached story for question: {question_text[:50]}...")
                     pipeline_state["story"] = cached_story
@@ -344,23 +410,8 @@ class PipelineOrchestrator:
                         "state_updates": {"story": cached_story}
                     }
                 else:
-                    # Generate new story
-                    question_data = {
-                        "text": question_text,
-                        "options": question_options,
-                        **pipeline_state["analysis"]
-                    }
-                    result = self.generation_orchestrator.story_generator.generate(
-                        question_data,
-                        pipeline_state["strategy"]["prompt_template"],
-                        pipeline_state["strategy"],
-                        pipeline_state.get("template_type")
-                    )
                     pipeline_state["story"] = result["data"]
                     
-                    # Save to cache
-                    self.cache_service.save_story(question_text, question_options, result["data"])
-                    
                     step_result = {
                         **result,
                         "cached": False
@@ -371,8 +422,36 @@ class PipelineOrchestrator:
                 question_options = pipeline_state["question_options"]
                 template_type = pipeline_state["template_type"]
                 
+                # Cache key covers the prompt files this blueprint would be generated from
+                blueprint_generator = self.generation_orchestrator.blueprint_generator
+                blueprint_fingerprint = self.cache_service.compute_fingerprint(
+                    blueprint_generator.prompt_files(template_type, pipeline_state["story"]),
+                    blueprint_generator.llm_service.resolve_model()
+                )
+                
                 # Check cache first
-                cached_blueprint_data = self.cache_service.get_blueprint(question_text, question_options)
+                cached_blueprint_data = self.cache_service.get_blueprint(
+                    question_text, question_options, fingerprint=blueprint_fingerprint
+                )
+                if not cached_blueprint_data:
+                    # Single-flight: wait for any identical pipeline generating this blueprint, then check again
+                    with self.cache_service.generation_lock(question_text, question_options, "blueprint", blueprint_fingerprint):
+                        cached_blueprint_data = self.cache_service.get_blueprint(
+                            question_text, question_options, fingerprint=blueprint_fingerprint
+                        )
+                        if not cached_blueprint_data:
+                            # Generate new blueprint
+                            result = blueprint_generator.generate(
+                                pipeline_state["story"],
+                                template_type,
+                                question_text
+                            )
+                            
+                            # Save to cache before releasing the lock so waiting pipelines find it
+                            self.cache_service.save_blueprint(
+                                question_text, question_options, result["data"], template_type, fingerprint=blueprint_fingerprint
+                            )
+                
                 if cached_blueprint_data:
                     logger.info(f"Using cached blueprint for question: {question_text[:50]}...")
                     blueprint_data = cached_blueprint_data.get("blueprint", cached_blueprint_data)
@@ -389,20 +468,11 @@ class PipelineOrchestrator:
                         "state_updates": {"blueprint": blueprint_data}
                     }
                 else:
-                    # Generate new blueprint
-                    result = self.generation_orchestrator.blueprint_generator.generate(
-                        pipeline_state["story"],
-                        template_type,
-                        question_text
-                    )
                     blueprint_data = result["data"]
                     is_valid = result.get("valid", True)
                     error_fields = result.get("error_fields", [])
                     pipeline_state["blueprint"] = blueprint_data
                     
-                    # Save to cache
-                    self.cache_service.save_blueprint(question_text, question_options, blueprint_data, template_type)
-                    
                     step_result = {
                         **result,
                         "cached": False
@@ -487,7 +557,10 @@ class PipelineOrchestrator:
                     if url:
                         generated_count += 1
                         is_dalle = "dalle" in url.lower() or "openai" in url.lower() or url.startswith("https://oaidalle")
-                        asset_type = "dalle" if is_dalle else "placeholder"
+                        if url.startswith(ASSET_URL_PREFIX):
+                            asset_type = "asset_store"
+                        else:
+                            asset_type = "dalle" if is_dalle else "placeholder"
                         
                         asset_results.append({
                             "purpose": purpose,
@@ -539,18 +612,21 @@ class PipelineOrchestrator:
                 if not validation_result.is_valid:
                     raise ValueError(f"Step validation failed: {', '.join(validation_result.errors)}")
             
-            # Update step as completed
+            # Update step as completed (committed by the caller's end-of-step progress update)
             # Include cache information in output_data
             output_data = self._sanitize_for_storage(step_result.get("data", {}))
             if step_result.get("cached"):
                 output_data["_cached"] = True
+            # Keep the cache flag on the row for progress queries; a large payload moves to a blob
+            output_data = BlobRepository.store(self.db, output_data, inline_keys=("_cached",))
             
             PipelineStepRepository.update_status(
                 self.db,
                 step.id,
                 "completed",
                 output_data=output_data,
-                validation_result=step_result.get("validation") if step_result else None
+                validation_result=step_result.get("validation") if step_result else None,
+                commit=False
             )
             
             logger.info(f"Step {step_number} completed successfully: {step_name}")
@@ -582,13 +658,13 @@ class PipelineOrchestrator:
         question_id: str,
         pipeline_state: Dict[str, Any]
     ) -> str:
-        """Store final results in database"""
+        """Store final results in database (flushed; committed with the process completion)"""
         logger.info("Storing pipeline results")
         
         # Store story if generated
         story_data = pipeline_state.get("story")
         if story_data:
-            StoryRepository.create(self.db, question_id, story_data)
+            StoryRepository.create(self.db, question_id, story_data, commit=False)
         
         # Store blueprint if generated
         blueprint_data = pipeline_state.get("blueprint")
@@ -602,7 +678,8 @@ class PipelineOrchestrator:
                 question_id,
                 template_type,
                 blueprint_data,
-                assets_data
+                assets_data,
+                commit=False
             )
             blueprint_id = blueprint.id
             
@@ -619,13 +696,14 @@ class PipelineOrchestrator:
             process_id,
             question_id,
             html_content,
-            story_data or {}
+            story_data or {},
+            commit=False
         )
         
         # Link blueprint to visualization if available
         if blueprint_id:
             visualization.blueprint_id = blueprint_id
-            self.db.commit()
+            self.db.flush()
         
         return visualization.id
     
@@ -655,6 +733,61 @@ class PipelineOrchestrator:
         else:
             return data
     
+    def _mark_interrupted_steps(self, process_id: str):
+        """Mark steps left in progress by a dead worker as errored"""
+        for step in PipelineStepRepository.get_by_process_id(self.db, process_id):
+            if step.status in ["pending", "processing"]:
+                PipelineStepRepository.update_status(
+                    self.db, step.id, "error", error_message="Interrupted before completion"
+                )
+    
+    def _restore_pipeline_state(
+        self,
+        process_id: str,
+        pipeline_state: Dict[str, Any],
+        before_step: int
+    ) -> Dict[str, Any]:
+        """Rebuild pipeline state from the outputs of completed steps before a step number"""
+        steps = [
+            s for s in PipelineStepRepository.get_by_process_id(self.db, process_id)
+            if s.status == "completed" and s.step_number < before_step
+        ]
+        outputs = BlobRepository.resolve_many(self.db, [s.output_data for s in steps])
+        completed_steps = {s.step_name: output or {} for s, output in zip(steps, outputs)}
+        
+        def _strip_cache_flag(data: Dict[str, Any]) -> Dict[str, Any]:
+            return {k: v for k, v in data.items() if k != "_cached"}
+        
+        if "question_extraction" in completed_steps:
+            pipeline_state["extracted_question"] = completed_steps["question_extraction"]
+        if "question_analysis" in completed_steps:
+            pipeline_state["analysis"] = completed_steps["question_analysis"]
+        if "template_routing" in completed_steps:
+            pipeline_state["template_type"] = completed_steps["template_routing"].get("templateType")
+        if "strategy_creation" in completed_steps:
+            pipeline_state["strategy"] = completed_steps["strategy_creation"]
+        if "story_generation" in completed_steps:
+            pipeline_state["story"] = _strip_cache_flag(completed_steps["story_generation"])
+        if "blueprint_generation" in completed_steps:
+            pipeline_state["blueprint"] = _strip_cache_flag(completed_steps["blueprint_generation"])
+        
+        # Stored asset plans are truncated previews, so re-plan from the blueprint
+        if "asset_planning" in completed_steps and pipeline_state.get("blueprint"):
+            pipeline_state["asset_requests"] = self.generation_orchestrator.asset_planner.plan_assets(
+                pipeline_state["blueprint"]
+            )
+        if "asset_generation" in completed_steps:
+            asset_urls = completed_steps["asset_generation"].get("asset_urls", {})
+            pipeline_state["assets"] = asset_urls
+            if pipeline_state.get("blueprint"):
+                pipeline_state["blueprint"] = self.generation_orchestrator.asset_generator.inject_asset_urls(
+                    pipeline_state["blueprint"],
+                    asset_urls
+                )
+        
+        logger.info(f"Restored pipeline state for process {process_id} from {len(completed_steps)} completed steps")
+        return pipeline_state
+    
     def retry_step(self, step_id: str) -> Dict[str, Any]:
         """Retry a failed step"""
         logger.info(f"Retrying step: {step_id}")
@@ -687,9 +820,11 @@ class PipelineOrchestrator:
         ]
         
         # Rebuild state from completed steps
-        for completed_step in completed_steps:
-            if completed_step.output_data:
-                pipeline_state.update(completed_step.output_data)
+        outputs = BlobRepository.resolve_many(self.db, [s.output_data for s in completed_steps])
+        for output_data in outputs:
+            if output_data:
+                pipeline_state.update(output_data)
+        self._restore_pipeline_state(step.process_id, pipeline_state, step.step_number)
         
         # Find step definition
         step_def = next(
@@ -700,8 +835,9 @@ class PipelineOrchestrator:
         if not step_def:
             raise ValueError(f"Unknown step: {step.step_name}")
         
-        # Execute step
+        # Execute step; commit its completion, which _execute_step leaves to the caller
         result = self._execute_step(process.id, step_def, pipeline_state)
+        self.db.commit()
         
         return result
 
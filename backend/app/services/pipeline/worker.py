@@ -0,0 +1,204 @@
+"""Pipeline worker - claims queued pipeline jobs and executes them
+
+Run one or more worker processes alongside the API:
+
+    python -m app.services.pipeline.worker --processes 2 --concurrency 2
+
+Each worker polls the pipeline_jobs table, claims jobs with a lease, keeps the
+lease alive with a heartbeat and resumes from the last completed step if the
+job was abandoned by a worker that died.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict
+from app.db.database import SessionLocal, init_db, engine, read_engine
+from app.repositories.pipeline_job_repository import PipelineJobRepository
+from app.repositories.process_repository import ProcessRepository
+from app.utils.logger import setup_logger
+
+logger = setup_logger("pipeline_worker")
+
+# Jobs executed concurrently by a single worker process
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+
+# Seconds to wait between polls when the queue is empty
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1"))
+
+# Lease handling: a running job whose heartbeat is older than the lease is reclaimable
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+class PipelineWorker:
+    """Claims pipeline jobs from the queue and runs them on a bounded thread pool"""
+    
+    def __init__(self, concurrency: Optional[int] = None, worker_id: Optional[str] = None):
+        self.concurrency = max(1, concurrency or WORKER_CONCURRENCY)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._active_jobs: Dict[str, threading.Event] = {}  # job ID -> set when its lease is lost
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    def run(self):
+        """Poll for jobs until stopped"""
+        logger.info(f"Worker {self.worker_id} started (concurrency={self.concurrency})")
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while not self._stop.is_set():
+                if self._active_count() >= self.concurrency:
+                    self._stop.wait(WORKER_POLL_INTERVAL)
+                    continue
+                
+                job = self._claim()
+                if not job:
+                    self._stop.wait(WORKER_POLL_INTERVAL)
+                    continue
+                
+                with self._lock:
+                    self._active_jobs[job["id"]] = threading.Event()
+                executor.submit(self._run_job, job)
+        
+        logger.info(f"Worker {self.worker_id} stopped")
+    
+    def stop(self):
+        """Stop claiming new jobs; running jobs are allowed to finish"""
+        self._stop.set()
+    
+    def _active_count(self) -> int:
+        with self._lock:
+            return len(self._active_jobs)
+    
+    def _claim(self) -> Optional[dict]:
+        """Claim the next job, failing any that have exhausted their attempts"""
+        db = SessionLocal()
+        try:
+            self._fail_exhausted(db)
+            job = PipelineJobRepository.claim_next(db, self.worker_id, JOB_LEASE_SECONDS)
+            if not job:
+                return None
+            return {
+                "id": job.id,
+                "process_id": job.process_id,
+                "question_id": job.question_id,
+                "attempts": job.attempts
+            }
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id} failed to claim job: {e}", exc_info=True)
+            db.rollback()
+            return None
+        finally:
+            db.close()
+    
+    def _fail_exhausted(self, db):
+        """Mark abandoned jobs with no attempts left (and their processes) as errored"""
+        for job in PipelineJobRepository.get_exhausted(db, JOB_LEASE_SECONDS):
+            message = f"Pipeline job abandoned after {job.attempts} attempts"
+            PipelineJobRepository.fail(db, job.id, message)
+            ProcessRepository.update_status(db, job.process_id, "error", error_message=message)
+    
+    def _run_job(self, job: dict):
+        """Execute a claimed job with its own database session"""
+        from app.services.pipeline.orchestrator import PipelineOrchestrator
+        
+        logger.info(f"Worker {self.worker_id} running job {job['id']} - Process: {job['process_id']}")
+        with self._lock:
+            lease_lost = self._active_jobs[job["id"]]
+        db = SessionLocal()
+        try:
+            orchestrator = PipelineOrchestrator(db)
+            result = orchestrator.execute_pipeline(job["process_id"], job["question_id"], abandon=lease_lost)
+            if result.get("abandoned"):
+                logger.warning(f"Worker {self.worker_id} abandoned job {job['id']} after losing its lease")
+            elif result.get("success"):
+                PipelineJobRepository.complete(db, job["id"], worker_id=self.worker_id)
+            else:
+                PipelineJobRepository.fail(db, job["id"], result.get("error") or "Pipeline step failed", worker_id=self.worker_id)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
+            try:
+                db.rollback()
+                PipelineJobRepository.fail(db, job["id"], str(e), worker_id=self.worker_id)
+            except Exception as update_error:
+                logger.error(f"Failed to update job status after error: {update_error}")
+        finally:
+            db.close()
+            with self._lock:
+                self._active_jobs.pop(job["id"], None)
+    
+    def _heartbeat_loop(self):
+        """Refresh leases on running jobs so other workers do not reclaim them"""
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            self._heartbeat()
+    
+    def _heartbeat(self):
+        """Refresh the leases once, abandoning jobs whose lease another worker took"""
+        with self._lock:
+            job_ids = list(self._active_jobs)
+        if not job_ids:
+            return
+        db = SessionLocal()
+        try:
+            owned = set(PipelineJobRepository.heartbeat(db, job_ids, self.worker_id))
+            lost = [job_id for job_id in job_ids if job_id not in owned]
+            if lost:
+                # Another worker may have reclaimed these; stop them at the next step boundary
+                logger.warning(f"Worker {self.worker_id} lost the lease on {len(lost)} job(s), abandoning them")
+                with self._lock:
+                    for job_id in lost:
+                        if job_id in self._active_jobs:
+                            self._active_jobs[job_id].set()
+        except Exception as e:
+            logger.error(f"Heartbeat failed for worker {self.worker_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+def _worker_main(concurrency: int):
+    """Entry point for a worker process"""
+    # A forked worker inherits the parent's pooled connections; drop them (without closing the
+    # parent's) so this process opens its own
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    PipelineWorker(concurrency=concurrency).run()
+
+def run_worker_pool(processes: int = 1, concurrency: Optional[int] = None):
+    """Start worker processes and wait for them to exit"""
+    concurrency = concurrency or WORKER_CONCURRENCY
+    init_db()
+    
+    if processes <= 1:
+        _worker_main(concurrency)
+        return
+    
+    workers = [
+        multiprocessing.Process(target=_worker_main, args=(concurrency,), name=f"pipeline-worker-{i}")
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Started {processes} pipeline worker processes (concurrency={concurrency} each)")
+    
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping pipeline workers...")
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pipeline queue workers")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("WORKER_PROCESSES", "1")))
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    run_worker_pool(args.processes, args.concurrency)
@@ -0,0 +1,127 @@
+"""In-process pub/sub for pipeline progress events"""
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.utils.logger import setup_logger
+
+logger = setup_logger("progress_broker")
+
+class ProgressSubscription:
+    """A subscriber's event queue, bound to the event loop that reads it"""
+    
+    def __init__(self, process_id: str, loop: asyncio.AbstractEventLoop):
+        self.process_id = process_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+    
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Wait for the next event; returns None on timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class ProgressBroker:
+    """Fan progress events out to subscribers of a process.
+    
+    Publishers are the repositories, which run on worker threads; subscribers
+    are SSE streams on the event loop, so events are handed over with
+    call_soon_threadsafe.
+    """
+    
+    def __init__(self):
+        self._subscribers: Dict[str, List[ProgressSubscription]] = {}
+        self._lock = threading.Lock()
+    
+    def subscribe(self, process_id: str) -> ProgressSubscription:
+        """Register a subscriber for a process (call from the event loop)"""
+        subscription = ProgressSubscription(process_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(process_id, []).append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: ProgressSubscription):
+        """Remove a subscriber"""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.process_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.process_id, None)
+    
+    def publish(self, process_id: str, event: Dict[str, Any]):
+        """Publish an event to all subscribers of a process (thread-safe)"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(process_id, []))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, event)
+            except RuntimeError:
+                # Subscriber's loop has closed
+                self.unsubscribe(subscription)
+    
+    def subscriber_count(self, process_id: Optional[str] = None) -> int:
+        """Number of active subscribers (for one process or overall)"""
+        with self._lock:
+            if process_id is not None:
+                return len(self._subscribers.get(process_id, []))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+def process_event(process) -> Dict[str, Any]:
+    """Progress delta for a process row"""
+    return {
+        "type": "process",
+        "status": process.status,
+        "progress": process.progress,
+        "current_step": process.current_step,
+        "error_message": process.error_message
+    }
+
+def step_event(step) -> Dict[str, Any]:
+    """Progress delta for a pipeline step row"""
+    return {
+        "type": "step",
+        "id": step.id,
+        "step_name": step.step_name,
+        "step_number": step.step_number,
+        "status": step.status,
+        "error_message": step.error_message,
+        "retry_count": step.retry_count or 0,
+        "started_at": step.started_at.isoformat() if step.started_at else None,
+        "completed_at": step.completed_at.isoformat() if step.completed_at else None,
+        "cached": step.output_data.get("_cached", False) if step.output_data else False
+    }
+
+# Global progress broker instance
+_progress_broker_instance: Optional[ProgressBroker] = None
+_progress_broker_lock = threading.Lock()
+
+def get_progress_broker() -> ProgressBroker:
+    """Get global progress broker instance"""
+    global _progress_broker_instance
+    if _progress_broker_instance is None:
+        with _progress_broker_lock:
+            if _progress_broker_instance is None:
+                _progress_broker_instance = ProgressBroker()
+    return _progress_broker_instance
+
+# Session.info key for events of writes flushed but not yet committed
+_PENDING_EVENTS_KEY = "pending_progress_events"
+
+def publish_on_commit(db: Session, process_id: str, progress_event: Dict[str, Any]):
+    """Publish an event once the session's current transaction commits (dropped on rollback)"""
+    db.info.setdefault(_PENDING_EVENTS_KEY, []).append((process_id, progress_event))
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(session: Session):
+    pending = session.info.pop(_PENDING_EVENTS_KEY, None)
+    if pending:
+        broker = get_progress_broker()
+        for process_id, progress_event in pending:
+            broker.publish(process_id, progress_event)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session: Session):
+    session.info.pop(_PENDING_EVENTS_KEY, None)
@@ -1,30 +1,10 @@
-import os
-from pathlib import Path
+from app.services.prompt_store import get_prompt_store
 from app.utils.logger import setup_logger
 
 # Set up logging
 logger = setup_logger("prompt_selector")
 
-class PromptSelector:
-    def __init__(self):
-        self.prompts_dir = Path(__file__).parent.parent.parent / "prompts"
-        self.default_prompt = None
-        logger.info(f"Initializing PromptSelector - Prompts directory: {self.prompts_dir}")
-        self._load_default_prompt()
-
-    def _load_default_prompt(self):
-        """Load the default coding question prompt"""
-        # Try to load story_base.md first
-        prompt_file = self.prompts_dir / "story_base.md"
-        if prompt_file.exists():
-            logger.info(f"Loading prompt template from: {prompt_file}")
-            with open(prompt_file, 'r', encoding='utf-8') as f:
-                self.default_prompt = f.read()
-            logger.info(f"Prompt template loaded - Length: {len(self.default_prompt)} chars")
-        else:
-            logger.warning(f"Prompt file not found: {prompt_file}, using fallback prompt")
-            # Fallback prompt
-            self.default_prompt = """You are a Visual Story Architect for Learning.
+FALLBACK_PROMPT = """You are a Visual Story Architect for Learning.
 Transform problems into question-driven, interactive visual experiences.
 Generate a story-based visualization with:
 - A story that grounds the logic in a relatable world
@@ -35,6 +15,20 @@ Generate a story-based visualization with:
 
 Respond with JSON matching the schema provided in the examples."""
 
+class PromptSelector:
+    def __init__(self):
+        self.prompt_store = get_prompt_store()
+        logger.info(f"Initializing PromptSelector - Prompts directory: {self.prompt_store.prompts_dir}")
+
+    @property
+    def default_prompt(self) -> str:
+        """The default coding question prompt (story_base.md, served from the prompt store)"""
+        prompt = self.prompt_store.get("story_base.md")
+        if prompt is None:
+            logger.warning("Prompt file not found: story_base.md, using fallback prompt")
+            return FALLBACK_PROMPT
+        return prompt
+
     def select_prompt(self, question_type: str, subject: str) -> str:
         """Select appropriate prompt template based on question type and subject"""
         logger.info(f"Selecting prompt - Type: {question_type}, Subject: {subject}")
@@ -42,16 +36,18 @@ Respond with JSON matching the schema provided in the examples."""
         # For now, we use the default prompt for all questions
         # In the future, we can have different prompts for different types
         
+        default_prompt = self.default_prompt
+        
         # Map question types to potential specialized prompts
         prompt_map = {
-            "coding": self.default_prompt,
-            "math": self.default_prompt,
-            "science": self.default_prompt,
-            "reasoning": self.default_prompt,
-            "application": self.default_prompt,
+            "coding": default_prompt,
+            "math": default_prompt,
+            "science": default_prompt,
+            "reasoning": default_prompt,
+            "application": default_prompt,
         }
         
-        selected = prompt_map.get(question_type, self.default_prompt)
+        selected = prompt_map.get(question_type, default_prompt)
         logger.debug(f"Prompt selected - Length: {len(selected)} chars")
         return selected
 
@@ -0,0 +1,143 @@
+"""Prompt store - in-memory copy of the prompts directory with hot reload"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+from app.utils.logger import setup_logger
+
+logger = setup_logger("prompt_store")
+
+PROMPTS_DIR = Path(__file__).parent.parent.parent / "prompts"
+
+# Seconds between mtime checks for edited prompt files (0 disables hot reload)
+PROMPT_RELOAD_INTERVAL = float(os.getenv("PROMPT_RELOAD_INTERVAL", "2"))
+
+class PromptStore:
+    """Serve prompt files from memory, reloading them when they change on disk"""
+    
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR, reload_interval: float = PROMPT_RELOAD_INTERVAL):
+        self.prompts_dir = Path(prompts_dir)
+        self.reload_interval = reload_interval
+        self._files: Dict[str, Tuple[int, int, str]] = {}  # relative path -> (mtime_ns, size, text)
+        self._composed: Dict[Tuple[str, ...], Optional[str]] = {}
+        self._digests: Dict[str, str] = {}
+        self._version = ""
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+        self.reloads = 0
+        self._scan()
+        self._precompose()
+        logger.info(f"Prompt store loaded {len(self._files)} files from {self.prompts_dir} (version {self._version})")
+    
+    def _scan(self) -> bool:
+        """Re-read files whose mtime or size changed; returns True if anything changed"""
+        files = {}
+        changed = False
+        paths = sorted(p for p in self.prompts_dir.rglob("*") if p.is_file()) if self.prompts_dir.exists() else []
+        for path in paths:
+            name = path.relative_to(self.prompts_dir).as_posix()
+            try:
+                stat = path.stat()
+                current = self._files.get(name)
+                if current and current[0] == stat.st_mtime_ns and current[1] == stat.st_size:
+                    files[name] = current
+                    continue
+                files[name] = (stat.st_mtime_ns, stat.st_size, path.read_bytes().decode("utf-8"))
+                changed = True
+            except Exception as e:
+                logger.warning(f"Failed to load prompt file {name}: {e}")
+        
+        if changed or files.keys() != self._files.keys():
+            self._files = files
+            self._composed = {}
+            self._digests = {}
+            self._version = self._compute_version(files)
+            changed = True
+        self._last_check = time.time()
+        return changed
+    
+    def _compute_version(self, files: Dict[str, Tuple[int, int, str]]) -> str:
+        """Hash of every prompt file's name and contents"""
+        digest = hashlib.sha256()
+        for name in sorted(files):
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(files[name][2].encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+    
+    def _precompose(self):
+        """Build the story and blueprint system prompt for every template up front"""
+        for name in list(self._files):
+            if name.startswith("story_templates/"):
+                self.compose("story_base.md", name)
+            elif name.startswith("blueprint_templates/"):
+                self.compose("blueprint_base.md", name)
+    
+    def _refresh(self):
+        """Reload changed files if the check interval has passed"""
+        if self.reload_interval <= 0 or time.time() - self._last_check < self.reload_interval:
+            return
+        with self._lock:
+            if time.time() - self._last_check < self.reload_interval:
+                return
+            if self._scan():
+                self.reloads += 1
+                self._precompose()
+                logger.info(f"Prompt files changed on disk, reloaded (version {self._version})")
+    
+    def get(self, name: str) -> Optional[str]:
+        """Contents of a prompt file by path relative to the prompts directory"""
+        self._refresh()
+        entry = self._files.get(name)
+        return entry[2] if entry else None
+    
+    def exists(self, name: str) -> bool:
+        """Check whether a prompt file exists"""
+        self._refresh()
+        return name in self._files
+    
+    def digest(self, name: str) -> str:
+        """Content hash of a prompt file as served by the store ("missing" if absent)"""
+        self._refresh()
+        digest = self._digests.get(name)
+        if digest is None:
+            with self._lock:
+                entry = self._files.get(name)
+                digest = hashlib.sha256(entry[2].encode("utf-8")).hexdigest() if entry else "missing"
+                self._digests[name] = digest
+        return digest
+    
+    def compose(self, *names: str) -> Optional[str]:
+        """Prompt files joined with blank lines (memoized); None if any file is missing"""
+        self._refresh()
+        composed = self._composed.get(names)
+        if composed is not None or names in self._composed:
+            return composed
+        # Compose under the lock so a concurrent reload cannot mix old and new files
+        with self._lock:
+            parts = [self._files.get(name) for name in names]
+            composed = None if any(part is None for part in parts) else "\n\n".join(part[2] for part in parts)
+            self._composed[names] = composed
+        return composed
+    
+    @property
+    def version(self) -> str:
+        """Content hash of the prompt files currently loaded"""
+        self._refresh()
+        return self._version
+
+# Global prompt store instance
+_prompt_store_instance: Optional[PromptStore] = None
+_prompt_store_lock = threading.Lock()
+
+def get_prompt_store() -> PromptStore:
+    """Get global prompt store instance"""
+    global _prompt_store_instance
+    if _prompt_store_instance is None:
+        with _prompt_store_lock:
+            if _prompt_store_instance is None:
+                _prompt_store_instance = PromptStore()
+    return _prompt_store_instance
@@ -0,0 +1,124 @@
+"""Single-flight locks - let one pipeline generate a cache entry while identical ones wait"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+from app.utils.logger import setup_logger
+
+logger = setup_logger("single_flight")
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (e.g. Windows): requests are still coalesced within a process
+    fcntl = None
+
+# Longest a pipeline waits for another one's generation before generating itself
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "300"))
+
+# Poll interval while waiting for a lock file held by another process
+SINGLE_FLIGHT_POLL_INTERVAL = 0.25
+
+class SingleFlight:
+    """Per-key locks shared by threads (in-process lock) and worker processes (flock on a lock file)"""
+    
+    def __init__(self, lock_dir: Path, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.lock_dir = Path(lock_dir)
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.timeout = timeout
+        self._locks: Dict[str, List] = {}  # key -> [lock, users]
+        self._locks_guard = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.timeouts = 0
+    
+    def _thread_lock(self, key: str) -> threading.Lock:
+        """Reference-counted in-process lock for a key"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+    
+    def _release_thread_lock(self, key: str):
+        """Drop a reference to a key's lock, discarding it when unused"""
+        with self._locks_guard:
+            entry = self._locks.get(key)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    self._locks.pop(key, None)
+    
+    def _acquire_file_lock(self, key: str, deadline: float):
+        """Open and flock the key's lock file; returns the file descriptor, or None on timeout"""
+        fd = os.open(self.lock_dir / f"{key}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Record the holder; this also refreshes the mtime used by prune()
+                os.ftruncate(fd, 0)
+                os.write(fd, str(os.getpid()).encode("ascii"))
+                return fd
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return None
+                time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+    
+    @contextmanager
+    def lock(self, key: str):
+        """Hold the key's lock; yields True if the lock was taken, False if waiting timed out.
+        
+        Callers re-check the cache once inside: if another holder generated the
+        entry meanwhile, they use it instead of generating again.
+        """
+        deadline = time.monotonic() + self.timeout
+        thread_lock = self._thread_lock(key)
+        thread_locked = False
+        fd = None
+        started = time.monotonic()
+        try:
+            thread_locked = thread_lock.acquire(timeout=self.timeout)
+            if thread_locked and fcntl is not None:
+                fd = self._acquire_file_lock(key, deadline)
+            locked = thread_locked and (fcntl is None or fd is not None)
+            
+            waited = time.monotonic() - started
+            if not locked:
+                self.timeouts += 1
+                logger.warning(f"Timed out after {waited:.1f}s waiting for in-flight generation of {key[:16]}..., generating anyway")
+            else:
+                self.acquired += 1
+                if waited >= SINGLE_FLIGHT_POLL_INTERVAL:
+                    self.waited += 1
+                    logger.info(f"Waited {waited:.1f}s for in-flight generation of {key[:16]}...")
+            yield locked
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            if thread_locked:
+                thread_lock.release()
+            self._release_thread_lock(key)
+    
+    def prune(self, max_age: float = 24 * 3600) -> int:
+        """Delete lock files nobody has taken for max_age seconds"""
+        removed = 0
+        cutoff = time.time() - max_age
+        for path in self.lock_dir.glob("*.lock"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Lock counters"""
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "timeouts": self.timeouts
+        }
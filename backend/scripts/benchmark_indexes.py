@@ -0,0 +1,140 @@
+"""Benchmark the hot repository lookups on a synthetic SQLite database, without and with the lookup indexes"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db.models import Question, Process, Story, Visualization, GameBlueprint, PipelineStep, generate_uuid
+from app.repositories.process_repository import ProcessRepository
+from app.repositories.pipeline_step_repository import PipelineStepRepository
+from app.repositories.story_repository import StoryRepository
+from app.repositories.game_blueprint_repository import GameBlueprintRepository
+from app.repositories.visualization_repository import VisualizationRepository
+
+INDEXED_MODELS = [Process, Story, Visualization, GameBlueprint, PipelineStep]
+INSERT_CHUNK = 5000
+
+def _insert(conn, model, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        conn.execute(model.__table__.insert(), rows[start:start + INSERT_CHUNK])
+
+def populate(engine, process_count: int, steps_per_process: int):
+    """Fill the database with finished pipelines (and a few active ones); returns sample IDs"""
+    now = datetime.utcnow()
+    questions, processes, steps, stories, blueprints, visualizations = [], [], [], [], [], []
+    for i in range(process_count):
+        created = now - timedelta(seconds=process_count - i)
+        # Roughly two runs per question
+        if i % 2 == 0:
+            question_id = generate_uuid()
+            questions.append({"id": question_id, "text": f"Question {i}", "created_at": created})
+        process_id = generate_uuid()
+        active = random.random() < 0.01
+        processes.append({
+            "id": process_id, "question_id": question_id, "status": "processing" if active else "completed",
+            "progress": 50 if active else 100, "started_at": created
+        })
+        for number in range(1, steps_per_process + 1):
+            steps.append({
+                "id": generate_uuid(), "process_id": process_id, "step_name": f"step_{number}",
+                "step_number": number, "status": "completed", "started_at": created, "retry_count": 0
+            })
+        stories.append({
+            "id": generate_uuid(), "question_id": question_id, "story_title": "Story", "story_context": "",
+            "question_flow": [], "primary_question": "", "created_at": created
+        })
+        blueprint_id = generate_uuid()
+        blueprints.append({
+            "id": blueprint_id, "question_id": question_id, "template_type": "SEQUENCE_BUILDER",
+            "blueprint_json": {}, "created_at": created
+        })
+        visualizations.append({
+            "id": generate_uuid(), "process_id": process_id, "question_id": question_id,
+            "story_data_json": {}, "blueprint_id": blueprint_id, "created_at": created
+        })
+    
+    with engine.begin() as conn:
+        for model, rows in [
+            (Question, questions), (Process, processes), (PipelineStep, steps),
+            (Story, stories), (GameBlueprint, blueprints), (Visualization, visualizations)
+        ]:
+            _insert(conn, model, rows)
+    
+    sample = random.choice(processes)
+    return sample["id"], sample["question_id"]
+
+def _lookups(db, process_id: str, question_id: str):
+    return [
+        ("PipelineStepRepository.get_by_process_id", lambda: PipelineStepRepository.get_by_process_id(db, process_id)),
+        ("PipelineStepRepository.get_last_completed_step", lambda: PipelineStepRepository.get_last_completed_step(db, process_id)),
+        ("PipelineStepRepository.get_failed_steps", lambda: PipelineStepRepository.get_failed_steps(db, process_id)),
+        ("ProcessRepository.get_active_processes", lambda: ProcessRepository.get_active_processes(db)),
+        ("ProcessRepository.get_by_question_id", lambda: ProcessRepository.get_by_question_id(db, question_id)),
+        ("StoryRepository.get_by_question_id", lambda: StoryRepository.get_by_question_id(db, question_id)),
+        ("GameBlueprintRepository.get_latest_by_question_id", lambda: GameBlueprintRepository.get_latest_by_question_id(db, question_id)),
+        ("VisualizationRepository.get_by_question_id", lambda: VisualizationRepository.get_by_question_id(db, question_id)),
+    ]
+
+def run_lookups(engine, label: str, process_id: str, question_id: str, repeats: int):
+    """Print the query plan and mean latency of each lookup"""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+    
+    print(f"\n=== {label} ===")
+    db = sessionmaker(bind=engine)()
+    try:
+        for name, lookup in _lookups(db, process_id, question_id):
+            event.listen(engine, "before_cursor_execute", capture)
+            lookup()
+            event.remove(engine, "before_cursor_execute", capture)
+            statement, parameters = statements[-1]
+            
+            started = time.perf_counter()
+            for _ in range(repeats):
+                lookup()
+                db.expunge_all()
+            elapsed_ms = (time.perf_counter() - started) / repeats * 1000
+            
+            with engine.connect() as conn:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            print(f"{name}: {elapsed_ms:.3f} ms")
+            for row in plan:
+                print(f"    {row[-1]}")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=20000, help="Pipeline runs to generate")
+    parser.add_argument("--steps", type=int, default=8, help="Steps per pipeline run")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per lookup")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+        indexes = [index for model in INDEXED_MODELS for index in model.__table__.indexes]
+        for index in indexes:
+            index.drop(engine)
+        
+        print(f"Populating {args.processes} processes with {args.steps} steps each...")
+        process_id, question_id = populate(engine, args.processes, args.steps)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        run_lookups(engine, "without indexes", process_id, question_id, args.repeats)
+        
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+            conn.execute(text("ANALYZE"))
+        run_lookups(engine, "with indexes", process_id, question_id, args.repeats)
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Cache maintenance script - shard legacy files, expire old entries and enforce the size cap"""
+from app.services.cache_service import get_cache_service
+from app.utils.logger import setup_logger
+
+logger = setup_logger("cache_cleanup")
+
+def cleanup():
+    """Run cache maintenance once"""
+    cache_service = get_cache_service()
+    result = cache_service.manager.cleanup()
+    result["lock_files"] = cache_service.single_flight.prune()
+    logger.info(
+        f"Cache cleanup complete - migrated: {result['migrated']}, "
+        f"expired: {result['expired']}, evicted: {result['evicted']}, "
+        f"stale lock files: {result['lock_files']}"
+    )
+    return result
+
+if __name__ == "__main__":
+    cleanup()
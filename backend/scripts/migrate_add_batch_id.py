@@ -0,0 +1,35 @@
+"""Migration script to add batch_id column to processes table"""
+from sqlalchemy import text
+from app.db.database import engine
+from app.utils.logger import setup_logger
+
+logger = setup_logger("migration")
+
+def migrate():
+    """Add batch_id column (and its index) to processes table if it doesn't exist"""
+    try:
+        with engine.connect() as conn:
+            # Check if column exists
+            result = conn.execute(text("PRAGMA table_info(processes)"))
+            columns = [row[1] for row in result]
+            
+            if 'batch_id' in columns:
+                logger.info("Column batch_id already exists in processes table")
+                return
+            
+            # Add the column
+            logger.info("Adding batch_id column to processes table...")
+            conn.execute(text("""
+                ALTER TABLE processes 
+                ADD COLUMN batch_id TEXT
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_processes_batch_id ON processes (batch_id)"))
+            conn.commit()
+            logger.info("Successfully added batch_id column to processes table")
+            
+    except Exception as e:
+        logger.error(f"Migration failed: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    migrate()
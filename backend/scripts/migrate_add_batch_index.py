@@ -0,0 +1,47 @@
+"""Migration script to add batch_index column to processes table"""
+from sqlalchemy import text
+from app.db.database import engine
+from app.utils.logger import setup_logger
+
+logger = setup_logger("migration")
+
+def migrate():
+    """Add batch_index column to processes table if it doesn't exist, numbering existing batches by start time"""
+    try:
+        with engine.connect() as conn:
+            # Check if column exists
+            result = conn.execute(text("PRAGMA table_info(processes)"))
+            columns = [row[1] for row in result]
+            
+            if 'batch_index' in columns:
+                logger.info("Column batch_index already exists in processes table")
+                return
+            if 'batch_id' not in columns:
+                logger.error("Column batch_id is missing, run migrate_add_batch_id.py first")
+                return
+            
+            # Add the column
+            logger.info("Adding batch_index column to processes table...")
+            conn.execute(text("""
+                ALTER TABLE processes 
+                ADD COLUMN batch_index INTEGER
+            """))
+            # Older batches were ordered by start time, so number them in that order
+            conn.execute(text("""
+                UPDATE processes SET batch_index = (
+                    SELECT COUNT(*) FROM processes AS earlier
+                    WHERE earlier.batch_id = processes.batch_id
+                    AND (earlier.started_at < processes.started_at
+                         OR (earlier.started_at = processes.started_at AND earlier.id < processes.id))
+                )
+                WHERE batch_id IS NOT NULL
+            """))
+            conn.commit()
+            logger.info("Successfully added batch_index column to processes table")
+    
+    except Exception as e:
+        logger.error(f"Migration failed: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    migrate()
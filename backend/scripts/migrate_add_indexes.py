@@ -0,0 +1,48 @@
+"""Migration script to add the lookup indexes declared in models.py to existing tables"""
+from sqlalchemy import inspect, text
+from app.db.database import engine
+from app.db.models import Process, Story, Visualization, GameBlueprint, PipelineStep
+from app.utils.logger import setup_logger
+
+logger = setup_logger("migration")
+
+INDEXED_MODELS = [Process, Story, Visualization, GameBlueprint, PipelineStep]
+
+def migrate():
+    """Create any declared index that doesn't exist yet"""
+    try:
+        with engine.connect() as conn:
+            inspector = inspect(conn)
+            created = 0
+            for model in INDEXED_MODELS:
+                table = model.__table__
+                existing = {index["name"] for index in inspector.get_indexes(table.name)}
+                columns = {column["name"] for column in inspector.get_columns(table.name)}
+                for index in table.indexes:
+                    if index.name in existing:
+                        logger.info(f"Index {index.name} already exists on {table.name}")
+                        continue
+                    missing = [column.name for column in index.columns if column.name not in columns]
+                    if missing:
+                        # Added by that column's own migration (e.g. migrate_add_batch_id.py)
+                        logger.warning(
+                            f"Skipping index {index.name}: {table.name} has no column {', '.join(missing)} yet, "
+                            f"run its column migration first"
+                        )
+                        continue
+                    logger.info(f"Creating index {index.name} on {table.name}...")
+                    index.create(conn)
+                    created += 1
+            
+            if created and engine.dialect.name == "sqlite":
+                # Refresh planner statistics so the new indexes are chosen
+                conn.execute(text("ANALYZE"))
+            conn.commit()
+            logger.info(f"Successfully created {created} indexes")
+    
+    except Exception as e:
+        logger.error(f"Migration failed: {e}", exc_info=True)
+        raise
+
+if __name__ == "__main__":
+    migrate()
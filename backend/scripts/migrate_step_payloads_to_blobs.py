@@ -0,0 +1,44 @@
+"""Migration script to move large payloads of existing pipeline steps into content_blobs"""
+from app.db.database import SessionLocal, init_db
+from app.db.models import PipelineStep
+from app.repositories.blob_repository import BlobRepository
+from app.utils.logger import setup_logger
+
+logger = setup_logger("migration")
+
+BATCH_SIZE = 500
+
+def migrate():
+    """Replace inline step input/output payloads with blob references, one batch per transaction"""
+    init_db()  # Creates the content_blobs table if missing
+    db = SessionLocal()
+    try:
+        last_id = ""
+        migrated = 0
+        while True:
+            steps = db.query(PipelineStep).filter(
+                PipelineStep.id > last_id
+            ).order_by(PipelineStep.id).limit(BATCH_SIZE).all()
+            if not steps:
+                break
+            
+            for step in steps:
+                step.input_data = BlobRepository.store_values(db, step.input_data)
+                step.output_data = BlobRepository.store(db, step.output_data, inline_keys=("_cached",))
+            db.commit()
+            migrated += len(steps)
+            last_id = steps[-1].id
+            db.expunge_all()
+            logger.info(f"Migrated {migrated} pipeline steps...")
+        
+        logger.info(f"Successfully migrated {migrated} pipeline steps (run VACUUM to reclaim space)")
+    
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Migration failed: {e}", exc_info=True)
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
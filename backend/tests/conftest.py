@@ -0,0 +1,38 @@
+"""Shared fixtures: a throwaway SQLite database and cache directory per test run"""
+import os
+import tempfile
+
+# Point the app at a scratch database before any app module creates its engines
+_db_dir = tempfile.mkdtemp(prefix="test_db_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+import pytest
+from app.db.database import Base, SessionLocal, engine, init_db
+from app.services.cache_service import CacheService
+
+init_db()
+
+@pytest.fixture
+def db():
+    """Database session; every table is emptied after the test"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+@pytest.fixture
+def cache_service(tmp_path):
+    """Cache service rooted in a temporary directory"""
+    return CacheService(tmp_path / "cache")
+
+@pytest.fixture
+def llm_cache(monkeypatch, cache_service):
+    """Route LLMService memoization to the temporary cache service"""
+    import app.services.llm_service as llm_service
+    monkeypatch.setattr(llm_service, "get_cache_service", lambda: cache_service)
+    return cache_service
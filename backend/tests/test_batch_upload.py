@@ -0,0 +1,51 @@
+"""Batch upload: questions and processes are stored together, in document order"""
+import pytest
+from fastapi.testclient import TestClient
+from app.db.models import Process, Question
+from app.main import app
+from app.repositories.process_repository import ProcessRepository
+from app.routes import upload
+
+QUESTIONS = [{"text": f"Question {index}?", "options": None} for index in range(5)]
+
+class _ParsePool:
+    """Returns fixed questions instead of parsing the upload"""
+    
+    async def run(self, func, *args):
+        return [dict(question_data) for question_data in QUESTIONS]
+
+@pytest.fixture
+def client(monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(upload, "get_parse_pool", lambda: _ParsePool())
+    monkeypatch.setattr(upload, "dispatch_pipelines", lambda db, background_tasks, jobs: dispatched.extend(jobs))
+    client = TestClient(app)
+    client.dispatched = dispatched
+    return client
+
+def _upload(client):
+    return client.post("/api/upload/batch", files={"file": ("questions.txt", b"ignored", "text/plain")})
+
+def test_batch_progress_lists_questions_in_document_order(client, db):
+    response = _upload(client)
+    assert response.status_code == 200
+    body = response.json()
+    
+    progress = ProcessRepository.get_batch_progress(db, body["batch_id"])
+    assert [process["process_id"] for process in progress["processes"]] == [
+        question["process_id"] for question in body["questions"]
+    ]
+    assert [process.batch_index for process in db.query(Process).order_by(Process.batch_index)] == list(range(5))
+    assert client.dispatched == [(question["process_id"], question["question_id"]) for question in body["questions"]]
+
+def test_failed_process_insert_leaves_no_questions(client, db, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("insert failed")
+    monkeypatch.setattr(ProcessRepository, "bulk_create", staticmethod(fail))
+    
+    with pytest.raises(RuntimeError):
+        _upload(client)
+    
+    assert db.query(Question).count() == 0
+    assert db.query(Process).count() == 0
+    assert client.dispatched == []
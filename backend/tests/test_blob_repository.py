@@ -0,0 +1,72 @@
+"""Content-addressed step payload blobs"""
+from fastapi.testclient import TestClient
+from app.db.models import ContentBlob
+from app.main import app
+from app.repositories.blob_repository import BlobRepository, is_blob_ref
+from app.repositories.pipeline_step_repository import PipelineStepRepository
+from app.repositories.process_repository import ProcessRepository
+from app.repositories.question_repository import QuestionRepository
+
+LARGE = {"html": "x" * 4096}
+
+def test_store_values_references_large_values_only(db):
+    stored = BlobRepository.store_values(db, {"story": LARGE, "template_type": "SEQUENCE_BUILDER"})
+    db.commit()
+    
+    assert is_blob_ref(stored["story"])
+    assert stored["template_type"] == "SEQUENCE_BUILDER"
+    assert BlobRepository.resolve(db, stored) == {"story": LARGE, "template_type": "SEQUENCE_BUILDER"}
+
+def test_store_values_keeps_existing_refs(db):
+    stored = BlobRepository.store_values(db, {"story": LARGE})
+    assert BlobRepository.store_values(db, stored) == stored
+
+def test_equal_values_are_stored_once(db):
+    first = BlobRepository.store_values(db, {"a": LARGE})
+    second = BlobRepository.store_values(db, {"b": dict(LARGE)})
+    db.commit()
+    
+    assert first["a"] == second["b"]
+    assert db.query(ContentBlob).count() == 1
+
+def test_store_keeps_inline_cached_flag(db):
+    stored = BlobRepository.store(db, {**LARGE, "_cached": True}, inline_keys=("_cached",))
+    db.commit()
+    
+    assert set(stored) == {"$blob", "_cached"}
+    assert stored["_cached"] is True
+    assert BlobRepository.resolve(db, stored) == {**LARGE, "_cached": True}
+
+def test_store_leaves_small_payloads_inline(db):
+    data = {"question_type": "math", "_cached": True}
+    assert BlobRepository.store(db, data, inline_keys=("_cached",)) == data
+
+def test_resolve_many_expands_refs_nested_in_lists(db):
+    stored = BlobRepository.store_values(db, {"first": LARGE, "second": {"html": "y" * 4096}})
+    db.commit()
+    nested = {"frames": [stored["first"], {"inner": [stored["second"], 3]}], "label": "ok"}
+    
+    resolved, untouched = BlobRepository.resolve_many(db, [nested, {"plain": [1, 2]}])
+    assert resolved == {"frames": [LARGE, {"inner": [{"html": "y" * 4096}, 3]}], "label": "ok"}
+    assert untouched == {"plain": [1, 2]}
+
+def test_resolve_keeps_missing_refs(db):
+    missing = {"$blob": "0" * 64}
+    assert BlobRepository.resolve(db, {"story": missing}) == {"story": missing}
+
+def test_pipeline_steps_return_references_by_default(db):
+    question = QuestionRepository.create(db, {"text": "What is 2 + 2?"})
+    process = ProcessRepository.create(db, question.id)
+    step = PipelineStepRepository.create(db, process.id, "story_generation", 4)
+    output = BlobRepository.store(db, {**LARGE, "_cached": True}, inline_keys=("_cached",))
+    PipelineStepRepository.update_status(db, step.id, "completed", output_data=output)
+    
+    client = TestClient(app)
+    steps = client.get(f"/api/pipeline/steps/{process.id}").json()["steps"]
+    assert steps[0]["output_data"] == output
+    
+    blob = client.get(f"/api/pipeline/blobs/{output['$blob']}").json()
+    assert blob["data"] == LARGE
+    
+    resolved = client.get(f"/api/pipeline/steps/{process.id}?resolve_blobs=true").json()["steps"]
+    assert resolved[0]["output_data"] == {**LARGE, "_cached": True}
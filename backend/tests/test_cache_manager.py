@@ -0,0 +1,137 @@
+"""Cache directory index: running size total, TTL expiry, eviction and legacy sharding"""
+import sqlite3
+import time
+import pytest
+from app.services import cache_manager
+from app.services.cache_manager import CacheManager
+
+def _write(manager, question_hash, data_type="story", size=100):
+    """Create a cache file of the given size in its shard and index it"""
+    path = manager.get_path(question_hash, data_type)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return manager.record_write(question_hash, data_type, size)
+
+def _sum_sizes(manager):
+    with sqlite3.connect(manager.index_path) as conn:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+    conn.close()
+    return total
+
+def _set_column(manager, key, column, value):
+    with sqlite3.connect(manager.index_path) as conn:
+        conn.execute(f"UPDATE cache_entries SET {column} = ? WHERE key = ?", (value, key))
+    conn.close()
+
+@pytest.fixture
+def manager(tmp_path):
+    return CacheManager(tmp_path, max_bytes=0)
+
+def test_running_total_tracks_insert_overwrite_and_delete(manager):
+    _write(manager, "aa" * 32, size=100)
+    _write(manager, "bb" * 32, size=250)
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 350
+    
+    _write(manager, "aa" * 32, size=40)  # Overwrite with a smaller file
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 290
+    _write(manager, "aa" * 32, size=400)  # ... and a larger one
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 650
+    
+    manager.remove(f"{'bb' * 32}_story")
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 400
+    assert manager.get_stats()["entries"] == 1
+
+def test_running_total_is_seeded_from_an_existing_index(tmp_path):
+    with sqlite3.connect(tmp_path / cache_manager.INDEX_FILENAME) as conn:
+        conn.execute("""
+            CREATE TABLE cache_entries (
+                key TEXT PRIMARY KEY, data_type TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL,
+                created_at REAL NOT NULL, last_access REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO cache_entries VALUES (?, 'story', ?, ?, 0, 0, 0)",
+            [("a_story", "a_story.json", 10), ("b_story", "b_story.json", 32)]
+        )
+    conn.close()
+    
+    assert CacheManager(tmp_path, max_bytes=0).get_stats()["bytes"] == 42
+
+def test_resync_corrects_drift(manager):
+    _write(manager, "aa" * 32, size=100)
+    with sqlite3.connect(manager.index_path) as conn:
+        conn.execute("UPDATE cache_meta SET value = 7 WHERE name = 'total_bytes'")
+    conn.close()
+    
+    assert manager.resync_total() == 100
+    assert manager.get_stats()["bytes"] == 100
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    manager = CacheManager(tmp_path, max_bytes=300, policy="lru")
+    for index, question_hash in enumerate(["aa" * 32, "bb" * 32, "cc" * 32]):
+        _write(manager, question_hash, size=100)
+        _set_column(manager, f"{question_hash}_story", "last_access", 1000 + index)
+    manager.record_access(f"{'aa' * 32}_story")  # Oldest write, but read most recently
+    
+    evicted = _write(manager, "dd" * 32, size=100)
+    
+    assert evicted == [f"{'bb' * 32}_story"]
+    assert not manager.get_path("bb" * 32, "story").exists()
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 300
+    assert manager.get_stats()["evictions"] == 1
+
+def test_lfu_evicts_least_frequently_used(tmp_path):
+    manager = CacheManager(tmp_path, max_bytes=300, policy="lfu")
+    for question_hash in ["aa" * 32, "bb" * 32, "cc" * 32]:
+        _write(manager, question_hash, size=100)
+    for _ in range(3):
+        manager.record_access(f"{'aa' * 32}_story")
+    manager.record_access(f"{'cc' * 32}_story")
+    
+    evicted = _write(manager, "dd" * 32, size=150)
+    
+    # Never-read entries go first, the newly written one last among them
+    assert evicted[0] == f"{'bb' * 32}_story"
+    assert f"{'aa' * 32}_story" not in evicted
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) <= 300
+
+def test_expire_deletes_entries_past_their_ttl(manager, monkeypatch):
+    monkeypatch.setitem(cache_manager.CACHE_TTL_SECONDS, "story", 60)
+    monkeypatch.setitem(cache_manager.CACHE_TTL_SECONDS, "llm", 0)
+    _write(manager, "aa" * 32, "story", size=100)
+    _write(manager, "bb" * 32, "story", size=100)
+    _write(manager, "cc" * 32, "llm", size=100)
+    for key in [f"{'aa' * 32}_story", f"{'cc' * 32}_llm"]:
+        _set_column(manager, key, "created_at", time.time() - 3600)
+    
+    assert manager.expire() == [f"{'aa' * 32}_story"]
+    assert not manager.get_path("aa" * 32, "story").exists()
+    assert manager.get_path("cc" * 32, "llm").exists()  # TTL 0 never expires
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 200
+    
+    assert manager.is_expired("story", time.time() - 61)
+    assert not manager.is_expired("story", time.time() - 30)
+    assert not manager.is_expired("llm", 0)
+
+def test_legacy_flat_files_move_into_shards(manager):
+    question_hash = "ab" * 32
+    legacy = manager.get_legacy_path(question_hash, "story")
+    legacy.write_bytes(b"{}")
+    
+    path = manager.migrate_legacy(question_hash, "story")
+    
+    assert path == manager.cache_dir / "ab" / "ab" / f"{question_hash}_story.json"
+    assert path.read_bytes() == b"{}"
+    assert not legacy.exists()
+    assert manager.get_stats()["bytes"] == 2
+    assert manager.migrate_legacy(question_hash, "story") is None
+
+def test_cleanup_migrates_expires_and_evicts(tmp_path, monkeypatch):
+    monkeypatch.setitem(cache_manager.CACHE_TTL_SECONDS, "story", 60)
+    manager = CacheManager(tmp_path, max_bytes=250)
+    manager.get_legacy_path("ab" * 32, "story").write_bytes(b"x" * 100)
+    _write(manager, "cd" * 32, size=100)
+    _set_column(manager, f"{'cd' * 32}_story", "created_at", time.time() - 3600)
+    
+    assert manager.cleanup() == {"migrated": 1, "expired": 1, "evicted": 0}
+    assert manager.get_stats()["bytes"] == _sum_sizes(manager) == 100
@@ -0,0 +1,150 @@
+"""Memory tier, write invalidation, counters and file format of the cache service"""
+import json
+import time
+import pytest
+from app.services.cache_manager import CacheManager
+from app.services.cache_service import (
+    CACHE_FILE_MAGIC, MemoryLRU, decode_cache_payload, encode_cache_payload, zstandard
+)
+
+def test_memory_lru_evicts_by_entry_count():
+    memory = MemoryLRU(max_entries=2, max_bytes=1000)
+    memory.put("a", 1, 10)
+    memory.put("b", 2, 10)
+    assert memory.get("a") == 1  # "b" is now least recently used
+    memory.put("c", 3, 10)
+    
+    assert not memory.contains("b")
+    assert memory.contains("a") and memory.contains("c")
+    assert memory.get_stats()["evictions"] == 1
+
+def test_memory_lru_evicts_by_bytes():
+    memory = MemoryLRU(max_entries=10, max_bytes=100)
+    memory.put("a", 1, 40)
+    memory.put("b", 2, 40)
+    memory.put("c", 3, 40)
+    
+    assert not memory.contains("a")
+    assert memory.get_stats()["bytes"] == 80
+    
+    memory.put("b", 2, 90)  # Replacing a value re-counts its size
+    assert not memory.contains("c")
+    assert memory.get_stats()["bytes"] == 90
+    assert memory.get_stats()["evictions"] == 2
+
+def test_memory_lru_skips_values_larger_than_the_cap():
+    memory = MemoryLRU(max_entries=10, max_bytes=100)
+    memory.put("a", 1, 50)
+    memory.put("huge", 2, 101)
+    
+    assert not memory.contains("huge")
+    assert memory.contains("a")
+    assert memory.get_stats()["evictions"] == 0
+
+def test_memory_lru_counts_hits_misses_and_expiry():
+    memory = MemoryLRU(max_entries=10, max_bytes=100)
+    memory.put("a", {"x": 1}, 10)
+    memory.put("old", 2, 10, expires_at=time.time() - 1)
+    
+    value = memory.get("a")
+    value["x"] = 2  # Callers get a copy
+    assert memory.get("a") == {"x": 1}
+    assert memory.get("old") is None
+    assert memory.get("missing") is None
+    
+    stats = memory.get_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["entries"] == 1 and stats["bytes"] == 10
+    
+    memory.invalidate("a")
+    assert memory.get_stats()["bytes"] == 0
+
+def test_save_replaces_the_memory_entry(cache_service):
+    cache_service.save_story("What is 2 + 2?", ["3", "4"], {"story": "first"})
+    assert cache_service.get_story("What is 2 + 2?", ["3", "4"]) == {"story": "first"}
+    
+    cache_service.save_story("What is 2 + 2?", ["3", "4"], {"story": "second"})
+    assert cache_service.get_story("What is 2 + 2?", ["3", "4"]) == {"story": "second"}
+    
+    stats = cache_service.get_stats()
+    assert stats["memory"]["hits"] == 2
+    assert stats["disk"]["hits"] == 0
+
+def test_failed_write_leaves_no_stale_memory_entry(cache_service, monkeypatch):
+    cache_service.save_llm_response("key", "stage", "old")
+    
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr("app.services.cache_service.os.replace", fail)
+    assert cache_service.save_llm_response("key", "stage", "new") is False
+    
+    # The memory entry is gone, so the read falls through to the file still on disk
+    assert cache_service.get_llm_response("key") == "old"
+    assert cache_service.get_stats()["disk"]["hits"] == 1
+
+def test_disk_eviction_invalidates_memory(cache_service, tmp_path):
+    cache_service.manager = CacheManager(cache_service.cache_dir, max_bytes=150)
+    cache_service.save_llm_response("first", "stage", "x" * 60)
+    cache_service.save_llm_response("second", "stage", "y" * 60)
+    
+    assert not cache_service.memory.contains("first_llm")
+    assert cache_service.get_llm_response("first") is None
+    assert cache_service.get_llm_response("second") == "y" * 60
+    
+    stats = cache_service.get_stats()
+    assert stats["disk"]["evictions"] == 1
+    assert (stats["disk"]["hits"], stats["disk"]["misses"]) == (0, 1)
+    assert stats["memory"]["hits"] == 1
+
+def test_disk_hit_populates_memory(cache_service):
+    cache_service.save_llm_response("key", "stage", "value")
+    cache_service.memory.invalidate("key_llm")
+    
+    assert cache_service.get_llm_response("key") == "value"
+    assert cache_service.get_llm_response("key") == "value"
+    
+    stats = cache_service.get_stats()
+    assert stats["disk"]["hits"] == 1
+    assert stats["memory"]["hits"] == 1
+
+@pytest.mark.parametrize("compression", [
+    "none",
+    "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(zstandard is None, reason="zstandard is not installed"))
+])
+def test_payload_round_trip(compression):
+    raw = json.dumps({"story": "a" * 1000}).encode("utf-8")
+    encoded = encode_cache_payload(raw, compression)
+    
+    assert encoded.startswith(CACHE_FILE_MAGIC)
+    if compression != "none":
+        assert len(encoded) < len(raw)
+    assert decode_cache_payload(encoded) == raw
+
+def test_payload_checksum_mismatch_raises():
+    encoded = bytearray(encode_cache_payload(b'{"story":"abc"}', "none"))
+    encoded[-2] ^= 0xFF
+    
+    with pytest.raises(ValueError, match="checksum"):
+        decode_cache_payload(bytes(encoded))
+
+def test_corrupt_cache_file_is_a_miss(cache_service, monkeypatch):
+    monkeypatch.setattr("app.services.cache_service.CACHE_COMPRESSION", "gzip")
+    cache_service.save_llm_response("key", "stage", "value")
+    cache_service.memory.invalidate("key_llm")
+    path = cache_service.manager.get_path("key", "llm")
+    data = bytearray(path.read_bytes())
+    data[5:9] = b"\x00\x00\x00\x00"  # Zero the stored checksum
+    path.write_bytes(bytes(data))
+    
+    assert cache_service.get_llm_response("key") is None
+    assert cache_service.get_stats()["disk"]["misses"] == 1
+
+def test_legacy_plain_json_files_are_read(cache_service):
+    legacy = cache_service.manager.get_legacy_path("key", "llm")
+    legacy.write_text(json.dumps({"stage": "stage", "response": "value"}), encoding="utf-8")
+    
+    assert cache_service.get_llm_response("key") == "value"
+    assert not legacy.exists()
+    assert cache_service.manager.get_path("key", "llm").exists()
+    assert cache_service.get_stats()["disk"]["hits"] == 1
@@ -0,0 +1,90 @@
+"""Responses rejected by stage validation are not memoized"""
+import pytest
+from app.services.llm_service import LLMService
+from app.services.pipeline import layer2_classification
+from app.services.pipeline.layer2_classification import ClassificationOrchestrator
+
+QUESTION = "Which data structure gives O(1) average lookup by key?"
+
+class FakeLLM:
+    """Answers each classifier prompt; the complexity answer can be swapped between runs"""
+    
+    def __init__(self):
+        self.difficulty = "hard"
+        self.calls = []
+    
+    def __call__(self, messages, model, response_format=None):
+        prompt = messages[-1]["content"]
+        if '"question_type"' in prompt and "schema" in prompt:
+            self.calls.append("fused")
+            return (
+                '{"question_type": "coding", "subject": "CS", "topic": "Hashing", '
+                f'"difficulty": "{self.difficulty}", "complexity_score": 3, '
+                '"key_concepts": ["hash table"], "intent": "lookup cost"}'
+            )
+        if '"difficulty"' in prompt:
+            self.calls.append("complexity")
+            return f'{{"difficulty": "{self.difficulty}", "complexity_score": 3}}'
+        if '"question_type"' in prompt:
+            self.calls.append("type")
+            return '{"question_type": "coding"}'
+        if '"subject"' in prompt:
+            self.calls.append("subject")
+            return '{"subject": "Computer Science", "topic": "Hashing"}'
+        self.calls.append("keywords")
+        return '{"key_concepts": ["hash table"], "keywords": ["dict"], "intent": "lookup cost"}'
+
+@pytest.fixture
+def fake_llm(monkeypatch, llm_cache):
+    service = LLMService()
+    service.openai_client = object()
+    service.anthropic_client = None
+    fake = FakeLLM()
+    monkeypatch.setattr(service, "_call_openai", fake)
+    monkeypatch.setattr(layer2_classification, "get_llm_service", lambda: service)
+    return fake
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent"])
+def test_rejected_analysis_is_not_replayed(fake_llm, mode):
+    orchestrator = ClassificationOrchestrator(mode=mode)
+    with pytest.raises(ValueError, match="Invalid difficulty level: hard"):
+        orchestrator.analyze_question(QUESTION)
+    
+    # The retry reaches the LLM again instead of replaying the rejected responses
+    fake_llm.difficulty = "beginner"
+    result = orchestrator.analyze_question(QUESTION)
+    assert result["data"]["difficulty"] == "beginner"
+    assert fake_llm.calls.count("complexity") == 2
+
+def test_accepted_analysis_is_memoized(fake_llm):
+    fake_llm.difficulty = "advanced"
+    orchestrator = ClassificationOrchestrator(mode="concurrent")
+    orchestrator.analyze_question(QUESTION)
+    orchestrator.analyze_question(QUESTION)
+    
+    assert sorted(fake_llm.calls) == ["complexity", "keywords", "subject", "type"]
+
+def test_rejected_fused_analysis_is_not_replayed(fake_llm):
+    orchestrator = ClassificationOrchestrator(mode="fused")
+    with pytest.raises(ValueError):
+        orchestrator.analyze_question(QUESTION)
+    
+    fake_llm.difficulty = "intermediate"
+    result = orchestrator.analyze_question(QUESTION)
+    assert result["data"]["difficulty"] == "intermediate"
+    assert fake_llm.calls.count("fused") == 2
+
+def test_deferred_cache_drops_writes_on_error(llm_cache):
+    service = LLMService()
+    with pytest.raises(RuntimeError):
+        with service.deferred_cache():
+            service._save_cached_response("a" * 64, "strategy", '{"ok": true}')
+            raise RuntimeError("step failed")
+    assert llm_cache.get_llm_response("a" * 64) is None
+    
+    with service.deferred_cache():
+        with service.deferred_cache():
+            service._save_cached_response("b" * 64, "strategy", '{"ok": true}')
+        # Nested blocks hand their writes to the outer one
+        assert llm_cache.get_llm_response("b" * 64) is None
+    assert llm_cache.get_llm_response("b" * 64) == '{"ok": true}'
@@ -0,0 +1,70 @@
+"""LLMService async path and response memoization"""
+import asyncio
+import openai
+import anthropic
+from app.services.llm_service import LLMService, _create_async_http_client
+
+MESSAGES = [
+    {"role": "system", "content": "Respond with JSON."},
+    {"role": "user", "content": "Classify this question."}
+]
+
+def _service(monkeypatch, responses):
+    """LLMService with an OpenAI key and a stubbed async OpenAI call"""
+    service = LLMService()
+    service._openai_key = "test-key"
+    service._anthropic_key = None
+    calls = []
+    
+    async def fake_acall_openai(messages, model, response_format=None):
+        calls.append(model)
+        return responses[len(calls) - 1]
+    
+    monkeypatch.setattr(service, "_acall_openai", fake_acall_openai)
+    return service, calls
+
+def test_acall_llm_memoizes_cached_stages(monkeypatch, llm_cache):
+    service, calls = _service(monkeypatch, ['{"type": "math"}', '{"type": "other"}'])
+    
+    first = asyncio.run(service.acall_llm(MESSAGES, stage="question_analysis"))
+    second = asyncio.run(service.acall_llm(MESSAGES, stage="question_analysis"))
+    
+    assert first == second == '{"type": "math"}'
+    assert calls == ["gpt-4"]
+
+def test_acall_llm_shares_cache_with_call_llm(monkeypatch, llm_cache):
+    service, calls = _service(monkeypatch, ['{"type": "math"}'])
+    asyncio.run(service.acall_llm(MESSAGES, stage="question_analysis"))
+    
+    # The sync path builds the same key, so it is served without a client
+    service.openai_client = object()
+    assert service.call_llm(MESSAGES, stage="question_analysis") == '{"type": "math"}'
+
+def test_acall_llm_skips_cache_for_uncached_stages(monkeypatch, llm_cache):
+    service, calls = _service(monkeypatch, ['{"a": 1}', '{"a": 2}'])
+    
+    assert asyncio.run(service.acall_llm(MESSAGES, stage="story")) == '{"a": 1}'
+    assert asyncio.run(service.acall_llm(MESSAGES, stage="story")) == '{"a": 2}'
+    assert len(calls) == 2
+
+def test_async_http_client_uses_pool_settings():
+    for sdk in (openai, anthropic):
+        client = _create_async_http_client(sdk)
+        try:
+            assert client.timeout.connect == 10.0
+        finally:
+            asyncio.run(client.aclose())
+
+def test_aclose_releases_async_clients():
+    service = LLMService()
+    service._openai_key = "test-key"
+    service._anthropic_key = "test-key"
+    
+    async def open_and_close():
+        service._get_async_openai()
+        service._get_async_anthropic()
+        await service.aclose()
+    
+    asyncio.run(open_and_close())
+    assert service.async_openai_client is None
+    assert service.async_anthropic_client is None
@@ -0,0 +1,87 @@
+"""Near-duplicate question reuse"""
+import os
+import sqlite3
+import pytest
+from app.services import near_duplicate_index
+from app.services.near_duplicate_index import (
+    NearDuplicateIndex, estimate_similarity, minhash, shingles, tokenize
+)
+
+QUESTION = (
+    "A hospital is rolling out a new electronic health record system across twelve departments. "
+    "Nurses report that the medication administration screens require many extra clicks, physicians "
+    "complain about alert fatigue, and the IT team has a limited training budget for the next quarter. "
+    "Given these constraints, which of the following strategies is the most appropriate first step "
+    "for the project manager to take in order to improve adoption of the system?"
+)
+NEGATED = QUESTION.replace("is the most appropriate", "is NOT the most appropriate")
+OPTIONS = [
+    "A. Schedule mandatory full-day training for all staff",
+    "B. Form a clinical workflow group to prioritise the most disruptive screens",
+    "C. Disable all clinical alerts until adoption improves",
+    "D. Postpone the rollout until next fiscal year"
+]
+
+def _similarity(text_a, options_a, text_b, options_b):
+    return estimate_similarity(
+        minhash(shingles(tokenize(text_a, options_a))),
+        minhash(shingles(tokenize(text_b, options_b)))
+    )
+
+@pytest.mark.skipif("CACHE_NEAR_DUP_ENABLED" in os.environ, reason="enabled explicitly")
+def test_disabled_by_default(cache_service):
+    assert near_duplicate_index.CACHE_NEAR_DUP_ENABLED is False
+    assert cache_service.near_duplicates is None
+
+def test_matches_renumbered_question(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "index.db")
+    index.add("original", QUESTION, OPTIONS)
+    
+    relabelled = ["(" + opt[0].lower() + ") " + opt[3:] for opt in OPTIONS]
+    matches = index.find("Q7. " + QUESTION, relabelled)
+    
+    assert [match[0] for match in matches] == ["original"]
+
+def test_negated_question_is_not_reused(tmp_path):
+    # Similar enough to pass the threshold on text alone
+    assert _similarity(QUESTION, OPTIONS, NEGATED, OPTIONS) >= 0.9
+    
+    index = NearDuplicateIndex(tmp_path / "index.db", threshold=0.5)
+    index.add("original", QUESTION, OPTIONS)
+    
+    assert index.find(NEGATED, OPTIONS) == []
+    assert index.find(QUESTION.replace("is the most", "isn't the most"), OPTIONS) == []
+    assert index.find(QUESTION.replace("is the most", "isn\u2019t the most"), OPTIONS) == []
+    assert index.find(QUESTION.replace("most appropriate", "least appropriate"), OPTIONS) == []
+
+def test_different_options_are_not_reused(tmp_path):
+    index = NearDuplicateIndex(tmp_path / "index.db", threshold=0.5)
+    index.add("original", QUESTION, OPTIONS)
+    
+    changed = OPTIONS[:3] + ["D. Replace the system with the previous vendor"]
+    assert index.find(QUESTION, changed) == []
+    assert index.find(QUESTION, OPTIONS[:3]) == []
+    assert index.find(QUESTION) == []
+
+def test_legacy_rows_without_guard_never_match(tmp_path):
+    index_path = tmp_path / "index.db"
+    conn = sqlite3.connect(index_path)
+    conn.execute("CREATE TABLE question_signatures (question_hash TEXT PRIMARY KEY, signature TEXT NOT NULL, numbers TEXT NOT NULL)")
+    conn.commit()
+    conn.close()
+    
+    index = NearDuplicateIndex(index_path)
+    index.add("original", QUESTION, OPTIONS)
+    with sqlite3.connect(index_path) as conn:
+        conn.execute("UPDATE question_signatures SET guard = NULL")
+    conn.close()
+    
+    assert index.find(QUESTION, OPTIONS) == []
+
+def test_cache_service_does_not_serve_negated_story(cache_service, tmp_path):
+    cache_service.near_duplicates = NearDuplicateIndex(tmp_path / "index.db")
+    cache_service.save_story(QUESTION, OPTIONS, {"story": "most appropriate"})
+    
+    assert cache_service.get_story("Q1. " + QUESTION, OPTIONS) == {"story": "most appropriate"}
+    assert cache_service.get_story(NEGATED, OPTIONS) is None
+    assert cache_service.get_blueprint(NEGATED, OPTIONS) is None
@@ -0,0 +1,178 @@
+"""Pipeline job queue leases and resuming interrupted pipelines"""
+import threading
+from datetime import datetime, timedelta
+import pytest
+from app.db.database import SessionLocal
+from app.db.models import PipelineJob
+from app.repositories.pipeline_job_repository import PipelineJobRepository
+from app.repositories.pipeline_step_repository import PipelineStepRepository
+from app.repositories.process_repository import ProcessRepository
+from app.repositories.question_repository import QuestionRepository
+from app.services.pipeline import worker as worker_module
+from app.services.pipeline.orchestrator import PipelineOrchestrator
+from app.services.pipeline.worker import PipelineWorker
+
+LEASE_SECONDS = 60
+
+def _enqueue(db, count=1, max_attempts=3):
+    """Create questions and processes and queue a job for each"""
+    question_id = QuestionRepository.create(db, {"text": "What is 2 + 2?"}).id
+    jobs = []
+    for _ in range(count):
+        process = ProcessRepository.create(db, question_id)
+        jobs.append(PipelineJobRepository.enqueue(db, process.id, question_id, max_attempts=max_attempts))
+    return jobs
+
+def _expire_lease(db, job_id):
+    """Age a job's heartbeat past the lease, as if its worker died"""
+    db.query(PipelineJob).filter(PipelineJob.id == job_id).update(
+        {PipelineJob.heartbeat_at: datetime.utcnow() - timedelta(seconds=LEASE_SECONDS + 1)}
+    )
+    db.commit()
+
+def test_racing_workers_never_claim_the_same_job(db):
+    job_ids = {job.id for job in _enqueue(db, count=20)}
+    claims = {"worker-a": [], "worker-b": []}
+    errors = []
+    start = threading.Barrier(2)
+    
+    def drain(worker_id):
+        session = SessionLocal()
+        try:
+            start.wait()
+            while True:
+                job = PipelineJobRepository.claim_next(session, worker_id, LEASE_SECONDS)
+                if job is None:
+                    return
+                claims[worker_id].append(job.id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+    
+    threads = [threading.Thread(target=drain, args=(worker_id,)) for worker_id in claims]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    claimed = claims["worker-a"] + claims["worker-b"]
+    assert sorted(claimed) == sorted(job_ids)
+    assert len(set(claimed)) == len(claimed)
+    
+    jobs = db.query(PipelineJob).all()
+    assert all(job.status == "running" and job.attempts == 1 for job in jobs)
+    assert all(job.id in claims[job.worker_id] for job in jobs)
+
+def test_live_lease_is_not_reclaimed(db):
+    _enqueue(db)
+    assert PipelineJobRepository.claim_next(db, "worker-a", LEASE_SECONDS) is not None
+    assert PipelineJobRepository.claim_next(db, "worker-b", LEASE_SECONDS) is None
+
+def test_expired_lease_is_reclaimed_and_stale_owner_is_fenced(db):
+    job_id = _enqueue(db)[0].id
+    PipelineJobRepository.claim_next(db, "worker-a", LEASE_SECONDS)
+    _expire_lease(db, job_id)
+    
+    reclaimed = PipelineJobRepository.claim_next(db, "worker-b", LEASE_SECONDS)
+    assert reclaimed.id == job_id
+    assert reclaimed.worker_id == "worker-b"
+    assert reclaimed.attempts == 2
+    
+    # The old owner learns it lost the lease and can no longer finish the job
+    assert PipelineJobRepository.heartbeat(db, [job_id], "worker-a") == []
+    assert PipelineJobRepository.complete(db, job_id, worker_id="worker-a") is None
+    assert PipelineJobRepository.fail(db, job_id, "boom", worker_id="worker-a") is None
+    db.expire_all()
+    job = PipelineJobRepository.get_by_id(db, job_id)
+    assert (job.status, job.worker_id, job.error_message) == ("running", "worker-b", None)
+    
+    assert PipelineJobRepository.heartbeat(db, [job_id], "worker-b") == [job_id]
+    assert PipelineJobRepository.complete(db, job_id, worker_id="worker-b").status == "completed"
+    # A finished job is no longer owned, so a late failure from its worker is ignored too
+    assert PipelineJobRepository.fail(db, job_id, "late", worker_id="worker-b") is None
+
+def test_exhausted_jobs_are_not_reclaimed(db):
+    job_id = _enqueue(db, max_attempts=1)[0].id
+    PipelineJobRepository.claim_next(db, "worker-a", LEASE_SECONDS)
+    _expire_lease(db, job_id)
+    
+    assert PipelineJobRepository.claim_next(db, "worker-b", LEASE_SECONDS) is None
+    assert [job.id for job in PipelineJobRepository.get_exhausted(db, LEASE_SECONDS)] == [job_id]
+
+def test_heartbeat_abandons_jobs_whose_lease_was_taken(db):
+    job_id = _enqueue(db)[0].id
+    worker = PipelineWorker(worker_id="worker-a")
+    PipelineJobRepository.claim_next(db, "worker-a", LEASE_SECONDS)
+    worker._active_jobs[job_id] = threading.Event()
+    
+    worker._heartbeat()
+    assert not worker._active_jobs[job_id].is_set()
+    
+    _expire_lease(db, job_id)
+    PipelineJobRepository.claim_next(db, "worker-b", LEASE_SECONDS)
+    worker._heartbeat()
+    assert worker._active_jobs[job_id].is_set()
+
+def test_abandoned_run_leaves_the_job_to_its_new_owner(db, monkeypatch):
+    job = _enqueue(db)[0]
+    PipelineJobRepository.claim_next(db, "worker-a", LEASE_SECONDS)
+    _expire_lease(db, job.id)
+    PipelineJobRepository.claim_next(db, "worker-b", LEASE_SECONDS)
+    
+    def abandoned(self, process_id, question_id, abandon=None, **kwargs):
+        return {"success": False, "abandoned": True, "error": "Pipeline job lease lost"}
+    
+    monkeypatch.setattr(PipelineOrchestrator, "execute_pipeline", abandoned)
+    worker = PipelineWorker(worker_id="worker-a")
+    worker._active_jobs[job.id] = threading.Event()
+    worker._run_job({"id": job.id, "process_id": job.process_id, "question_id": job.question_id, "attempts": 1})
+    
+    db.expire_all()
+    assert PipelineJobRepository.get_by_id(db, job.id).status == "running"
+    assert job.id not in worker._active_jobs
+
+@pytest.mark.parametrize("statuses, expected_last", [
+    (["completed", "completed"], 2),
+    (["completed", "skipped"], 2),
+    (["completed", "skipped", "error"], 2),
+    (["error"], None)
+])
+def test_last_completed_step_counts_skipped_steps(db, statuses, expected_last):
+    question_id = QuestionRepository.create(db, {"text": "What is 2 + 2?"}).id
+    process_id = ProcessRepository.create(db, question_id).id
+    for number, status in enumerate(statuses, start=1):
+        step = PipelineStepRepository.create(db, process_id, f"step_{number}", number)
+        PipelineStepRepository.update_status(db, step.id, status)
+    
+    last = PipelineStepRepository.get_last_completed_step(db, process_id)
+    assert (last.step_number if last else None) == expected_last
+
+def test_resume_continues_after_skipped_step(db, monkeypatch):
+    question_id = QuestionRepository.create(db, {"text": "What is 2 + 2?"}).id
+    process_id = ProcessRepository.create(db, question_id).id
+    steps = PipelineOrchestrator.PIPELINE_STEPS
+    for step_def, status in zip(steps, ["completed", "completed", "skipped", "processing"]):
+        step = PipelineStepRepository.create(db, process_id, step_def["name"], step_def["number"])
+        PipelineStepRepository.update_status(db, step.id, status)
+    interrupted_id = step.id
+    
+    executed = []
+    restored = []
+    monkeypatch.setattr(
+        PipelineOrchestrator, "_execute_step",
+        lambda self, process_id, step_def, state: executed.append(step_def["number"]) or {"success": True}
+    )
+    monkeypatch.setattr(
+        PipelineOrchestrator, "_restore_pipeline_state",
+        lambda self, process_id, state, before_step: restored.append(before_step)
+    )
+    monkeypatch.setattr(PipelineOrchestrator, "_store_results", lambda self, *args: "visualization")
+    
+    result = PipelineOrchestrator(db).execute_pipeline(process_id, question_id)
+    
+    assert result["success"]
+    assert restored == [4]
+    assert executed == [step_def["number"] for step_def in steps[3:]]
+    assert PipelineStepRepository.get_by_id(db, interrupted_id).status == "error"
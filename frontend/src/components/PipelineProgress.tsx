@@ -71,53 +71,99 @@ export default function PipelineProgress({
     let isCancelled = false
     let backendCompleted = false
 
-    // Poll for completion in the background
-    const pollForCompletion = async () => {
-      try {
-        const response = await axios.get(`/api/progress/${processId}`, { timeout: 5000 })
-        const data = response.data
+    let completionInterval: NodeJS.Timeout | undefined
+    let eventSource: EventSource | null = null
 
-        // Update backend progress
-        setBackendProgress(data.progress || 0)
-        setCurrentStepName(data.current_step || '')
-
-        // Track cached steps
-        if (data.steps) {
-          const cached = new Set<string>()
-          data.steps.forEach((step: any) => {
-            if (step.cached && step.status === 'completed') {
-              cached.add(step.step_name)
-            }
-          })
-          setCachedSteps(cached)
-        }
+    // Apply a progress payload (poll response or merged stream state)
+    const applyProgress = (data: any) => {
+      // Update backend progress
+      setBackendProgress(data.progress || 0)
+      setCurrentStepName(data.current_step || '')
 
-        // Map backend step to frontend step index
-        if (data.current_step) {
-          const mappedIndex = STEP_NAME_MAP[data.current_step]
-          if (mappedIndex !== undefined) {
-            setCurrentStepIndex(mappedIndex)
+      // Track cached steps
+      if (data.steps) {
+        const cached = new Set<string>()
+        data.steps.forEach((step: any) => {
+          if (step.cached && step.status === 'completed') {
+            cached.add(step.step_name)
           }
+        })
+        setCachedSteps(cached)
+      }
+
+      // Map backend step to frontend step index
+      if (data.current_step) {
+        const mappedIndex = STEP_NAME_MAP[data.current_step]
+        if (mappedIndex !== undefined) {
+          setCurrentStepIndex(mappedIndex)
         }
+      }
 
-        if (data.status === 'completed' && data.visualization_id) {
-          backendCompleted = true
-          setIsCompleted(true)
-          // Complete the animation if not already done
-          setCurrentStepIndex(PROCESS_STEPS.length - 1)
-          setStepProgress(100)
-          if (onComplete) {
-            setTimeout(() => onComplete(data.visualization_id), 500)
-          }
-        } else if (data.status === 'error' && onError) {
-          onError(data.error_message || 'Processing failed')
+      if (data.status === 'completed' && data.visualization_id) {
+        backendCompleted = true
+        setIsCompleted(true)
+        // Complete the animation if not already done
+        setCurrentStepIndex(PROCESS_STEPS.length - 1)
+        setStepProgress(100)
+        if (onComplete) {
+          setTimeout(() => onComplete(data.visualization_id), 500)
         }
+      } else if (data.status === 'error' && onError) {
+        onError(data.error_message || 'Processing failed')
+      }
+    }
+
+    // Poll for completion in the background
+    const pollForCompletion = async () => {
+      try {
+        const response = await axios.get(`/api/progress/${processId}`, { timeout: 5000 })
+        applyProgress(response.data)
       } catch (error) {
         // Silently handle errors - just continue polling
       }
     }
 
-    const completionInterval = setInterval(pollForCompletion, 2000)
+    const startPolling = () => {
+      if (!completionInterval && !isCancelled) {
+        completionInterval = setInterval(pollForCompletion, 2000)
+      }
+    }
+
+    // Prefer the push stream (snapshot, then deltas); fall back to polling
+    if (typeof window !== 'undefined' && 'EventSource' in window) {
+      let streamState: any = null
+      eventSource = new EventSource(`/api/progress/${processId}/stream`)
+
+      eventSource.addEventListener('snapshot', (event: MessageEvent) => {
+        streamState = JSON.parse(event.data)
+        applyProgress(streamState)
+      })
+      eventSource.addEventListener('process', (event: MessageEvent) => {
+        if (!streamState) return
+        const { type, ...changes } = JSON.parse(event.data)
+        streamState = { ...streamState, ...changes }
+        applyProgress(streamState)
+      })
+      eventSource.addEventListener('step', (event: MessageEvent) => {
+        if (!streamState) return
+        const { type, ...step } = JSON.parse(event.data)
+        const steps = (streamState.steps || []).filter((s: any) => s.id !== step.id)
+        steps.push(step)
+        steps.sort((a: any, b: any) => a.step_number - b.step_number)
+        streamState = { ...streamState, steps }
+        applyProgress(streamState)
+      })
+      eventSource.onerror = () => {
+        // The server closes the stream once the process finishes
+        eventSource?.close()
+        eventSource = null
+        if (!backendCompleted && streamState?.status !== 'error') {
+          startPolling()
+        }
+      }
+    } else {
+      startPolling()
+    }
 
     // Animate through steps with random durations and pauses
     const startStepAnimation = (stepIndex: number) => {
@@ -190,6 +236,7 @@ export default function PipelineProgress({
 
     return () => {
       isCancelled = true
+      eventSource?.close()
       clearInterval(completionInterval)
       clearInterval(progressInterval)
       clearTimeout(pauseTimeout)